@@ -1,25 +1,34 @@
 import logging
+import uuid
 from datetime import datetime
 
 from alpaca_trade_api import REST as AlpacaREST
 
 from .base import BaseBroker, Order, OrderSide, OrderStatus, Position
+from .ratelimit import RateLimitScheduler
+from .transport import BrokerTransport, OrderOutcomeUnknownError, configure_session
 
 logger = logging.getLogger("trading-bot")
 
 
 class AlpacaBroker(BaseBroker):
 
-    def __init__(self, api_key: str, api_secret: str, base_url: str = "https://paper-api.alpaca.markets"):
+    def __init__(self, api_key: str, api_secret: str, base_url: str = "https://paper-api.alpaca.markets",
+                 transport: BrokerTransport | None = None):
         self.api_key = api_key
         self.api_secret = api_secret
         self.base_url = base_url
         self.api = None
+        # Egna order-id:n för ordrar med okänt utfall; slås upp via client_order_id
+        self._client_orders: set[str] = set()
+        self.transport = transport or BrokerTransport("alpaca", scheduler=RateLimitScheduler.for_broker("alpaca"))
 
     def connect(self) -> bool:
         try:
             self.api = AlpacaREST(self.api_key, self.api_secret, self.base_url)
-            account = self.api.get_account()
+            if hasattr(self.api, "_session"):
+                configure_session(self.api._session, timeout=self.transport.socket_timeout)
+            account = self.transport.call(self.api.get_account, idempotent=True)
             logger.info(f"Alpaca ansluten: {account.status} | Kapital: ${float(account.equity):,.2f}")
             return True
         except Exception as e:
@@ -27,12 +36,12 @@ class AlpacaBroker(BaseBroker):
             return False
 
     def get_balance(self) -> float:
-        account = self.api.get_account()
+        account = self.transport.call(self.api.get_account, idempotent=True)
         return float(account.cash)
 
     def get_positions(self) -> dict[str, Position]:
         positions = {}
-        for p in self.api.list_positions():
+        for p in self.transport.call(self.api.list_positions, idempotent=True):
             positions[p.symbol] = Position(
                 symbol=p.symbol,
                 quantity=float(p.qty),
@@ -42,13 +51,16 @@ class AlpacaBroker(BaseBroker):
         return positions
 
     def place_order(self, symbol: str, side: OrderSide, quantity: float, price: float) -> Order:
+        client_order_id = uuid.uuid4().hex
         try:
-            alpaca_order = self.api.submit_order(
+            alpaca_order = self.transport.call(
+                self.api.submit_order,
                 symbol=symbol,
                 qty=int(quantity),
                 side=side.value,
                 type="market",
                 time_in_force="day",
+                client_order_id=client_order_id,
             )
             status = self._map_status(alpaca_order.status)
             logger.info(f"Alpaca order: {side.value} {int(quantity)} {symbol} → {status.value}")
@@ -61,6 +73,18 @@ class AlpacaBroker(BaseBroker):
                 timestamp=datetime.now(),
                 order_id=alpaca_order.id,
             )
+        except OrderOutcomeUnknownError as e:
+            logger.error(f"Alpaca order utan svar, stäms av senare: {e}")
+            self._client_orders.add(client_order_id)
+            return Order(
+                symbol=symbol,
+                side=side,
+                quantity=quantity,
+                price=price,
+                status=OrderStatus.UNKNOWN,
+                timestamp=datetime.now(),
+                order_id=client_order_id,
+            )
         except Exception as e:
             logger.error(f"Alpaca order misslyckades: {e}")
             return Order(
@@ -73,15 +97,31 @@ class AlpacaBroker(BaseBroker):
             )
 
     def get_order_status(self, order_id: str) -> OrderStatus:
+        if order_id in self._client_orders:
+            return self._client_order_status(order_id)
         try:
-            order = self.api.get_order(order_id)
+            order = self.transport.call(self.api.get_order, order_id, idempotent=True)
             return self._map_status(order.status)
         except Exception:
             return OrderStatus.CANCELLED
 
+    def _client_order_status(self, client_order_id: str) -> OrderStatus:
+        try:
+            order = self.transport.call(self.api.get_order_by_client_order_id, client_order_id, idempotent=True)
+        except Exception as e:
+            # 404: ordern kom aldrig fram. Andra fel säger inget om utfallet
+            if getattr(e, "status_code", None) == 404:
+                self._client_orders.discard(client_order_id)
+                return OrderStatus.REJECTED
+            return OrderStatus.UNKNOWN
+        status = self._map_status(order.status)
+        if status != OrderStatus.PENDING:
+            self._client_orders.discard(client_order_id)
+        return status
+
     def cancel_order(self, order_id: str) -> bool:
         try:
-            self.api.cancel_order(order_id)
+            self.transport.call(self.api.cancel_order, order_id)
             return True
         except Exception:
             return False
@@ -0,0 +1,161 @@
+import numpy as np
+
+from .base import Position
+from .matching import SimulationConfig
+from .paper_broker import PaperBroker
+from .retention import RetentionPolicy
+
+
+class ArrayPositionBook:
+
+    def __init__(self, capacity: int = 1024):
+        self.index: dict[str, int] = {}
+        self.symbols: list[str] = []
+        self.quantity = np.zeros(capacity)
+        self.avg_price = np.zeros(capacity)
+        self.last_price = np.zeros(capacity)
+        # Inkrementellt underhållna totaler, så att totalvärdet är O(1)
+        self.market_value = 0.0
+        self.cost_basis = 0.0
+        self.open_count = 0
+
+    def slot(self, symbol: str) -> int:
+        idx = self.index.get(symbol)
+        if idx is None:
+            idx = len(self.symbols)
+            if idx >= len(self.quantity):
+                self._grow()
+            self.index[symbol] = idx
+            self.symbols.append(symbol)
+        return idx
+
+    def add(self, symbol: str, quantity: float, price: float):
+        idx = self.slot(symbol)
+        old_qty = self.quantity[idx]
+        if old_qty <= 0:
+            self.open_count += 1
+            self.last_price[idx] = price
+        new_qty = old_qty + quantity
+        self.market_value += quantity * self.last_price[idx]
+        self.cost_basis += quantity * price
+        self.avg_price[idx] = (self.avg_price[idx] * old_qty + price * quantity) / new_qty
+        self.quantity[idx] = new_qty
+
+    def remove(self, symbol: str, quantity: float) -> bool:
+        idx = self.index.get(symbol)
+        if idx is None or self.quantity[idx] < quantity:
+            return False
+        self.quantity[idx] -= quantity
+        self.market_value -= quantity * self.last_price[idx]
+        self.cost_basis -= quantity * self.avg_price[idx]
+        if self.quantity[idx] <= 0:
+            self.quantity[idx] = 0.0
+            self.avg_price[idx] = 0.0
+            self.open_count -= 1
+        return True
+
+    def mark(self, symbol: str, price: float):
+        idx = self.index.get(symbol)
+        if idx is not None:
+            self.market_value += self.quantity[idx] * (price - self.last_price[idx])
+            self.last_price[idx] = price
+
+    def mark_many(self, indices: np.ndarray, prices: np.ndarray):
+        # Vektoriserad prisuppdatering; totalen justeras med differensen. Icke-ändliga priser hoppas över,
+        # och förekommer ett index flera gånger gäller det sista priset — med dubbletter skulle
+        # differensen annars räknas mot samma gamla pris flera gånger
+        valid = np.isfinite(prices)
+        if not valid.all():
+            indices, prices = indices[valid], prices[valid]
+        _, first = np.unique(indices[::-1], return_index=True)
+        if len(first) != len(indices):
+            keep = np.sort(len(indices) - 1 - first)
+            indices, prices = indices[keep], prices[keep]
+        self.market_value += float(np.dot(self.quantity[indices], prices - self.last_price[indices]))
+        self.last_price[indices] = prices
+
+    def position(self, symbol: str) -> Position | None:
+        idx = self.index.get(symbol)
+        if idx is None or self.quantity[idx] <= 0:
+            return None
+        return Position(
+            symbol=symbol,
+            quantity=float(self.quantity[idx]),
+            avg_price=float(self.avg_price[idx]),
+            current_price=float(self.last_price[idx]),
+        )
+
+    def to_positions(self) -> dict[str, Position]:
+        positions = {}
+        for idx in np.flatnonzero(self.quantity[:len(self.symbols)] > 0):
+            symbol = self.symbols[idx]
+            positions[symbol] = Position(
+                symbol=symbol,
+                quantity=float(self.quantity[idx]),
+                avg_price=float(self.avg_price[idx]),
+                current_price=float(self.last_price[idx]),
+            )
+        return positions
+
+    def recompute_totals(self):
+        # Full omräkning; används för att nollställa flyttalsdrift
+        n = len(self.symbols)
+        self.market_value = float(np.dot(self.quantity[:n], self.last_price[:n]))
+        self.cost_basis = float(np.dot(self.quantity[:n], self.avg_price[:n]))
+        self.open_count = int(np.count_nonzero(self.quantity[:n] > 0))
+
+    def _grow(self):
+        size = len(self.quantity) * 2
+        for name in ("quantity", "avg_price", "last_price"):
+            arr = getattr(self, name)
+            grown = np.zeros(size)
+            grown[:len(arr)] = arr
+            setattr(self, name, grown)
+
+
+class ArrayPaperBroker(PaperBroker):
+
+    def __init__(self, initial_balance: float = 100000.0, simulation: SimulationConfig | None = None,
+                 capacity: int = 1024, retention: RetentionPolicy | None = None):
+        super().__init__(initial_balance, simulation, retention)
+        self.book = ArrayPositionBook(capacity)
+
+    def get_total_value(self) -> float:
+        return self.cash + self.book.market_value
+
+    def get_positions_value(self) -> float:
+        return self.book.market_value
+
+    def get_unrealized_pnl(self) -> float:
+        return self.book.market_value - self.book.cost_basis
+
+    def get_positions(self) -> dict[str, Position]:
+        return self.book.to_positions()
+
+    def get_position(self, symbol: str) -> Position | None:
+        return self.book.position(symbol)
+
+    def update_prices(self, prices: dict[str, float]):
+        index = self.book.index
+        symbols, values = [], []
+        for symbol, price in prices.items():
+            if symbol in self.matching.books:
+                self.process_tick(symbol, price)
+            elif symbol in index:
+                symbols.append(index[symbol])
+                values.append(price)
+        if symbols:
+            self.book.mark_many(np.array(symbols, dtype=np.intp), np.array(values))
+
+    def update_prices_array(self, indices: np.ndarray, prices: np.ndarray):
+        # Snabbväg för simuleringar som redan håller priser i bokens indexordning
+        self.book.mark_many(indices, prices)
+
+    def _add_to_position(self, symbol: str, quantity: float, price: float):
+        self.book.add(symbol, quantity, price)
+
+    def _remove_from_position(self, symbol: str, quantity: float) -> bool:
+        return self.book.remove(symbol, quantity)
+
+    def _mark_price(self, symbol: str, price: float):
+        self.book.mark(symbol, price)
@@ -4,27 +4,33 @@ from datetime import datetime
 from avanza import Avanza
 
 from .base import BaseBroker, Order, OrderSide, OrderStatus, Position
+from .ratelimit import RateLimitScheduler
+from .transport import BrokerTransport, OrderOutcomeUnknownError, configure_session
 
 logger = logging.getLogger("trading-bot")
 
 
 class AvanzaBroker(BaseBroker):
 
-    def __init__(self, username: str, password: str, totp_secret: str):
+    def __init__(self, username: str, password: str, totp_secret: str,
+                 transport: BrokerTransport | None = None):
         self.username = username
         self.password = password
         self.totp_secret = totp_secret
         self.client = None
         self.account_id = None
+        self.transport = transport or BrokerTransport("avanza", scheduler=RateLimitScheduler.for_broker("avanza"))
 
     def connect(self) -> bool:
         try:
-            self.client = Avanza({
+            self.client = self.transport.call(Avanza, {
                 "username": self.username,
                 "password": self.password,
                 "totpSecret": self.totp_secret,
             })
-            overview = self.client.get_overview()
+            if hasattr(self.client, "_session"):
+                configure_session(self.client._session, timeout=self.transport.socket_timeout)
+            overview = self.transport.call(self.client.get_overview, idempotent=True)
             accounts = overview.get("accounts", [])
             if accounts:
                 self.account_id = accounts[0]["accountId"]
@@ -37,7 +43,7 @@ class AvanzaBroker(BaseBroker):
 
     def get_balance(self) -> float:
         try:
-            overview = self.client.get_overview()
+            overview = self.transport.call(self.client.get_overview, idempotent=True)
             for account in overview.get("accounts", []):
                 if account["accountId"] == self.account_id:
                     return float(account.get("buyingPower", 0))
@@ -48,7 +54,7 @@ class AvanzaBroker(BaseBroker):
     def get_positions(self) -> dict[str, Position]:
         positions = {}
         try:
-            overview = self.client.get_overview()
+            overview = self.transport.call(self.client.get_overview, idempotent=True)
             for pos in overview.get("positions", []):
                 symbol = pos.get("instrument", {}).get("ticker", "")
                 if not symbol:
@@ -66,14 +72,15 @@ class AvanzaBroker(BaseBroker):
     def place_order(self, symbol: str, side: OrderSide, quantity: float, price: float) -> Order:
         try:
             # Sök instrument-ID baserat på ticker
-            search = self.client.search_for_stock(symbol)
+            search = self.transport.call(self.client.search_for_stock, symbol, idempotent=True)
             if not search.get("hits"):
                 raise ValueError(f"Hittade inte instrument: {symbol}")
 
             instrument_id = search["hits"][0]["topHits"][0]["id"]
             order_type = "BUY" if side == OrderSide.BUY else "SELL"
 
-            result = self.client.place_order(
+            result = self.transport.call(
+                self.client.place_order,
                 account_id=self.account_id,
                 order_body={
                     "orderbookId": instrument_id,
@@ -97,6 +104,17 @@ class AvanzaBroker(BaseBroker):
                 timestamp=datetime.now(),
                 order_id=order_id,
             )
+        except OrderOutcomeUnknownError as e:
+            # Avanza har inga egna order-id:n; motorn stämmer av mot positionen i stället
+            logger.error(f"Avanza order utan svar, stäms av senare: {e}")
+            return Order(
+                symbol=symbol,
+                side=side,
+                quantity=quantity,
+                price=price,
+                status=OrderStatus.UNKNOWN,
+                timestamp=datetime.now(),
+            )
         except Exception as e:
             logger.error(f"Avanza order misslyckades: {e}")
             return Order(
@@ -110,7 +128,7 @@ class AvanzaBroker(BaseBroker):
 
     def get_order_status(self, order_id: str) -> OrderStatus:
         try:
-            deals = self.client.get_deals_and_orders()
+            deals = self.transport.call(self.client.get_deals_and_orders, idempotent=True)
             for order in deals.get("orders", []):
                 if str(order.get("orderId")) == order_id:
                     avanza_status = order.get("orderState", "")
@@ -121,7 +139,7 @@ class AvanzaBroker(BaseBroker):
 
     def cancel_order(self, order_id: str) -> bool:
         try:
-            self.client.delete_order(account_id=self.account_id, order_id=order_id)
+            self.transport.call(self.client.delete_order, account_id=self.account_id, order_id=order_id)
             return True
         except Exception:
             return False
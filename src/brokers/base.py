@@ -9,14 +9,23 @@ class OrderSide(Enum):
     SELL = "sell"
 
 
+class OrderType(Enum):
+    MARKET = "market"
+    LIMIT = "limit"
+    STOP = "stop"
+
+
 class OrderStatus(Enum):
     PENDING = "pending"
     FILLED = "filled"
     CANCELLED = "cancelled"
     REJECTED = "rejected"
+    # Ordern har funnits men dess slutstatus finns inte kvar (t.ex. utrensad ur minnet), eller så
+    # uteblev brokerns svar på place_order och ordern kan ha lagts — motorn stämmer av den senare
+    UNKNOWN = "unknown"
 
 
-@dataclass
+@dataclass(slots=True)
 class Order:
     symbol: str
     side: OrderSide
@@ -25,13 +34,19 @@ class Order:
     status: OrderStatus
     timestamp: datetime
     order_id: str = ""
+    order_type: OrderType = OrderType.MARKET
+    filled_quantity: float = 0.0
 
     @property
     def value(self) -> float:
         return self.quantity * self.price
 
+    @property
+    def remaining_quantity(self) -> float:
+        return self.quantity - self.filled_quantity
 
-@dataclass
+
+@dataclass(slots=True)
 class Position:
     symbol: str
     quantity: float
@@ -71,6 +86,9 @@ class BaseBroker(ABC):
     def place_order(self, symbol: str, side: OrderSide, quantity: float, price: float) -> Order:
         pass
 
+    def get_position(self, symbol: str) -> Position | None:
+        return self.get_positions().get(symbol)
+
     @abstractmethod
     def get_order_status(self, order_id: str) -> OrderStatus:
         pass
@@ -1,25 +1,35 @@
 import logging
+import uuid
 from datetime import datetime
 
 from binance.client import Client as BinanceClient
 
 from .base import BaseBroker, Order, OrderSide, OrderStatus, Position
+from .ratelimit import RateLimitScheduler
+from .transport import BrokerTransport, OrderOutcomeUnknownError, configure_session
 
 logger = logging.getLogger("trading-bot")
 
 
 class BinanceBroker(BaseBroker):
 
-    def __init__(self, api_key: str, api_secret: str, testnet: bool = True):
+    def __init__(self, api_key: str, api_secret: str, testnet: bool = True,
+                 transport: BrokerTransport | None = None):
         self.api_key = api_key
         self.api_secret = api_secret
         self.testnet = testnet
         self.client = None
+        # Egna order-id:n för ordrar med okänt utfall → Binance-symbol, som uppslaget kräver
+        self._client_orders: dict[str, str] = {}
+        self.transport = transport or BrokerTransport("binance", scheduler=RateLimitScheduler.for_broker("binance"))
 
     def connect(self) -> bool:
         try:
-            self.client = BinanceClient(self.api_key, self.api_secret, testnet=self.testnet)
-            account = self.client.get_account()
+            self.client = self.transport.call(BinanceClient, self.api_key, self.api_secret, testnet=self.testnet,
+                                              requests_params={"timeout": self.transport.socket_timeout})
+            if hasattr(self.client, "session"):
+                configure_session(self.client.session, timeout=self.transport.socket_timeout)
+            account = self.transport.call(self.client.get_account, idempotent=True, weight=20)
             logger.info(f"Binance ansluten (testnet={self.testnet}) | Status: {account['status']}")
             return True
         except Exception as e:
@@ -27,7 +37,7 @@ class BinanceBroker(BaseBroker):
             return False
 
     def get_balance(self) -> float:
-        account = self.client.get_account()
+        account = self.transport.call(self.client.get_account, idempotent=True, weight=20)
         for balance in account["balances"]:
             if balance["asset"] == "USDT":
                 return float(balance["free"])
@@ -35,13 +45,13 @@ class BinanceBroker(BaseBroker):
 
     def get_positions(self) -> dict[str, Position]:
         positions = {}
-        account = self.client.get_account()
+        account = self.transport.call(self.client.get_account, idempotent=True, weight=20)
         for balance in account["balances"]:
             qty = float(balance["free"]) + float(balance["locked"])
             if qty > 0 and balance["asset"] not in ("USDT", "USD"):
                 symbol = balance["asset"] + "USDT"
                 try:
-                    ticker = self.client.get_symbol_ticker(symbol=symbol)
+                    ticker = self.transport.call(self.client.get_symbol_ticker, symbol=symbol, idempotent=True, weight=2)
                     current_price = float(ticker["price"])
                 except Exception:
                     current_price = 0.0
@@ -54,16 +64,19 @@ class BinanceBroker(BaseBroker):
         return positions
 
     def place_order(self, symbol: str, side: OrderSide, quantity: float, price: float) -> Order:
+        # Konvertera symbol-format: BTC-USD → BTCUSDT
+        binance_symbol = symbol.replace("-USD", "USDT").replace("-", "")
+        client_order_id = uuid.uuid4().hex
         try:
-            # Konvertera symbol-format: BTC-USD → BTCUSDT
-            binance_symbol = symbol.replace("-USD", "USDT").replace("-", "")
 
             binance_side = "BUY" if side == OrderSide.BUY else "SELL"
-            result = self.client.create_order(
+            result = self.transport.call(
+                self.client.create_order,
                 symbol=binance_symbol,
                 side=binance_side,
                 type="MARKET",
                 quantity=self._format_quantity(binance_symbol, quantity),
+                newClientOrderId=client_order_id,
             )
             status = self._map_status(result["status"])
             filled_price = float(result.get("fills", [{}])[0].get("price", price)) if result.get("fills") else price
@@ -77,6 +90,18 @@ class BinanceBroker(BaseBroker):
                 timestamp=datetime.now(),
                 order_id=str(result["orderId"]),
             )
+        except OrderOutcomeUnknownError as e:
+            logger.error(f"Binance order utan svar, stäms av senare: {e}")
+            self._client_orders[client_order_id] = binance_symbol
+            return Order(
+                symbol=symbol,
+                side=side,
+                quantity=quantity,
+                price=price,
+                status=OrderStatus.UNKNOWN,
+                timestamp=datetime.now(),
+                order_id=client_order_id,
+            )
         except Exception as e:
             logger.error(f"Binance order misslyckades: {e}")
             return Order(
@@ -89,8 +114,23 @@ class BinanceBroker(BaseBroker):
             )
 
     def get_order_status(self, order_id: str) -> OrderStatus:
-        # Binance kräver symbol för att hämta order — förenklad implementation
-        return OrderStatus.FILLED
+        binance_symbol = self._client_orders.get(order_id)
+        if binance_symbol is None:
+            # Binance kräver symbol för att hämta order — förenklad implementation
+            return OrderStatus.FILLED
+        try:
+            result = self.transport.call(self.client.get_order, symbol=binance_symbol, origClientOrderId=order_id,
+                                         idempotent=True, weight=4)
+        except Exception as e:
+            # -2013: ordern finns inte, den kom aldrig fram. Andra fel säger inget om utfallet
+            if getattr(e, "code", None) == -2013:
+                del self._client_orders[order_id]
+                return OrderStatus.REJECTED
+            return OrderStatus.UNKNOWN
+        status = self._map_status(result["status"])
+        if status != OrderStatus.PENDING:
+            del self._client_orders[order_id]
+        return status
 
     def cancel_order(self, order_id: str) -> bool:
         try:
@@ -101,7 +141,7 @@ class BinanceBroker(BaseBroker):
 
     def _format_quantity(self, symbol: str, quantity: float) -> str:
         try:
-            info = self.client.get_symbol_info(symbol)
+            info = self.transport.call(self.client.get_symbol_info, symbol, idempotent=True, weight=20)
             for f in info["filters"]:
                 if f["filterType"] == "LOT_SIZE":
                     step = float(f["stepSize"])
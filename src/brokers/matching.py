@@ -0,0 +1,181 @@
+import heapq
+import itertools
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime
+
+from .base import Order, OrderSide, OrderType
+
+
+@dataclass
+class SimulationConfig:
+    slippage_bps: float = 0.0          # Glidning för market- och stop-ordrar, i baspunkter
+    latency_seconds: float = 0.0       # Tid innan en order kan matchas
+    volume_participation: float = 1.0  # Max andel av barens volym som får fyllas
+
+    @classmethod
+    def from_config(cls, config: dict) -> "SimulationConfig":
+        return cls(
+            slippage_bps=config.get("slippage_bps", 0.0),
+            latency_seconds=config.get("latency_seconds", 0.0),
+            volume_participation=config.get("volume_participation", 1.0),
+        )
+
+
+@dataclass(slots=True)
+class Fill:
+    order_id: str
+    symbol: str
+    side: OrderSide
+    quantity: float
+    price: float
+    timestamp: datetime
+
+
+class _Resting:
+    __slots__ = ("order", "limit_price", "stop_price", "active_at")
+
+    def __init__(self, order: Order, limit_price: float, stop_price: float, active_at: float):
+        self.order = order
+        self.limit_price = limit_price
+        self.stop_price = stop_price
+        self.active_at = active_at
+
+
+class SymbolBook:
+    __slots__ = ("bids", "asks", "buy_stops", "sell_stops", "market", "delayed")
+
+    def __init__(self):
+        # Heapar med (sorteringspris, sekvens, order_id); annullerade ordrar tas bort lat
+        self.bids: list[tuple[float, int, str]] = []        # -limit, högst pris först
+        self.asks: list[tuple[float, int, str]] = []        # limit, lägst pris först
+        self.buy_stops: list[tuple[float, int, str]] = []   # stop, triggas när priset stiger
+        self.sell_stops: list[tuple[float, int, str]] = []  # -stop, triggas när priset faller
+        self.market: list[tuple[int, str]] = []             # market/triggade stops i FIFO-ordning
+        self.delayed: list[tuple[float, int, str]] = []     # (active_at, seq, id) för latens
+
+
+class MatchingEngine:
+
+    def __init__(self, on_fill: Callable[[Order, float, float], float],
+                 config: SimulationConfig | None = None):
+        # on_fill(order, quantity, price) bokför fyllnaden och returnerar hur mycket som accepterades
+        self.on_fill = on_fill
+        self.config = config or SimulationConfig()
+        self.books: dict[str, SymbolBook] = {}
+        self.resting: dict[str, _Resting] = {}
+        self._seq = itertools.count()
+
+    def submit(self, order: Order, limit_price: float = 0.0, stop_price: float = 0.0):
+        book = self.books.get(order.symbol)
+        if book is None:
+            book = self.books[order.symbol] = SymbolBook()
+        seq = next(self._seq)
+        latency = self.config.latency_seconds
+        if latency > 0:
+            # datetime.timestamp() är dyrt, räkna bara ut det när latens faktiskt används
+            entry = _Resting(order, limit_price, stop_price, order.timestamp.timestamp() + latency)
+            heapq.heappush(book.delayed, (entry.active_at, seq, order.order_id))
+        else:
+            entry = _Resting(order, limit_price, stop_price, 0.0)
+            self._activate(book, entry, seq)
+        self.resting[order.order_id] = entry
+
+    def cancel(self, order_id: str) -> bool:
+        # Posten ligger kvar i heapen men hoppas över vid matchning
+        return self.resting.pop(order_id, None) is not None
+
+    def open_orders(self, symbol: str | None = None) -> list[Order]:
+        return [e.order for e in self.resting.values() if symbol is None or e.order.symbol == symbol]
+
+    def match(self, symbol: str, open_: float, high: float, low: float, close: float,
+              volume: float = 0.0, timestamp: datetime | None = None) -> list[Fill]:
+        book = self.books.get(symbol)
+        if book is None:
+            return []
+        timestamp = timestamp or datetime.now()
+
+        if book.delayed:
+            now = timestamp.timestamp()
+            while book.delayed and book.delayed[0][0] <= now:
+                _, seq, order_id = heapq.heappop(book.delayed)
+                entry = self.resting.get(order_id)
+                if entry is not None:
+                    self._activate(book, entry, seq)
+
+        budget = volume * self.config.volume_participation if volume > 0 else float("inf")
+        fills: list[Fill] = []
+        slip = self.config.slippage_bps / 10000
+
+        # Stops triggas först och läggs sist i market-kön
+        while book.buy_stops and book.buy_stops[0][0] <= high:
+            self._trigger(book, heapq.heappop(book.buy_stops))
+        while book.sell_stops and -book.sell_stops[0][0] >= low:
+            self._trigger(book, heapq.heappop(book.sell_stops))
+
+        # Market-ordrar och triggade stops fylls först, till öppningspris (eller stop-nivån vid gap)
+        while book.market and budget > 0:
+            order_id = book.market[0][1]
+            entry = self.resting.get(order_id)
+            if entry is None:
+                heapq.heappop(book.market)
+                continue
+            side = entry.order.side
+            base = open_
+            if entry.stop_price:
+                base = max(open_, entry.stop_price) if side == OrderSide.BUY else min(open_, entry.stop_price)
+            price = base * (1 + slip) if side == OrderSide.BUY else base * (1 - slip)
+            budget = self._fill(entry, price, budget, timestamp, fills)
+            if order_id not in self.resting:
+                heapq.heappop(book.market)
+
+        # Limit-ordrar i prisprioritet; fyllnadspris aldrig sämre än limit
+        while book.bids and budget > 0 and -book.bids[0][0] >= low:
+            order_id = book.bids[0][2]
+            entry = self.resting.get(order_id)
+            if entry is not None:
+                budget = self._fill(entry, min(open_, entry.limit_price), budget, timestamp, fills)
+            if order_id not in self.resting:
+                heapq.heappop(book.bids)
+        while book.asks and budget > 0 and book.asks[0][0] <= high:
+            order_id = book.asks[0][2]
+            entry = self.resting.get(order_id)
+            if entry is not None:
+                budget = self._fill(entry, max(open_, entry.limit_price), budget, timestamp, fills)
+            if order_id not in self.resting:
+                heapq.heappop(book.asks)
+
+        return fills
+
+    def _activate(self, book: SymbolBook, entry: _Resting, seq: int):
+        order = entry.order
+        if order.order_type == OrderType.LIMIT:
+            if order.side == OrderSide.BUY:
+                heapq.heappush(book.bids, (-entry.limit_price, seq, order.order_id))
+            else:
+                heapq.heappush(book.asks, (entry.limit_price, seq, order.order_id))
+        elif order.order_type == OrderType.STOP:
+            if order.side == OrderSide.BUY:
+                heapq.heappush(book.buy_stops, (entry.stop_price, seq, order.order_id))
+            else:
+                heapq.heappush(book.sell_stops, (-entry.stop_price, seq, order.order_id))
+        else:
+            heapq.heappush(book.market, (seq, order.order_id))
+
+    def _trigger(self, book: SymbolBook, item: tuple[float, int, str]):
+        if item[2] in self.resting:
+            heapq.heappush(book.market, (item[1], item[2]))
+
+    def _fill(self, entry: _Resting, price: float, budget: float, timestamp: datetime,
+              fills: list[Fill]) -> float:
+        order = entry.order
+        remaining = order.quantity - order.filled_quantity
+        quantity = remaining if remaining < budget else budget
+        accepted = self.on_fill(order, quantity, price)
+        if accepted > 0:
+            fills.append(Fill(order.order_id, order.symbol, order.side, accepted, price, timestamp))
+            order.filled_quantity += accepted
+        # Avvisad eller färdig order lämnar boken; heap-posten städas bort lat
+        if accepted < quantity or accepted >= remaining:
+            del self.resting[order.order_id]
+        return budget - accepted
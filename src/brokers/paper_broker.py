@@ -1,17 +1,37 @@
-import uuid
+import itertools
+from collections import deque
+from collections.abc import Callable
 from datetime import datetime
 
-from .base import BaseBroker, Order, OrderSide, OrderStatus, Position
+from .base import BaseBroker, Order, OrderSide, OrderStatus, OrderType, Position
+from .matching import Fill, MatchingEngine, SimulationConfig
+from .retention import OrderArchive, RetentionPolicy
 
 
 class PaperBroker(BaseBroker):
 
-    def __init__(self, initial_balance: float = 100000.0):
+    def __init__(self, initial_balance: float = 100000.0, simulation: SimulationConfig | None = None,
+                 retention: RetentionPolicy | None = None):
         self.cash = initial_balance
         self.initial_balance = initial_balance
         self.positions: dict[str, Position] = {}
+        # Väntande ordrar ligger alltid kvar; avslutade begränsas av retention-policyn
+        self.retention = retention or RetentionPolicy()
         self.orders: dict[str, Order] = {}
-        self.trade_history: list[Order] = []
+        self.trade_history: deque[Order] = deque(maxlen=self.retention.max_history)
+        self.archive = OrderArchive(self.retention.archive_path) if self.retention.archive_path else None
+        self._terminal: deque[str] = deque()
+        self.evicted_orders = 0
+        self.simulation = simulation or SimulationConfig()
+        self.matching = MatchingEngine(self._apply_book_fill, self.simulation)
+        # fill_listener(order, quantity, price, avg_price) för fyllnader som sker efter place_order
+        self.fill_listeners: list[Callable[[Order, float, float, float], None]] = []
+        # Räknare i stället för uuid — förkortade uuid:er kolliderar vid miljontals simulerade ordrar
+        self._order_ids = itertools.count(1)
+        self.last_order_number = 0
+        # Tidskälla för ordrar och matchning; backtestet sätter den simulerade klockan så att latens
+        # mäts i bartid och inte i väggklocka
+        self.clock: Callable[[], datetime] = datetime.now
 
     def connect(self) -> bool:
         return True
@@ -26,66 +46,190 @@ class PaperBroker(BaseBroker):
     def get_positions(self) -> dict[str, Position]:
         return self.positions.copy()
 
-    def place_order(self, symbol: str, side: OrderSide, quantity: float, price: float) -> Order:
-        order_id = str(uuid.uuid4())[:8]
-        order = Order(
-            symbol=symbol,
-            side=side,
-            quantity=quantity,
-            price=price,
-            status=OrderStatus.PENDING,
-            timestamp=datetime.now(),
-            order_id=order_id,
-        )
+    def get_position(self, symbol: str) -> Position | None:
+        return self.positions.get(symbol)
 
-        if side == OrderSide.BUY:
-            cost = quantity * price
-            if cost > self.cash:
-                order.status = OrderStatus.REJECTED
-                self.orders[order_id] = order
-                return order
-            self.cash -= cost
-            if symbol in self.positions:
-                pos = self.positions[symbol]
-                total_qty = pos.quantity + quantity
-                pos.avg_price = (pos.avg_price * pos.quantity + price * quantity) / total_qty
-                pos.quantity = total_qty
-            else:
-                self.positions[symbol] = Position(
-                    symbol=symbol,
-                    quantity=quantity,
-                    avg_price=price,
-                    current_price=price,
-                )
-
-        elif side == OrderSide.SELL:
-            if symbol not in self.positions or self.positions[symbol].quantity < quantity:
-                order.status = OrderStatus.REJECTED
-                self.orders[order_id] = order
-                return order
-            self.cash += quantity * price
-            pos = self.positions[symbol]
-            pos.quantity -= quantity
-            if pos.quantity <= 0:
-                del self.positions[symbol]
+    def place_order(self, symbol: str, side: OrderSide, quantity: float, price: float,
+                    timestamp: datetime | None = None) -> Order:
+        order = self._new_order(symbol, side, quantity, price, OrderType.MARKET, timestamp)
 
+        # Med latens vilar market-ordern tills nästa bar/tick efter fördröjningen
+        if self.simulation.latency_seconds > 0:
+            self.matching.submit(order)
+            return order
+
+        slip = self.simulation.slippage_bps / 10000
+        fill_price = price * (1 + slip) if side == OrderSide.BUY else price * (1 - slip)
+        if self._apply_fill(order, quantity, fill_price) < quantity:
+            return order
+
+        order.price = fill_price
+        order.filled_quantity = quantity
         order.status = OrderStatus.FILLED
-        self.orders[order_id] = order
-        self.trade_history.append(order)
+        self._complete(order)
+        return order
+
+    def place_limit_order(self, symbol: str, side: OrderSide, quantity: float, limit_price: float,
+                          timestamp: datetime | None = None) -> Order:
+        order = self._new_order(symbol, side, quantity, limit_price, OrderType.LIMIT, timestamp)
+        self.matching.submit(order, limit_price=limit_price)
+        return order
+
+    def place_stop_order(self, symbol: str, side: OrderSide, quantity: float, stop_price: float,
+                         timestamp: datetime | None = None) -> Order:
+        order = self._new_order(symbol, side, quantity, stop_price, OrderType.STOP, timestamp)
+        self.matching.submit(order, stop_price=stop_price)
         return order
 
+    def process_bar(self, symbol: str, open_: float, high: float, low: float, close: float,
+                    volume: float = 0.0, timestamp: datetime | None = None) -> list[Fill]:
+        fills = self.matching.match(symbol, open_, high, low, close, volume, timestamp or self.clock())
+        for fill in fills:
+            order = self.orders.get(fill.order_id)
+            if order is not None and order.status == OrderStatus.PENDING and order.filled_quantity >= order.quantity:
+                order.status = OrderStatus.FILLED
+                self._complete(order)
+        self._mark_price(symbol, close)
+        return fills
+
+    def process_tick(self, symbol: str, price: float, volume: float = 0.0,
+                     timestamp: datetime | None = None) -> list[Fill]:
+        return self.process_bar(symbol, price, price, price, price, volume, timestamp)
+
+    def get_open_orders(self, symbol: str | None = None) -> list[Order]:
+        return self.matching.open_orders(symbol)
+
     def get_order_status(self, order_id: str) -> OrderStatus:
         if order_id in self.orders:
             return self.orders[order_id].status
+        archived = self.archive.find(order_id) if self.archive else None
+        if archived:
+            return archived.status
+        # Utrensad utan arkiv: ordern fanns men hur den slutade är okänt — inte "annullerad"
+        if order_id.isdigit() and 0 < int(order_id) <= self.last_order_number:
+            return OrderStatus.UNKNOWN
         return OrderStatus.CANCELLED
 
     def cancel_order(self, order_id: str) -> bool:
         if order_id in self.orders and self.orders[order_id].status == OrderStatus.PENDING:
+            self.matching.cancel(order_id)
             self.orders[order_id].status = OrderStatus.CANCELLED
+            self._retire(self.orders[order_id])
             return True
         return False
 
+    def memory_stats(self) -> dict:
+        return {
+            "orders": len(self.orders),
+            "open_orders": len(self.matching.resting),
+            "trade_history": len(self.trade_history),
+            "evicted_orders": self.evicted_orders,
+            "archived_orders": self.archive.count if self.archive else 0,
+        }
+
+    def close(self):
+        if self.archive:
+            self.archive.flush()
+
     def update_prices(self, prices: dict[str, float]):
         for symbol, price in prices.items():
-            if symbol in self.positions:
-                self.positions[symbol].current_price = price
+            if symbol in self.matching.books:
+                self.process_tick(symbol, price)
+            else:
+                self._mark_price(symbol, price)
+
+    def _new_order(self, symbol: str, side: OrderSide, quantity: float, price: float,
+                   order_type: OrderType, timestamp: datetime | None) -> Order:
+        order = Order(
+            symbol=symbol,
+            side=side,
+            quantity=quantity,
+            price=price,
+            status=OrderStatus.PENDING,
+            timestamp=timestamp or self.clock(),
+            order_id=f"{self._next_order_number():08d}",
+            order_type=order_type,
+        )
+        self.orders[order.order_id] = order
+        return order
+
+    def _next_order_number(self) -> int:
+        self.last_order_number = next(self._order_ids)
+        return self.last_order_number
+
+    def _apply_book_fill(self, order: Order, quantity: float, price: float) -> float:
+        # Fyllnader från orderboken (latens, limit, stop) når inte den som lade ordern; lyssnarna
+        # får dem med snittpriset före fyllnaden så att realiserad P&L kan räknas
+        pos = self.get_position(order.symbol)
+        avg_price = pos.avg_price if pos else price
+        accepted = self._apply_fill(order, quantity, price)
+        if accepted > 0:
+            for listener in self.fill_listeners:
+                listener(order, accepted, price, avg_price)
+        return accepted
+
+    def _apply_fill(self, order: Order, quantity: float, price: float) -> float:
+        if order.side == OrderSide.BUY:
+            cost = quantity * price
+            if cost > self.cash:
+                self._reject(order)
+                return 0.0
+            self.cash -= cost
+            self._add_to_position(order.symbol, quantity, price)
+        else:
+            if not self._remove_from_position(order.symbol, quantity):
+                self._reject(order)
+                return 0.0
+            self.cash += quantity * price
+        return quantity
+
+    # Positionsboken nedan kan bytas ut av subklasser (se ArrayPaperBroker)
+
+    def _add_to_position(self, symbol: str, quantity: float, price: float):
+        if symbol in self.positions:
+            pos = self.positions[symbol]
+            total_qty = pos.quantity + quantity
+            pos.avg_price = (pos.avg_price * pos.quantity + price * quantity) / total_qty
+            pos.quantity = total_qty
+        else:
+            self.positions[symbol] = Position(
+                symbol=symbol,
+                quantity=quantity,
+                avg_price=price,
+                current_price=price,
+            )
+
+    def _remove_from_position(self, symbol: str, quantity: float) -> bool:
+        if symbol not in self.positions or self.positions[symbol].quantity < quantity:
+            return False
+        pos = self.positions[symbol]
+        pos.quantity -= quantity
+        if pos.quantity <= 0:
+            del self.positions[symbol]
+        return True
+
+    def _mark_price(self, symbol: str, price: float):
+        if symbol in self.positions:
+            self.positions[symbol].current_price = price
+
+    def _reject(self, order: Order):
+        # Delfylld order som inte kan fortsätta räknas som annullerad, inte avvisad
+        order.status = OrderStatus.CANCELLED if order.filled_quantity > 0 else OrderStatus.REJECTED
+        self._retire(order)
+
+    def _complete(self, order: Order):
+        self.trade_history.append(order)
+        self._retire(order)
+
+    def _retire(self, order: Order):
+        # Avslutad order: behålls för statusuppslag tills gränsen nås, sedan arkiveras den äldsta
+        if order.status == OrderStatus.REJECTED and not self.retention.keep_rejected:
+            self.orders.pop(order.order_id, None)
+            return
+        self._terminal.append(order.order_id)
+        while len(self._terminal) > self.retention.max_orders:
+            evicted = self.orders.pop(self._terminal.popleft(), None)
+            if evicted is not None:
+                self.evicted_orders += 1
+                if self.archive:
+                    self.archive.append(evicted)
@@ -0,0 +1,154 @@
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from enum import IntEnum
+
+from .transport import TransportError
+
+
+class RateLimitExceeded(TransportError):
+    pass
+
+
+class RequestPriority(IntEnum):
+    # Lägre värde = högre prioritet
+    STOP_LOSS = 0
+    ORDER = 1
+    READ = 2
+
+
+# Standardbudgetar per broker: (kapacitet, påfyllning per sekund)
+DEFAULT_LIMITS = {
+    "binance": (1200, 20.0),   # Request weight per minut
+    "alpaca": (200, 200 / 60),  # Anrop per minut
+    "avanza": (60, 1.0),        # Inofficiell strypning, håll marginal
+}
+
+_context = threading.local()
+
+
+@contextmanager
+def request_priority(priority: RequestPriority):
+    previous = getattr(_context, "priority", None)
+    _context.priority = priority
+    try:
+        yield
+    finally:
+        _context.priority = previous
+
+
+def current_priority() -> RequestPriority | None:
+    return getattr(_context, "priority", None)
+
+
+def resolve_priority(priority: RequestPriority | None, idempotent: bool) -> RequestPriority:
+    if priority is not None:
+        return priority
+    priority = current_priority()
+    if priority is not None:
+        return priority
+    return RequestPriority.READ if idempotent else RequestPriority.ORDER
+
+
+class TokenBucket:
+
+    def __init__(self, capacity: float, refill_rate: float):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+
+    def time_until(self, amount: float) -> float:
+        missing = amount - self.tokens
+        if missing <= 0:
+            return 0.0
+        if self.refill_rate <= 0:
+            return float("inf")
+        return missing / self.refill_rate
+
+
+class RateLimitScheduler:
+
+    def __init__(self, name: str, capacity: float, refill_rate: float,
+                 reserve: dict[RequestPriority, float] | None = None):
+        self.name = name
+        self.bucket = TokenBucket(capacity, refill_rate)
+        # Andel av kapaciteten som lägre prioriteter inte får röra, så att
+        # stop-loss och nya ordrar alltid har budget kvar
+        reserve = reserve if reserve is not None else {
+            RequestPriority.ORDER: 0.05,
+            RequestPriority.READ: 0.20,
+        }
+        self.reserve = {p: reserve.get(p, 0.0) * capacity for p in RequestPriority}
+        self._cond = threading.Condition()
+        self._waiting: list[tuple[int, int]] = []
+        self._seq = itertools.count()
+        self.used = {p: 0.0 for p in RequestPriority}
+        self.throttled = 0
+
+    @classmethod
+    def for_broker(cls, name: str, config: dict | None = None) -> "RateLimitScheduler":
+        config = config or {}
+        capacity, refill_rate = DEFAULT_LIMITS.get(name, (60, 1.0))
+        return cls(
+            name=name,
+            capacity=config.get("capacity", capacity),
+            refill_rate=config.get("refill_per_second", refill_rate),
+        )
+
+    def acquire(self, weight: float = 1.0, priority: RequestPriority | None = None,
+                idempotent: bool = True, timeout: float | None = None) -> float:
+        if weight > self.bucket.capacity:
+            # Ett sådant anrop ryms aldrig i hinken och skulle driva den negativ
+            raise ValueError(f"{self.name}: vikten {weight} överstiger kapaciteten {self.bucket.capacity}")
+        priority = resolve_priority(priority, idempotent)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        needed = min(weight + self.reserve[priority], self.bucket.capacity)
+        ticket = (int(priority), next(self._seq))
+        waited_from = time.monotonic()
+        throttled = False
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    self.bucket.refill()
+                    if self._waiting[0] == ticket and self.bucket.tokens >= needed:
+                        self.bucket.tokens -= weight
+                        self.used[priority] += weight
+                        break
+                    wait = self.bucket.time_until(needed) if self._waiting[0] == ticket else None
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise RateLimitExceeded(
+                                f"{self.name}: ingen API-budget för {priority.name} inom {timeout:.1f}s")
+                        wait = remaining if wait is None else min(wait, remaining)
+                    if not throttled:
+                        throttled = True
+                        self.throttled += 1
+                    self._cond.wait(wait)
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+        return time.monotonic() - waited_from
+
+    def usage(self) -> dict:
+        with self._cond:
+            self.bucket.refill()
+            return {
+                "broker": self.name,
+                "capacity": self.bucket.capacity,
+                "available": round(self.bucket.tokens, 2),
+                "used_pct": round((1 - self.bucket.tokens / self.bucket.capacity) * 100, 1),
+                "queued": len(self._waiting),
+                "throttled": self.throttled,
+                "used_by_priority": {p.name.lower(): round(v, 2) for p, v in self.used.items()},
+            }
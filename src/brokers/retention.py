@@ -0,0 +1,66 @@
+import json
+import os
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import datetime
+
+from .base import Order, OrderSide, OrderStatus, OrderType
+
+
+@dataclass(slots=True)
+class RetentionPolicy:
+    max_orders: int = 10000          # Avslutade ordrar som hålls i minnet för statusuppslag
+    max_history: int = 1000          # Senaste fyllda ordrar i trade_history
+    keep_rejected: bool = False      # Avvisade ordrar släpps direkt; anroparen har redan fått dem
+    archive_path: str | None = None  # Äldre avslutade ordrar skrivs hit i stället för att kastas
+
+    @classmethod
+    def from_config(cls, config: dict) -> "RetentionPolicy":
+        return cls(
+            max_orders=config.get("max_orders", 10000),
+            max_history=config.get("max_history", 1000),
+            keep_rejected=config.get("keep_rejected", False),
+            archive_path=config.get("archive_path"),
+        )
+
+
+class OrderArchive:
+
+    def __init__(self, path: str, batch_size: int = 256):
+        # En kompakt JSON-array per order, skriven i omgångar
+        self.path = path
+        self.batch_size = batch_size
+        self.count = 0
+        self._pending: list[str] = []
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def append(self, order: Order):
+        self._pending.append(json.dumps([
+            order.order_id, order.symbol, order.side.value, order.quantity, order.price, order.status.value,
+            order.timestamp.isoformat(), order.order_type.value, order.filled_quantity,
+        ], separators=(",", ":")))
+        self.count += 1
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("\n".join(self._pending) + "\n")
+        self._pending.clear()
+
+    def __iter__(self) -> Iterator[Order]:
+        self.flush()
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                order_id, symbol, side, quantity, price, status, timestamp, order_type, filled = json.loads(line)
+                yield Order(symbol, OrderSide(side), quantity, price, OrderStatus(status),
+                            datetime.fromisoformat(timestamp), order_id, OrderType(order_type), filled)
+
+    def find(self, order_id: str) -> Order | None:
+        # Linjär sökning — bara för sällsynta uppslag av ordrar som lämnat minnet
+        return next((order for order in self if order.order_id == order_id), None)
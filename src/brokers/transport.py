@@ -0,0 +1,239 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from enum import Enum
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.utils.tracing import span
+
+logger = logging.getLogger("trading-bot")
+
+
+class TransportError(Exception):
+    pass
+
+
+class BrokerTimeoutError(TransportError):
+    pass
+
+
+class CircuitOpenError(TransportError):
+    pass
+
+
+class OrderOutcomeUnknownError(TransportError):
+    # Ett icke-idempotent anrop (en order) kan ha nått brokern trots felet — anroparen måste
+    # stämma av mot orderstatus i stället för att anta att ordern inte lades
+    pass
+
+
+class CircuitState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+@dataclass
+class RetryPolicy:
+    max_retries: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+    jitter: float = 0.5
+
+    def delay(self, attempt: int) -> float:
+        # Exponentiell backoff med slumpmässig jitter så att flera anrop inte synkas
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return delay * (1 - self.jitter + random.random() * self.jitter)
+
+
+class CircuitBreaker:
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+        self._state = CircuitState.CLOSED
+        # Sant medan HALF_OPEN-läget har släppt igenom sitt enda provanrop
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> CircuitState:
+        with self._lock:
+            return self._advance()
+
+    def _advance(self) -> CircuitState:
+        if self._state == CircuitState.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self._state = CircuitState.HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            state = self._advance()
+            if state == CircuitState.HALF_OPEN:
+                # Ett enda provanrop; övriga avvisas tills det har lyckats eller misslyckats
+                if self._probing:
+                    return False
+                self._probing = True
+            return state != CircuitState.OPEN
+
+    def release(self):
+        # Provanropet skickades aldrig (t.ex. rate limit) — nästa anrop får prova i stället
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._state = CircuitState.CLOSED
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self._state == CircuitState.HALF_OPEN or self.failures >= self.failure_threshold:
+                self._state = CircuitState.OPEN
+                self.opened_at = time.monotonic()
+
+
+def is_transport_error(error: Exception) -> bool:
+    # Bara transportfel (timeout, anslutning, 5xx) räknas mot circuit breakern och görs om.
+    # 4xx och affärsmässiga avslag ger samma svar igen och betyder att brokern faktiskt svarar
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return status >= 500
+    return isinstance(error, (TransportError, TimeoutError, OSError))
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+
+    def __init__(self, *args, timeout: float | tuple[float, float] | None = None, **kwargs):
+        # requests saknar sessionsbred timeout — utan den kan ett hängt SDK-anrop hålla en tråd för alltid
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, timeout=None, **kwargs):
+        return super().send(request, timeout=self.timeout if timeout is None else timeout, **kwargs)
+
+
+def create_session(pool_size: int = 10, user_agent: str = "trading-bot",
+                   timeout: float | tuple[float, float] | None = (3.0, 10.0)) -> requests.Session:
+    session = requests.Session()
+    configure_session(session, pool_size, timeout)
+    session.headers.setdefault("User-Agent", user_agent)
+    return session
+
+
+def configure_session(session: requests.Session, pool_size: int = 10,
+                      timeout: float | tuple[float, float] | None = (3.0, 10.0)) -> requests.Session:
+    # Poolade keep-alive-anslutningar med (connect, read)-timeout på socketnivå;
+    # retries hanteras av BrokerTransport, inte urllib3
+    adapter = TimeoutHTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0, timeout=timeout)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class BrokerTransport:
+
+    def __init__(self, name: str, timeout: float = 10.0, retry: RetryPolicy | None = None,
+                 breaker: CircuitBreaker | None = None, max_workers: int = 4, scheduler=None,
+                 connect_timeout: float = 3.0, read_timeout: float | None = None):
+        self.name = name
+        # timeout är en yttre gräns per anrop; socket_timeout ska sättas på brokerns session
+        # (configure_session) så att hängda anrop faktiskt avbryts och frigör sin tråd
+        self.timeout = timeout
+        self.socket_timeout = (connect_timeout, read_timeout or timeout)
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.scheduler = scheduler
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-transport")
+
+    @classmethod
+    def from_config(cls, name: str, config: dict, scheduler=None) -> "BrokerTransport":
+        return cls(
+            name=name,
+            timeout=config.get("timeout", 10.0),
+            connect_timeout=config.get("connect_timeout", 3.0),
+            read_timeout=config.get("read_timeout"),
+            retry=RetryPolicy(
+                max_retries=config.get("max_retries", 3),
+                base_delay=config.get("backoff_base", 0.5),
+                max_delay=config.get("backoff_max", 8.0),
+            ),
+            breaker=CircuitBreaker(
+                failure_threshold=config.get("failure_threshold", 5),
+                reset_timeout=config.get("reset_timeout", 30.0),
+            ),
+            scheduler=scheduler,
+        )
+
+    def call(self, fn, *args, idempotent: bool = False, timeout: float | None = None,
+             priority=None, weight: float = 1.0, **kwargs):
+        # Endast idempotenta läsningar får göras om — en order ska aldrig skickas två gånger
+        attempts = self.retry.max_retries + 1 if idempotent else 1
+        with span("broker.call", broker=self.name, call=getattr(fn, "__name__", str(fn))) as s:
+            for attempt in range(attempts):
+                s.set(attempts=attempt + 1)
+                if not self.breaker.allow_request():
+                    raise CircuitOpenError(f"{self.name}: circuit breaker öppen")
+                if self.scheduler is not None:
+                    try:
+                        self.scheduler.acquire(weight, priority=priority, idempotent=idempotent,
+                                               timeout=timeout or self.timeout)
+                    except Exception:
+                        self.breaker.release()
+                        raise
+                try:
+                    result = self._run_with_timeout(fn, args, kwargs, timeout or self.timeout)
+                except Exception as e:
+                    if not is_transport_error(e):
+                        # Brokern svarade, men nekade — inget fel i transporten och inget att göra om
+                        self.breaker.record_success()
+                        raise
+                    self.breaker.record_failure()
+                    if not idempotent and not isinstance(e, requests.ConnectTimeout):
+                        # Timeout eller 5xx efter att ordern skickats: den kan ha lagts ändå
+                        raise OrderOutcomeUnknownError(f"{self.name}: okänt utfall för anropet ({e})") from e
+                    if attempt + 1 >= attempts:
+                        raise
+                    delay = self.retry.delay(attempt)
+                    logger.warning(f"{self.name}: anrop misslyckades ({e}), försöker igen om {delay:.2f}s")
+                    time.sleep(delay)
+                else:
+                    self.breaker.record_success()
+                    return result
+
+    def _run_with_timeout(self, fn, args, kwargs, timeout: float):
+        future = self._executor.submit(fn, *args, **kwargs)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # Yttre skydd: ett anrop som redan körs kan inte avbrytas och håller sin tråd tills
+            # socket-timeouten slår till
+            if not future.cancel():
+                logger.warning(f"{self.name}: anropet fortsätter i bakgrunden efter {timeout:.1f}s")
+            raise BrokerTimeoutError(f"{self.name}: anrop tog längre än {timeout:.1f}s")
+
+    def status(self) -> dict:
+        status = {
+            "broker": self.name,
+            "circuit": self.breaker.state.value,
+            "failures": self.breaker.failures,
+        }
+        if self.scheduler is not None:
+            status["rate_limit"] = self.scheduler.usage()
+        return status
+
+    def close(self):
+        self._executor.shutdown(wait=False)
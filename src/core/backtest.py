@@ -0,0 +1,134 @@
+import logging
+from collections.abc import Callable
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from src.brokers.matching import SimulationConfig
+from src.brokers.paper_broker import PaperBroker
+from src.core.engine import TradingEngine
+from src.core.equity import lttb
+from src.core.risk import RiskManager
+from src.data.source import MarketDataSource, create_data_source, lookback_days
+from src.strategies.base import BaseStrategy
+
+logger = logging.getLogger("trading-bot")
+
+
+class BacktestCancelled(Exception):
+    pass
+
+
+class ReplaySource(MarketDataSource):
+
+    def __init__(self, frames: dict[str, pd.DataFrame]):
+        # Förladdad historik; allt efter markören är osynligt för motorn
+        self.frames = frames
+        self._ends = {symbol: 0 for symbol in frames}
+
+    def set_time(self, as_of: pd.Timestamp):
+        for symbol, df in self.frames.items():
+            self._ends[symbol] = int(df.index.searchsorted(as_of, side="right"))
+
+    def get_historical(self, symbol: str, period: str = "3mo", interval: str = "1d") -> pd.DataFrame:
+        return self.frames[symbol].iloc[:self._ends[symbol]]
+
+    def get_recent(self, symbol: str, bars: int, interval: str = "1d") -> pd.DataFrame:
+        end = self._ends[symbol]
+        return self.frames[symbol].iloc[max(0, end - bars):end]
+
+    def get_current_price(self, symbol: str) -> float:
+        end = self._ends.get(symbol, 0)
+        if end == 0:
+            raise ValueError(f"Ingen data hittades för {symbol}")
+        return float(self.frames[symbol]["Close"].to_numpy()[end - 1])
+
+
+def load_frames(source: MarketDataSource, symbols: list[str], start: datetime, end: datetime,
+                warmup_bars: int, interval: str = "1d") -> dict[str, pd.DataFrame]:
+    # Hämtar testperioden plus strategins uppvärmning före start
+    days = (datetime.now() - start).days + lookback_days(warmup_bars, interval)
+    frames = {}
+    for symbol in symbols:
+        try:
+            df = source.get_historical(symbol, period=f"{days}d", interval=interval)
+        except ValueError as e:
+            logger.warning(f"Backtest: hoppar över {symbol}: {e}")
+            continue
+        index = df.index.tz_localize(None) if df.index.tz is not None else df.index
+        df = df.set_axis(index)
+        df = df.iloc[:int(index.searchsorted(pd.Timestamp(end), side="right"))]
+        if not df.empty:
+            frames[symbol] = df
+    return frames
+
+
+def max_drawdown(values: np.ndarray) -> float:
+    if not len(values):
+        return 0.0
+    peaks = np.maximum.accumulate(values)
+    return float(((values - peaks) / peaks).min())
+
+
+def run_backtest(strategy: BaseStrategy, symbols: list[str], start: datetime, end: datetime,
+                 data_config: dict | None = None, initial_balance: float = 100000.0,
+                 risk_config: dict | None = None, progress: Callable[[float], None] | None = None,
+                 cancelled: Callable[[], bool] | None = None, max_points: int = 500,
+                 simulation: SimulationConfig | None = None) -> dict:
+    source = create_data_source(data_config or {})
+    frames = load_frames(source, symbols, start, end, strategy.lookback or 100)
+    if not frames:
+        raise ValueError("Ingen data för någon av symbolerna i perioden")
+
+    replay = ReplaySource(frames)
+    bars = pd.DatetimeIndex(np.unique(np.concatenate([df.index.to_numpy() for df in frames.values()])))
+    bars = bars[bars >= pd.Timestamp(start)]
+    clock = {"now": start}
+    risk_config = risk_config or {}
+    risk = RiskManager(
+        max_position_pct=risk_config.get("max_position_pct", 0.10),
+        stop_loss_pct=risk_config.get("stop_loss_pct", 0.05),
+        daily_loss_limit_pct=risk_config.get("daily_loss_limit_pct", 0.03),
+        max_open_positions=risk_config.get("max_open_positions", 10),
+    )
+    # Dagsgränsen räknas per simulerad handelsdag, inte per väggklocka
+    risk.clock = lambda: clock["now"]
+    broker = PaperBroker(initial_balance=initial_balance, simulation=simulation)
+    broker.clock = risk.clock
+    engine = TradingEngine(broker, strategy, risk, replay, list(frames))
+
+    # Motorns cykelloggning tystas; ett år dagsdata är annars hundratals rader per symbol
+    engine_logger = logging.getLogger("trading-bot")
+    level = engine_logger.level
+    engine_logger.setLevel(logging.WARNING)
+    values = np.empty(len(bars), dtype=np.float64)
+    report_every = max(1, len(bars) // 100)
+    try:
+        for i, bar in enumerate(bars):
+            if cancelled and i % report_every == 0 and cancelled():
+                raise BacktestCancelled()
+            clock["now"] = bar.to_pydatetime()
+            replay.set_time(bar)
+            engine.run_once()
+            values[i] = broker.get_total_value()
+            if progress and (i + 1) % report_every == 0:
+                progress((i + 1) / len(bars))
+    finally:
+        engine_logger.setLevel(level)
+
+    portfolio = engine.portfolio
+    final_value = float(values[-1]) if len(values) else initial_balance
+    times = bars.to_numpy().astype("datetime64[us]")
+    keep = lttb(times.astype(np.int64), values, max_points)
+    return {
+        "symbols": list(frames),
+        "bars": len(bars),
+        "final_value": round(final_value, 2),
+        "return_pct": round((final_value - initial_balance) / initial_balance * 100, 2),
+        "max_drawdown_pct": round(max_drawdown(values) * 100, 2),
+        "trades": portfolio.get_trade_count(),
+        "win_rate": round(portfolio.get_win_rate() * 100, 1),
+        "equity": [{"time": t.replace("T", " "), "value": round(float(v), 2)}
+                   for t, v in zip(np.datetime_as_string(times[keep], unit="D"), values[keep])],
+    }
@@ -1,11 +1,21 @@
 import logging
+import threading
 import time
+from collections.abc import Callable
 
-from src.brokers.base import BaseBroker, OrderSide
+import pandas as pd
+
+from src.brokers.base import BaseBroker, Order, OrderSide, OrderStatus, Position
+from src.brokers.ratelimit import RequestPriority, request_priority
 from src.core.portfolio import Portfolio
-from src.core.risk import RiskManager
-from src.data.fetcher import DataFetcher
+from src.core.risk import AccountSnapshot, OrderCandidate, RiskManager
+from src.core.stop_monitor import StopMonitor
+from src.data.source import MarketDataSource
+from src.data.streaming import StreamingPipeline, Tick
 from src.strategies.base import BaseStrategy, Signal
+from src.utils.logger import log_trade
+from src.utils.memory import rss_mb
+from src.utils.tracing import span
 
 logger = logging.getLogger("trading-bot")
 
@@ -13,91 +23,318 @@ logger = logging.getLogger("trading-bot")
 class TradingEngine:
 
     def __init__(self, broker: BaseBroker, strategy: BaseStrategy, risk_manager: RiskManager,
-                 data_fetcher: DataFetcher, symbols: list[str]):
+                 data_fetcher: MarketDataSource, symbols: list[str], portfolio: Portfolio | None = None):
         self.broker = broker
         self.strategy = strategy
         self.risk_manager = risk_manager
         self.data_fetcher = data_fetcher
         self.symbols = symbols
-        self.portfolio = Portfolio()
+        self.portfolio = portfolio or Portfolio()
         self.running = False
+        # Delas med StopMonitor så att två trådar aldrig lägger ordrar samtidigt. Reentrant eftersom
+        # fördröjda fyllnader bokförs från brokerns callback medan anroparen redan håller låset
+        self.order_lock = threading.RLock()
+        self.stop_monitor = None
+        # Anropas efter varje cykel, t.ex. för att publicera tillstånd till dashboarden
+        self.cycle_listeners: list[Callable[[], None]] = []
+        self.cycle_count = 0
+        if hasattr(broker, "fill_listeners"):
+            broker.fill_listeners.append(self._on_deferred_fill)
+        # Stängningskurser per bartid i streaming-läget, se _update_bar_risk
+        self._bar_time = None
+        self._bar_closes: dict[str, float] = {}
+        # Innehav vid senaste bar; on_tick jämför varje tick mot deras stopnivå utan att fråga brokern
+        self._held: dict[str, Position] = {}
+        # Ordrar vars utfall är okänt (brokern svarade inte efter att ordern skickats), per symbol med
+        # snittpriset vid ordern. Symbolen handlas inte igen förrän ordern stämts av mot brokern
+        self._unresolved: dict[str, tuple[Order, float]] = {}
 
     def run_once(self):
+        with span("cycle", cycle=self.cycle_count, symbols=len(self.symbols),
+                  strategy=type(self.strategy).__name__):
+            self._run_cycle()
+        self._notify_cycle()
+
+    def _run_cycle(self):
         logger.info("=== Kör analyscykel ===")
 
         # Uppdatera priser
-        prices = self.data_fetcher.get_prices_bulk(self.symbols)
+        with span("fetch_prices", symbols=len(self.symbols)):
+            prices = self.data_fetcher.get_prices_bulk(self.symbols)
         if hasattr(self.broker, "update_prices"):
-            self.broker.update_prices(prices)
+            with self.order_lock:
+                self.broker.update_prices(prices)
+        if self.risk_manager.portfolio_risk:
+            self.risk_manager.portfolio_risk.update(prices)
+        if self._unresolved:
+            self._reconcile_orders()
 
-        # Kolla stop-loss
-        stop_loss_symbols = self.risk_manager.check_stop_loss(self.broker)
-        for symbol in stop_loss_symbols:
-            pos = self.broker.get_positions().get(symbol)
-            if pos:
-                logger.warning(f"STOP-LOSS: Säljer {symbol} (förlust: {pos.unrealized_pnl_pct:.1%})")
-                order = self.broker.place_order(symbol, OrderSide.SELL, pos.quantity, prices.get(symbol, pos.current_price))
-                if order.status.value == "filled":
-                    pnl = (prices.get(symbol, pos.current_price) - pos.avg_price) * pos.quantity
-                    self.portfolio.record_trade(symbol, OrderSide.SELL, pos.quantity, prices.get(symbol, pos.current_price), pnl)
+        # Kolla stop-loss — skyddande exits går före allt annat i brokerns API-budget.
+        # Med en aktiv StopMonitor sköts detta av dess egen, tätare loop.
+        if not (self.stop_monitor and self.stop_monitor.running):
+            with span("stop_loss"):
+                self._check_stop_loss(prices)
+
+        # Dagens P&L och eventuellt handelsstopp, från en enda kontoavläsning
+        snapshot = self.risk_manager.snapshot(self.broker)
+        self.risk_manager.update_daily_pnl(snapshot.total_value)
 
-        # Analysera varje symbol
+        # Analysera varje symbol; säljer direkt, köp samlas för gemensam riskbedömning
+        candidates: list[OrderCandidate] = []
         for symbol in self.symbols:
             try:
-                df = self.data_fetcher.get_historical(symbol)
-                signal = self.strategy.analyze(df, symbol)
-                self._execute_signal(signal, symbol, prices.get(symbol, 0))
+                with span("symbol", symbol=symbol):
+                    signal = self._analyze(symbol)
+                    self._execute_signal(signal, symbol, prices.get(symbol, 0), snapshot, candidates)
             except Exception as e:
                 logger.error(f"Fel vid analys av {symbol}: {e}")
 
-        self._log_status()
+        if candidates:
+            self._execute_buys(candidates)
 
-    def _execute_signal(self, signal: Signal, symbol: str, current_price: float):
-        if current_price <= 0:
-            return
+        self.portfolio.record_equity(self._log_status())
 
-        if signal == Signal.BUY:
-            positions = self.broker.get_positions()
-            if symbol in positions:
-                return  # Redan i position
+    @property
+    def state_version(self) -> str:
+        # Ändras när en cykel avslutas eller en affär bokförs
+        return f"{self.cycle_count}.{self.portfolio.version}"
 
-            quantity = self.risk_manager.calculate_position_size(self.broker, current_price)
-            if quantity <= 0:
-                return
+    def _notify_cycle(self):
+        self.cycle_count += 1
+        for listener in self.cycle_listeners:
+            try:
+                listener()
+            except Exception as e:
+                logger.error(f"Cykellyssnare misslyckades: {e}")
 
-            can_buy, reason = self.risk_manager.can_open_position(self.broker, symbol, current_price, quantity)
-            if not can_buy:
-                logger.info(f"Riskhantering blockerade köp av {symbol}: {reason}")
-                return
+    def _analyze(self, symbol: str) -> Signal:
+        # Hämta bara så många bars som strategin faktiskt behöver
+        bars = self.strategy.lookback
+        strategy = type(self.strategy).__name__
+        self.strategy.last_score = 0.0
+        if self.strategy.timeframes:
+            with span("fetch", symbol=symbol, bars=bars, timeframes=list(self.strategy.timeframes)):
+                frames = self.data_fetcher.get_timeframes(symbol, list(self.strategy.timeframes), bars=bars)
+            with span("analyze", symbol=symbol, strategy=strategy) as s:
+                signal = self.strategy.analyze_timeframes(frames, symbol)
+                s.set(signal=signal.value)
+            return signal
+        with span("fetch", symbol=symbol, bars=bars):
+            if bars:
+                df = self.data_fetcher.get_recent(symbol, bars)
+            else:
+                df = self.data_fetcher.get_historical(symbol)
+        with span("analyze", symbol=symbol, strategy=strategy) as s:
+            signal = self.strategy.analyze(df, symbol)
+            s.set(signal=signal.value)
+        return signal
+
+    def on_tick(self, tick: Tick):
+        if hasattr(self.broker, "update_prices"):
+            with self.order_lock:
+                self.broker.update_prices({tick.symbol: tick.price})
+        # Stop-loss per tick mot senast kända innehav; brokern läses bara när nivån passerats
+        if not (self.stop_monitor and self.stop_monitor.running):
+            pos = self._held.get(tick.symbol)
+            if pos is not None and tick.price <= pos.avg_price * (1 - self.risk_manager.stop_loss_pct):
+                self._stop_out(tick.symbol, tick.price)
 
-            order = self.broker.place_order(symbol, OrderSide.BUY, quantity, current_price)
+    def on_bar(self, symbol: str, df: pd.DataFrame):
+        # Händelsedriven väg: bara symbolen vars bar just stängde utvärderas
+        price = float(df["Close"].iloc[-1])
+        if self.risk_manager.portfolio_risk:
+            self._update_bar_risk(symbol, df.index[-1], price)
+        if self._unresolved:
+            self._reconcile_orders()
+        snapshot = self.risk_manager.snapshot(self.broker)
+        if symbol in snapshot.positions and not (self.stop_monitor and self.stop_monitor.running):
+            self._stop_out(symbol, price)
+            snapshot = self.risk_manager.snapshot(self.broker)
+        self.risk_manager.update_daily_pnl(snapshot.total_value)
+        self.strategy.last_score = 0.0
+        signal = self.strategy.analyze(df, symbol)
+        candidates: list[OrderCandidate] = []
+        self._execute_signal(signal, symbol, price, snapshot, candidates)
+        if candidates:
+            self._execute_buys(candidates)
+        snapshot = self.risk_manager.snapshot(self.broker)
+        self._held = snapshot.positions
+        self.portfolio.record_equity(snapshot.total_value)
+        self._notify_cycle()
+
+    def _update_bar_risk(self, symbol: str, bar_time, price: float):
+        # Kovariansen behöver ett helt tvärsnitt per tidpunkt — en uppdatering per symbol skulle ge
+        # alla andra symboler avkastningen 0. Stängningarna samlas per bartid och skickas när nästa börjar
+        if bar_time != self._bar_time and self._bar_closes:
+            self.risk_manager.portfolio_risk.update(self._bar_closes)
+            self._bar_closes = {}
+        self._bar_time = bar_time
+        self._bar_closes[symbol] = price
+
+    async def run_streaming(self, pipeline: StreamingPipeline):
+        self.running = True
+        self._held = self.broker.get_positions()
+        if self.stop_monitor:
+            self.stop_monitor.start()
+        logger.info(f"Trading-bot startad i streaming-läge med strategi: {self.strategy.__class__.__name__}")
+        try:
+            await pipeline.run()
+        finally:
+            self.stop()
+        logger.info(f"Tick-strömmen avslutad efter {pipeline.bars_closed} bars")
+
+    def _check_stop_loss(self, prices: dict[str, float]):
+        with request_priority(RequestPriority.STOP_LOSS):
+            stop_loss_symbols = self.risk_manager.check_stop_loss(self.broker)
+        for symbol in stop_loss_symbols:
+            self._stop_out(symbol, prices.get(symbol))
+
+    def _stop_out(self, symbol: str, price: float | None = None):
+        with self.order_lock, request_priority(RequestPriority.STOP_LOSS):
+            # Läs om under låset och kontrollera nivån igen — positionen kan redan vara såld eller utökad
+            pos = self.broker.get_position(symbol)
+            if not pos:
+                self._held.pop(symbol, None)
+                return
+            if symbol in self._unresolved:
+                return
+            price = price if price is not None else pos.current_price
+            if price > pos.avg_price * (1 - self.risk_manager.stop_loss_pct):
+                return
+            logger.warning(f"STOP-LOSS: Säljer {symbol} (förlust: {price / pos.avg_price - 1:.1%})")
+            quantity, avg_price = pos.quantity, pos.avg_price
+            with span("order", symbol=symbol, side="sell", reason="stop_loss") as s:
+                order = self.broker.place_order(symbol, OrderSide.SELL, quantity, price)
+                s.set(order_id=order.order_id, status=order.status.value)
+            if order.status == OrderStatus.UNKNOWN:
+                self._track_unknown(order, avg_price)
             if order.status.value == "filled":
-                logger.info(f"KÖPT {quantity} st {symbol} @ {current_price:.2f}")
-                self.portfolio.record_trade(symbol, OrderSide.BUY, quantity, current_price)
+                # Bokförs till fyllnadspriset; med slippage skiljer det sig från det begärda
+                pnl = (order.price - avg_price) * quantity
+                log_trade("STOP-LOSS SÅLT", order.order_id, symbol, OrderSide.SELL, quantity, order.price, pnl)
+                self.portfolio.record_trade(symbol, OrderSide.SELL, quantity, order.price, pnl)
+                self._held.pop(symbol, None)
+
+    def _execute_signal(self, signal: Signal, symbol: str, current_price: float,
+                        snapshot: AccountSnapshot, candidates: list[OrderCandidate]):
+        if current_price <= 0 or symbol in self._unresolved:
+            return
+
+        if signal == Signal.BUY:
+            if symbol not in snapshot.positions:
+                candidates.append(OrderCandidate(symbol, current_price, self.strategy.last_score))
 
         elif signal == Signal.SELL:
-            positions = self.broker.get_positions()
-            if symbol not in positions:
+            if symbol not in snapshot.positions:
                 return
 
-            pos = positions[symbol]
-            order = self.broker.place_order(symbol, OrderSide.SELL, pos.quantity, current_price)
-            if order.status.value == "filled":
-                pnl = (current_price - pos.avg_price) * pos.quantity
-                logger.info(f"SÅLT {pos.quantity} st {symbol} @ {current_price:.2f} (P&L: {pnl:+.2f})")
-                self.portfolio.record_trade(symbol, OrderSide.SELL, pos.quantity, current_price, pnl)
+            with self.order_lock:
+                # Läs om under låset — StopMonitor kan ha sålt positionen sedan avläsningen, och en
+                # andra säljorder öppnar en blankning hos en riktig broker. Kvantitet och snittpris
+                # läses före ordern eftersom PaperBroker muterar samma Position-objekt
+                pos = self.broker.get_position(symbol)
+                if not pos:
+                    return
+                quantity, avg_price = pos.quantity, pos.avg_price
+                with span("order", symbol=symbol, side="sell") as s:
+                    order = self.broker.place_order(symbol, OrderSide.SELL, quantity, current_price)
+                    s.set(order_id=order.order_id, status=order.status.value)
+                if order.status == OrderStatus.UNKNOWN:
+                    self._track_unknown(order, avg_price)
+                if order.status.value == "filled":
+                    pnl = (order.price - avg_price) * quantity
+                    log_trade("SÅLT", order.order_id, symbol, OrderSide.SELL, quantity, order.price, pnl,
+                              strategy=type(self.strategy).__name__)
+                    self.portfolio.record_trade(symbol, OrderSide.SELL, quantity, order.price, pnl)
 
-    def _log_status(self):
+    def _execute_buys(self, candidates: list[OrderCandidate]):
+        if self.risk_manager.halted:
+            logger.info(f"Handelsstopp aktivt — {len(candidates)} köpsignaler ignoreras")
+            return
+
+        # En ny avläsning efter cykelns säljer, sedan bedöms alla köp mot den
+        snapshot = self.risk_manager.snapshot(self.broker)
+        with span("risk", candidates=len(candidates)) as s:
+            approved = self.risk_manager.evaluate_batch(snapshot, candidates)
+            s.set(approved=len(approved))
+        for candidate, quantity in approved:
+            symbol, price = candidate.symbol, candidate.price
+            with self.order_lock:
+                with span("order", symbol=symbol, side="buy", quantity=quantity) as s:
+                    order = self.broker.place_order(symbol, OrderSide.BUY, quantity, price)
+                    s.set(order_id=order.order_id, status=order.status.value)
+                if order.status == OrderStatus.UNKNOWN:
+                    self._track_unknown(order)
+                # Portfolio bokförs under samma lås som StopMonitor använder
+                if order.status.value == "filled":
+                    log_trade("KÖPT", order.order_id, symbol, OrderSide.BUY, quantity, order.price,
+                              strategy=type(self.strategy).__name__)
+                    self.portfolio.record_trade(symbol, OrderSide.BUY, quantity, order.price)
+
+    def _on_deferred_fill(self, order: Order, quantity: float, price: float, avg_price: float):
+        # Ordrar som var PENDING efter place_order (latens, vilande limit/stop) fylls senare
+        # i update_prices/process_bar; utan detta glider Portfolio isär från brokern
+        with self.order_lock:
+            if order.side == OrderSide.BUY:
+                log_trade("KÖPT", order.order_id, order.symbol, OrderSide.BUY, quantity, price, deferred=True)
+                self.portfolio.record_trade(order.symbol, OrderSide.BUY, quantity, price)
+            else:
+                pnl = (price - avg_price) * quantity
+                log_trade("SÅLT", order.order_id, order.symbol, OrderSide.SELL, quantity, price, pnl, deferred=True)
+                self.portfolio.record_trade(order.symbol, OrderSide.SELL, quantity, price, pnl)
+
+    def _track_unknown(self, order: Order, avg_price: float = 0.0):
+        logger.warning(f"Okänt utfall för {order.side.value}-order {order.order_id or '(utan id)'} i {order.symbol} "
+                       "— stäms av mot brokern innan symbolen handlas igen")
+        with self.order_lock:
+            self._unresolved[order.symbol] = (order, avg_price)
+
+    def _reconcile_orders(self):
+        with self.order_lock:
+            for symbol, (order, avg_price) in list(self._unresolved.items()):
+                status = self._resolve_status(order)
+                if status == OrderStatus.FILLED:
+                    del self._unresolved[symbol]
+                    # Brokern ger inte fyllnadspriset här; ordern bokförs till det begärda priset
+                    self._on_deferred_fill(order, order.quantity, order.price, avg_price)
+                elif status in (OrderStatus.CANCELLED, OrderStatus.REJECTED):
+                    del self._unresolved[symbol]
+                    logger.info(f"Order {order.order_id or '(utan id)'} i {symbol} lades aldrig ({status.value})")
+
+    def _resolve_status(self, order: Order) -> OrderStatus:
+        if order.order_id:
+            return self.broker.get_order_status(order.order_id)
+        # Utan order-id avgör positionen: köp sker bara utan innehav och sälj avser hela innehavet
+        held = self.broker.get_position(order.symbol) is not None
+        return OrderStatus.FILLED if held == (order.side == OrderSide.BUY) else OrderStatus.UNKNOWN
+
+    def _log_status(self) -> float:
         total = self.broker.get_balance()
         positions = self.broker.get_positions()
         pos_value = sum(p.market_value for p in positions.values())
         total_value = total + pos_value
 
-        logger.info(f"Kapital: {total:.0f} | Positioner: {pos_value:.0f} | "
-                     f"Totalt: {total_value:.0f} | Trades: {self.portfolio.get_trade_count()}")
+        logger.info("Kapital: %.0f | Positioner: %.0f | Totalt: %.0f | Trades: %d | Minne: %.0f MB",
+                    total, pos_value, total_value, self.portfolio.get_trade_count(), rss_mb())
+        return total_value
+
+    def attach_stop_monitor(self, trailing_stop_pct: float = 0.0, interval_seconds: float = 5.0) -> StopMonitor:
+        self.stop_monitor = StopMonitor(
+            broker=self.broker,
+            data_fetcher=self.data_fetcher,
+            portfolio=self.portfolio,
+            stop_loss_pct=self.risk_manager.stop_loss_pct,
+            trailing_stop_pct=trailing_stop_pct,
+            interval_seconds=interval_seconds,
+            order_lock=self.order_lock,
+            on_unknown_order=self._track_unknown,
+        )
+        return self.stop_monitor
 
     def run(self, interval_seconds: int = 60):
         self.running = True
+        if self.stop_monitor:
+            self.stop_monitor.start()
         logger.info(f"Trading-bot startad med strategi: {self.strategy.__class__.__name__}")
         logger.info(f"Bevakar: {', '.join(self.symbols)}")
 
@@ -113,3 +350,9 @@ class TradingEngine:
 
     def stop(self):
         self.running = False
+        if self.stop_monitor:
+            self.stop_monitor.stop()
+        # Ledgerns sista chunk och meta.json skrivs ut så att historiken kan öppnas igen vid nästa start
+        self.portfolio.flush()
+        if hasattr(self.broker, "close"):
+            self.broker.close()
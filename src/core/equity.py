@@ -0,0 +1,89 @@
+import threading
+from datetime import datetime
+
+import numpy as np
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    # Largest-Triangle-Three-Buckets: returnerar index för de punkter som bäst bevarar kurvans form
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = x.astype(np.float64)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x = x[end:edges[i + 2]].mean()
+            next_y = y[end:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        # Triangelarea mellan föregående vald punkt, kandidaten och nästa hinks medelpunkt
+        area = np.abs((x[a] - next_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (next_y - y[a]))
+        a = start + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+
+class EquitySeries:
+
+    def __init__(self, capacity: int = 1024, max_points: int | None = None):
+        # max_points: när serien når gränsen glesas den äldre halvan ut med LTTB, så minnet
+        # är konstant medan kurvans form bevaras
+        self.times = np.empty(capacity, dtype="datetime64[us]")
+        self.values = np.empty(capacity, dtype=np.float64)
+        self.size = 0
+        self.max_points = max_points
+        # Punkter som tagits bort vid utglesning; markörer (len) fortsätter att räkna alla punkter
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.dropped + self.size
+
+    def append(self, value: float, timestamp: datetime | None = None):
+        with self._lock:
+            if self.max_points and self.size >= self.max_points:
+                self._compact()
+            if self.size == len(self.values):
+                self.times = np.resize(self.times, self.size * 2)
+                self.values = np.resize(self.values, self.size * 2)
+            self.times[self.size] = np.datetime64(timestamp or datetime.now(), "us")
+            self.values[self.size] = value
+            self.size += 1
+
+    def window(self, since: int = 0, start: datetime | None = None,
+               end: datetime | None = None) -> tuple[np.ndarray, np.ndarray]:
+        # since = markör (antal punkter klienten redan har); start/end via binärsökning
+        with self._lock:
+            times, values = self.times[:self.size], self.values[:self.size]
+            lo, hi = max(0, since - self.dropped), len(times)
+        if start is not None:
+            lo = max(lo, int(np.searchsorted(times, np.datetime64(start, "us"), side="left")))
+        if end is not None:
+            hi = int(np.searchsorted(times, np.datetime64(end, "us"), side="right"))
+        return times[lo:hi], values[lo:hi]
+
+    def downsample(self, max_points: int, since: int = 0, start: datetime | None = None,
+                   end: datetime | None = None) -> tuple[np.ndarray, np.ndarray]:
+        times, values = self.window(since, start, end)
+        if len(times) <= max_points:
+            return times, values
+        keep = lttb(times.astype(np.int64), values, max_points)
+        return times[keep], values[keep]
+
+    def _compact(self):
+        half = self.size // 2
+        keep = lttb(self.times[:half].astype(np.int64), self.values[:half], max(3, half // 4))
+        kept, rest = len(keep), self.size - half
+        # Nya arrayer: fönster som redan lämnats ut via window() förblir oförändrade
+        times, values = np.empty_like(self.times), np.empty_like(self.values)
+        times[:kept], values[:kept] = self.times[keep], self.values[keep]
+        times[kept:kept + rest] = self.times[half:self.size]
+        values[kept:kept + rest] = self.values[half:self.size]
+        self.times, self.values = times, values
+        self.dropped += half - kept
+        self.size = kept + rest
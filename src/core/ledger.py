@@ -0,0 +1,288 @@
+import glob
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+from src.brokers.base import OrderSide
+
+COLUMNS = {
+    "symbol_id": np.int32,
+    "side": np.int8,
+    "quantity": np.float64,
+    "price": np.float64,
+    "pnl": np.float64,
+    "timestamp": "datetime64[us]",
+}
+
+SIDE_CODES = {OrderSide.BUY: 0, OrderSide.SELL: 1}
+SIDES = [OrderSide.BUY, OrderSide.SELL]
+
+
+def utc_now() -> datetime:
+    # Tidsindexet lagras som naiv UTC: lokal tid går baklänges när sommartiden slutar och
+    # bryter den stigande ordning som binärsökningen bygger på
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def to_utc(moment: datetime) -> datetime:
+    # Naiva tider tolkas som lokal tid
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def utc_to_local(timestamps: np.ndarray) -> list[datetime]:
+    # Per rad, så att varje tidpunkt får sin egen sommartidsförskjutning; används för sidor och visning
+    micros = timestamps.astype("datetime64[us]").astype(np.int64).tolist()
+    return [datetime.fromtimestamp(us / 1_000_000) for us in micros]
+
+
+class _Chunk:
+    __slots__ = ("columns", "size", "spilled")
+
+    def __init__(self, capacity: int):
+        self.columns = {name: np.empty(capacity, dtype=dtype) for name, dtype in COLUMNS.items()}
+        self.size = 0
+        self.spilled = False
+
+    @property
+    def last_ts(self) -> np.datetime64:
+        return self.columns["timestamp"][self.size - 1]
+
+
+class _RowIndex:
+    __slots__ = ("rows", "size")
+
+    def __init__(self):
+        self.rows = np.empty(16, dtype=np.int64)
+        self.size = 0
+
+    def append(self, row: int):
+        if self.size == len(self.rows):
+            self.rows = np.resize(self.rows, self.size * 2)
+        self.rows[self.size] = row
+        self.size += 1
+
+    def extend(self, rows: np.ndarray):
+        needed = self.size + len(rows)
+        if needed > len(self.rows):
+            self.rows = np.resize(self.rows, max(needed, len(self.rows) * 2))
+        self.rows[self.size:needed] = rows
+        self.size = needed
+
+    def view(self) -> np.ndarray:
+        return self.rows[:self.size]
+
+
+class TradeLedger:
+
+    def __init__(self, chunk_size: int = 65536, spill_dir: str | None = None, max_chunks_in_memory: int = 4):
+        self.chunk_size = chunk_size
+        self.spill_dir = spill_dir
+        self.max_chunks_in_memory = max_chunks_in_memory
+        self.chunks: list[_Chunk] = []
+        self.symbols: list[str] = []
+        self.symbol_ids: dict[str, int] = {}
+        self._symbol_rows: dict[int, _RowIndex] = {}
+        self._length = 0
+        self._spilled = 0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config: dict) -> "TradeLedger":
+        spill_dir = config.get("spill_dir")
+        max_chunks_in_memory = config.get("max_chunks_in_memory", 4)
+        if spill_dir and os.path.exists(os.path.join(spill_dir, "meta.json")):
+            # Fortsätter på förra körningens historik; fulla chunks mappas, den sista läses in skrivbar
+            return cls.load(spill_dir, max_chunks_in_memory)
+        return cls(
+            chunk_size=config.get("chunk_size", 65536),
+            spill_dir=spill_dir,
+            max_chunks_in_memory=max_chunks_in_memory,
+        )
+
+    @classmethod
+    def load(cls, spill_dir: str, max_chunks_in_memory: int = 4) -> "TradeLedger":
+        with open(os.path.join(spill_dir, "meta.json")) as f:
+            meta = json.load(f)
+        ledger = cls(meta["chunk_size"], spill_dir, max_chunks_in_memory)
+        for symbol in meta["symbols"]:
+            ledger.symbol_ids[symbol] = len(ledger.symbols)
+            ledger.symbols.append(symbol)
+            ledger._symbol_rows[ledger.symbol_ids[symbol]] = _RowIndex()
+
+        paths = sorted(glob.glob(os.path.join(spill_dir, "chunk_*_timestamp.npy")))
+        for number in range(len(paths)):
+            chunk = _Chunk(0)
+            for name in COLUMNS:
+                chunk.columns[name] = np.load(ledger._chunk_path(number, name), mmap_mode="r")
+            chunk.size = len(chunk.columns["timestamp"])
+            chunk.spilled = True
+            if chunk.size < ledger.chunk_size:
+                # Sista, ofullständiga chunken görs skrivbar igen så att append kan fortsätta
+                writable = _Chunk(ledger.chunk_size)
+                for name in COLUMNS:
+                    writable.columns[name][:chunk.size] = chunk.columns[name]
+                writable.size = chunk.size
+                chunk = writable
+            else:
+                ledger._spilled += 1
+            ledger.chunks.append(chunk)
+            ids = chunk.columns["symbol_id"][:chunk.size]
+            rows = np.arange(ledger._length, ledger._length + chunk.size)
+            for symbol_id in np.unique(ids):
+                ledger._symbol_rows[int(symbol_id)].extend(rows[ids == symbol_id])
+            ledger._length += chunk.size
+        return ledger
+
+    def __len__(self) -> int:
+        return self._length
+
+    def append(self, symbol: str, side: OrderSide, quantity: float, price: float, pnl: float,
+               timestamp: datetime):
+        symbol_id = self.symbol_ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = self.symbol_ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+            self._symbol_rows[symbol_id] = _RowIndex()
+
+        if not self.chunks or self.chunks[-1].size == self.chunk_size:
+            self._seal()
+            self.chunks.append(_Chunk(self.chunk_size))
+        chunk = self.chunks[-1]
+        i = chunk.size
+        cols = chunk.columns
+        cols["symbol_id"][i] = symbol_id
+        cols["side"][i] = SIDE_CODES[side]
+        cols["quantity"][i] = quantity
+        cols["price"][i] = price
+        cols["pnl"][i] = pnl
+        cols["timestamp"][i] = timestamp
+        chunk.size += 1
+        self._symbol_rows[symbol_id].append(self._length)
+        self._length += 1
+
+    def column(self, name: str, start: int = 0, stop: int | None = None) -> np.ndarray:
+        stop = self._length if stop is None else min(stop, self._length)
+        if start >= stop:
+            return np.empty(0, dtype=COLUMNS[name])
+        first, last = start // self.chunk_size, (stop - 1) // self.chunk_size
+        parts = []
+        for c in range(first, last + 1):
+            chunk = self.chunks[c]
+            lo = start - c * self.chunk_size if c == first else 0
+            hi = stop - c * self.chunk_size if c == last else chunk.size
+            parts.append(chunk.columns[name][lo:hi])
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def slice(self, start: int = 0, stop: int | None = None) -> dict[str, np.ndarray]:
+        return {name: self.column(name, start, stop) for name in COLUMNS}
+
+    def tail(self, n: int) -> dict[str, np.ndarray]:
+        return self.slice(max(0, self._length - n))
+
+    def take(self, rows: np.ndarray) -> dict[str, np.ndarray]:
+        chunk_ids = rows // self.chunk_size
+        offsets = rows % self.chunk_size
+        result = {name: np.empty(len(rows), dtype=dtype) for name, dtype in COLUMNS.items()}
+        for c in np.unique(chunk_ids):
+            mask = chunk_ids == c
+            chunk = self.chunks[c]
+            for name in COLUMNS:
+                result[name][mask] = chunk.columns[name][offsets[mask]]
+        return result
+
+    def time_range(self, start: datetime | None = None, end: datetime | None = None) -> tuple[int, int]:
+        # Tidsstämplar läggs till i stigande ordning, så både chunk-gränser och
+        # rader inom en chunk kan binärsökas
+        lo = 0 if start is None else self._search(np.datetime64(start, "us"), "left")
+        hi = self._length if end is None else self._search(np.datetime64(end, "us"), "right")
+        return lo, max(lo, hi)
+
+    def rows_for_symbol(self, symbol: str) -> np.ndarray:
+        symbol_id = self.symbol_ids.get(symbol)
+        if symbol_id is None:
+            return np.empty(0, dtype=np.int64)
+        return self._symbol_rows[symbol_id].view()
+
+    def query(self, symbol: str | None = None, side: OrderSide | None = None, start: datetime | None = None,
+              end: datetime | None = None, before: int | None = None, limit: int = 50) -> np.ndarray:
+        # Radindex nyast först. before = sista raden på föregående sida (keyset-paginering),
+        # så en djup sida kostar lika lite som den första
+        lo, hi = self.time_range(start, end)
+        if before is not None:
+            hi = max(lo, min(hi, before))
+        rows = None
+        if symbol is not None:
+            rows = self.rows_for_symbol(symbol)
+            rows = rows[np.searchsorted(rows, lo):np.searchsorted(rows, hi)]
+            lo, hi = 0, len(rows)
+        code = None if side is None else SIDE_CODES[side]
+
+        # Sidfiltret kräver en skanning; den sker bakifrån i block och stannar när sidan är full
+        pages, found, block = [], 0, max(limit, 256)
+        while hi > lo and found < limit:
+            a = max(lo, hi - block)
+            if rows is None:
+                candidates = np.arange(a, hi)
+                if code is not None:
+                    candidates = candidates[self.column("side", a, hi) == code]
+            else:
+                candidates = rows[a:hi]
+                if code is not None:
+                    candidates = candidates[self.take(candidates)["side"] == code]
+            picked = candidates[::-1][:limit - found]
+            pages.append(picked)
+            found += len(picked)
+            hi = a
+        return np.concatenate(pages) if pages else np.empty(0, dtype=np.int64)
+
+    def sides(self, codes: np.ndarray) -> list[OrderSide]:
+        return [SIDES[c] for c in codes]
+
+    def _search(self, ts: np.datetime64, side: str) -> int:
+        if not self._length:
+            return 0
+        lo, hi = 0, len(self.chunks) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            last_ts = self.chunks[mid].last_ts
+            if (ts > last_ts) if side == "left" else (ts >= last_ts):
+                lo = mid + 1
+            else:
+                hi = mid
+        chunk = self.chunks[lo]
+        offset = np.searchsorted(chunk.columns["timestamp"][:chunk.size], ts, side=side)
+        return lo * self.chunk_size + int(offset)
+
+    def flush(self):
+        # Skriver även chunks som ligger i minnet, utan att mappa om dem
+        if not self.spill_dir:
+            return
+        for number in range(self._spilled, len(self.chunks)):
+            chunk = self.chunks[number]
+            for name in COLUMNS:
+                np.save(self._chunk_path(number, name), chunk.columns[name][:chunk.size])
+        self._write_meta()
+
+    def _seal(self):
+        # Skriv ut äldsta fulla chunks till disk och mappa tillbaka dem read-only
+        if not self.spill_dir:
+            return
+        while len(self.chunks) - self._spilled >= max(1, self.max_chunks_in_memory):
+            chunk = self.chunks[self._spilled]
+            for name in COLUMNS:
+                path = self._chunk_path(self._spilled, name)
+                np.save(path, chunk.columns[name])
+                chunk.columns[name] = np.load(path, mmap_mode="r")
+            chunk.spilled = True
+            self._spilled += 1
+        self._write_meta()
+
+    def _write_meta(self):
+        with open(os.path.join(self.spill_dir, "meta.json"), "w") as f:
+            json.dump({"chunk_size": self.chunk_size, "symbols": self.symbols}, f)
+
+    def _chunk_path(self, number: int, name: str) -> str:
+        return os.path.join(self.spill_dir, f"chunk_{number:06d}_{name}.npy")
@@ -0,0 +1,167 @@
+import sys
+import os
+import argparse
+import gc
+import itertools
+import logging
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import numpy as np
+
+from src.brokers.base import BaseBroker, Order, OrderSide, OrderStatus, Position
+from src.core.engine import TradingEngine
+from src.core.risk import RiskManager
+from src.data.synthetic import MarketModel, SyntheticSource
+from src.utils.memory import rss_mb
+from src.utils.registry import BROKERS, STRATEGIES
+
+logger = logging.getLogger("trading-bot")
+
+DEFAULT_SYMBOL_COUNTS = (1000, 10000, 50000)
+
+
+class StubBroker(BaseBroker):
+
+    def __init__(self, initial_balance: float = 1e9):
+        # Fyller allt direkt till begärt pris utan avgifter eller orderbok — mäter motorn, inte brokern
+        self.cash = initial_balance
+        self.initial_balance = initial_balance
+        self.positions: dict[str, Position] = {}
+        self.order_count = 0
+        self._ids = itertools.count(1)
+
+    def connect(self) -> bool:
+        return True
+
+    def get_balance(self) -> float:
+        return self.cash
+
+    def get_positions(self) -> dict[str, Position]:
+        return self.positions
+
+    def update_prices(self, prices: dict[str, float]):
+        for symbol, position in self.positions.items():
+            if symbol in prices:
+                position.current_price = prices[symbol]
+
+    def place_order(self, symbol: str, side: OrderSide, quantity: float, price: float) -> Order:
+        self.order_count += 1
+        order = Order(symbol, side, quantity, price, OrderStatus.FILLED, datetime.now(), f"STUB-{next(self._ids)}",
+                      filled_quantity=quantity)
+        if side == OrderSide.BUY:
+            self.cash -= quantity * price
+            position = self.positions.get(symbol)
+            if position:
+                position.avg_price = (position.avg_price * position.quantity + price * quantity) / (position.quantity + quantity)
+                position.quantity += quantity
+            else:
+                self.positions[symbol] = Position(symbol, quantity, price, price)
+        else:
+            self.cash += quantity * price
+            position = self.positions.get(symbol)
+            if position:
+                position.quantity -= quantity
+                if position.quantity <= 0:
+                    del self.positions[symbol]
+        return order
+
+    def get_order_status(self, order_id: str) -> OrderStatus:
+        return OrderStatus.FILLED
+
+    def cancel_order(self, order_id: str) -> bool:
+        return False
+
+
+def run_load_test(symbols: int, cycles: int = 3, seed: int = 0, strategy: str = "rsi",
+                  model: MarketModel | None = None, risk_config: dict | None = None, broker: str = "stub") -> dict:
+    gc.collect()
+    rss_start = rss_mb()
+    strategy_instance = STRATEGIES.get(strategy)()
+    warmup = strategy_instance.lookback or 100
+
+    started = time.perf_counter()
+    source = SyntheticSource(symbols=symbols, bars=warmup + cycles, seed=seed, model=model)
+    source.set_cursor(warmup)
+    generate_seconds = time.perf_counter() - started
+
+    risk_config = risk_config or {}
+    if broker == "stub":
+        broker_instance = StubBroker()
+    else:
+        # Paper-brokrarna mäts med sin orderbok och positionshantering
+        broker_instance = BROKERS.get(broker)(initial_balance=1e9)
+    engine = TradingEngine(
+        broker=broker_instance,
+        strategy=strategy_instance,
+        risk_manager=RiskManager(
+            max_position_pct=risk_config.get("max_position_pct", 0.10),
+            stop_loss_pct=risk_config.get("stop_loss_pct", 0.05),
+            daily_loss_limit_pct=risk_config.get("daily_loss_limit_pct", 0.03),
+            max_open_positions=risk_config.get("max_open_positions", 10),
+        ),
+        data_fetcher=source,
+        symbols=source.symbols,
+    )
+
+    # Samma tystnad som i backtestet: cykelloggningen är inte det vi mäter
+    level = logger.level
+    logger.setLevel(logging.WARNING)
+    latencies = np.empty(cycles, dtype=np.float64)
+    rss_peak = rss_mb()
+    try:
+        for i in range(cycles):
+            cycle_started = time.perf_counter()
+            engine.run_once()
+            latencies[i] = time.perf_counter() - cycle_started
+            rss_peak = max(rss_peak, rss_mb())
+            source.advance()
+    finally:
+        logger.setLevel(level)
+
+    return {
+        "symbols": symbols,
+        "cycles": cycles,
+        "generate_s": round(generate_seconds, 3),
+        "latency_p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 1),
+        "latency_p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 1),
+        "latency_max_ms": round(float(latencies.max()) * 1000, 1),
+        "symbols_per_s": round(symbols * cycles / float(latencies.sum()), 1),
+        "broker": broker,
+        "orders": (broker_instance.order_count if isinstance(broker_instance, StubBroker)
+                   else broker_instance.last_order_number),
+        "rss_peak_mb": round(rss_peak, 1),
+        "rss_delta_mb": round(rss_peak - rss_start, 1),
+    }
+
+
+def format_report(results: list[dict]) -> str:
+    columns = list(results[0]) if results else []
+    widths = {c: max(len(c), *(len(str(r[c])) for r in results)) for c in columns}
+    lines = ["  ".join(c.rjust(widths[c]) for c in columns)]
+    lines.extend("  ".join(str(r[c]).rjust(widths[c]) for c in columns) for r in results)
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lasttest av TradingEngine mot en syntetisk marknad")
+    parser.add_argument("--symbols", type=int, nargs="+", default=list(DEFAULT_SYMBOL_COUNTS))
+    parser.add_argument("--cycles", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--strategy", default="rsi", choices=STRATEGIES.names())
+    parser.add_argument("--broker", default="stub", choices=["stub", "paper", "paper_array"])
+    args = parser.parse_args()
+
+    logging.basicConfig(format="%(asctime)s [%(levelname)s] %(message)s", datefmt="%H:%M:%S")
+    results = []
+    for count in args.symbols:
+        logger.warning(f"Lasttest: {count} symboler, {args.cycles} cykler")
+        results.append(run_load_test(count, cycles=args.cycles, seed=args.seed, strategy=args.strategy,
+                                     broker=args.broker))
+    print(format_report(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,14 @@
 from dataclasses import dataclass, field
-from datetime import datetime
+from datetime import date, datetime
+
+import numpy as np
 
 from src.brokers.base import OrderSide
+from src.core.equity import EquitySeries
+from src.core.ledger import SIDE_CODES, TradeLedger, utc_now, utc_to_local
 
 
-@dataclass
+@dataclass(slots=True)
 class TradeRecord:
     symbol: str
     side: OrderSide
@@ -14,35 +18,131 @@ class TradeRecord:
     pnl: float = 0.0
 
 
+@dataclass(slots=True)
+class SymbolStats:
+    trades: int = 0
+    sells: int = 0
+    wins: int = 0
+    pnl: float = 0.0
+    volume: float = 0.0
+
+
 class Portfolio:
 
-    def __init__(self, initial_balance: float = 100000.0):
+    def __init__(self, initial_balance: float = 100000.0, ledger: TradeLedger | None = None,
+                 max_equity_points: int | None = 100_000):
         self.initial_balance = initial_balance
-        self.trade_records: list[TradeRecord] = []
+        self.ledger = ledger if ledger is not None else TradeLedger()
+        # Löpande aggregat som uppdateras i record_trade, så att läsningar är O(1)
+        self.total_pnl = 0.0
+        self.daily_pnl: dict[date, float] = {}
+        self.sell_count = 0
+        self.win_count = 0
+        self.symbol_stats: dict[str, SymbolStats] = {}
+        # Ökar vid varje affär; används för att avgöra om cachade vyer är inaktuella
+        self.version = 0
+        # Kontovärde per cykel (mark-to-market), inte bara vid affärer
+        self.equity = EquitySeries(max_points=max_equity_points)
+        if len(self.ledger):
+            self._rebuild_aggregates()
+
+    @property
+    def trade_records(self) -> list[TradeRecord]:
+        # Materialiserar hela ledgern — använd ledger-slicing på heta vägar
+        return self.get_records()
+
+    def get_records(self, start: int = 0, stop: int | None = None) -> list[TradeRecord]:
+        cols = self.ledger.slice(start, stop)
+        symbols = self.ledger.symbols
+        sides = self.ledger.sides(cols["side"])
+        return [
+            TradeRecord(
+                symbol=symbols[symbol_id],
+                side=side,
+                quantity=float(quantity),
+                price=float(price),
+                timestamp=timestamp,
+                pnl=float(pnl),
+            )
+            for symbol_id, side, quantity, price, pnl, timestamp in zip(
+                cols["symbol_id"], sides, cols["quantity"], cols["price"], cols["pnl"],
+                utc_to_local(cols["timestamp"]))
+        ]
 
     def record_trade(self, symbol: str, side: OrderSide, quantity: float, price: float, pnl: float = 0.0):
-        self.trade_records.append(TradeRecord(
-            symbol=symbol,
-            side=side,
-            quantity=quantity,
-            price=price,
-            timestamp=datetime.now(),
-            pnl=pnl,
-        ))
+        # Ledgern får UTC; dagsaggregaten räknas per lokal dag som förut
+        self.ledger.append(symbol, side, quantity, price, pnl, utc_now())
+        self._update_aggregates(symbol, side, quantity, price, pnl, datetime.now())
+        self.version += 1
+
+    def flush(self):
+        self.ledger.flush()
+
+    def _rebuild_aggregates(self):
+        # Återöppnad ledger: aggregaten räknas om en gång, vektoriserat per chunk. Dagarna räknas
+        # med dagens UTC-förskjutning, vilket räcker för get_daily_pnl
+        offset = np.timedelta64(datetime.now().astimezone().utcoffset(), "us")
+        sell = SIDE_CODES[OrderSide.SELL]
+        for start in range(0, len(self.ledger), self.ledger.chunk_size):
+            cols = self.ledger.slice(start, start + self.ledger.chunk_size)
+            pnl, sells = cols["pnl"], cols["side"] == sell
+            wins = sells & (pnl > 0)
+            self.total_pnl += float(pnl.sum())
+            self.sell_count += int(sells.sum())
+            self.win_count += int(wins.sum())
+            days = (cols["timestamp"] + offset).astype("datetime64[D]")
+            for day in np.unique(days):
+                day_pnl = float(pnl[days == day].sum())
+                key = day.astype(date)
+                self.daily_pnl[key] = self.daily_pnl.get(key, 0.0) + day_pnl
+            for symbol_id in np.unique(cols["symbol_id"]):
+                mask = cols["symbol_id"] == symbol_id
+                symbol = self.ledger.symbols[symbol_id]
+                stats = self.symbol_stats.get(symbol)
+                if stats is None:
+                    stats = self.symbol_stats[symbol] = SymbolStats()
+                stats.trades += int(mask.sum())
+                stats.sells += int((sells & mask).sum())
+                stats.wins += int((wins & mask).sum())
+                stats.pnl += float(pnl[mask].sum())
+                stats.volume += float((cols["quantity"][mask] * cols["price"][mask]).sum())
+
+    def _update_aggregates(self, symbol: str, side: OrderSide, quantity: float, price: float, pnl: float,
+                           timestamp: datetime):
+        day = timestamp.date()
+        self.total_pnl += pnl
+        self.daily_pnl[day] = self.daily_pnl.get(day, 0.0) + pnl
+
+        stats = self.symbol_stats.get(symbol)
+        if stats is None:
+            stats = self.symbol_stats[symbol] = SymbolStats()
+        stats.trades += 1
+        stats.pnl += pnl
+        stats.volume += quantity * price
+
+        if side == OrderSide.SELL:
+            self.sell_count += 1
+            stats.sells += 1
+            if pnl > 0:
+                self.win_count += 1
+                stats.wins += 1
+
+    def record_equity(self, total_value: float, timestamp: datetime | None = None):
+        self.equity.append(total_value, timestamp)
 
     def get_total_pnl(self) -> float:
-        return sum(t.pnl for t in self.trade_records)
+        return self.total_pnl
 
-    def get_daily_pnl(self) -> float:
-        today = datetime.now().date()
-        return sum(t.pnl for t in self.trade_records if t.timestamp.date() == today)
+    def get_daily_pnl(self, day: date | None = None) -> float:
+        return self.daily_pnl.get(day or datetime.now().date(), 0.0)
 
     def get_trade_count(self) -> int:
-        return len(self.trade_records)
+        return len(self.ledger)
 
     def get_win_rate(self) -> float:
-        sells = [t for t in self.trade_records if t.side == OrderSide.SELL]
-        if not sells:
+        if not self.sell_count:
             return 0.0
-        wins = sum(1 for t in sells if t.pnl > 0)
-        return wins / len(sells)
+        return self.win_count / self.sell_count
+
+    def get_symbol_stats(self, symbol: str) -> SymbolStats:
+        return self.symbol_stats.get(symbol, SymbolStats())
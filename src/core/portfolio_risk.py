@@ -0,0 +1,122 @@
+from statistics import NormalDist
+
+import numpy as np
+
+from src.brokers.base import Position
+
+
+class RollingCovariance:
+
+    def __init__(self, symbols: list[str], window: int = 60):
+        self.symbols = list(symbols)
+        self.index = {s: i for i, s in enumerate(self.symbols)}
+        self.window = window
+        n = len(self.symbols)
+        self.returns = np.zeros((window, n))
+        self.last_prices = np.full(n, np.nan)
+        # Löpande summor; ett nytt bar kostar O(n²) i stället för O(window·n²)
+        self.sum = np.zeros(n)
+        self.cross = np.zeros((n, n))
+        self.count = 0
+        self._pos = 0
+        self._cov: np.ndarray | None = None
+
+    def update(self, prices: dict[str, float]):
+        current = self.last_prices.copy()
+        for symbol, price in prices.items():
+            idx = self.index.get(symbol)
+            if idx is not None and price > 0:
+                current[idx] = price
+        valid = ~np.isnan(self.last_prices) & ~np.isnan(current)
+        if not valid.any():
+            self.last_prices = current
+            return
+        r = np.zeros(len(current))
+        r[valid] = current[valid] / self.last_prices[valid] - 1.0
+        self.last_prices = current
+        self._cov = None
+
+        if self.count == self.window:
+            old = self.returns[self._pos]
+            self.sum -= old
+            self.cross -= np.outer(old, old)
+        else:
+            self.count += 1
+        self.returns[self._pos] = r
+        self.sum += r
+        self.cross += np.outer(r, r)
+        self._pos = (self._pos + 1) % self.window
+        if self._pos == 0:
+            # Räkna om exakt en gång per varv så att flyttalsdrift inte ackumuleras
+            self.sum = self.returns.sum(axis=0)
+            self.cross = self.returns.T @ self.returns
+
+    def covariance(self) -> np.ndarray:
+        if self._cov is None:
+            n = self.count
+            if n < 2:
+                self._cov = np.zeros_like(self.cross)
+            else:
+                mean = self.sum / n
+                self._cov = (self.cross - n * np.outer(mean, mean)) / (n - 1)
+        return self._cov
+
+
+class PortfolioRiskModel:
+
+    def __init__(self, symbols: list[str], window: int = 60, correlation_threshold: float = 0.5,
+                 min_scale: float = 0.25, min_observations: int = 20):
+        self.cov = RollingCovariance(symbols, window)
+        self.correlation_threshold = correlation_threshold
+        self.min_scale = min_scale
+        self.min_observations = min_observations
+
+    @classmethod
+    def from_config(cls, symbols: list[str], config: dict) -> "PortfolioRiskModel":
+        return cls(
+            symbols,
+            window=config.get("window", 60),
+            correlation_threshold=config.get("threshold", 0.5),
+            min_scale=config.get("min_scale", 0.25),
+            min_observations=config.get("min_observations", 20),
+        )
+
+    @property
+    def ready(self) -> bool:
+        return self.cov.count >= self.min_observations
+
+    def update(self, prices: dict[str, float]):
+        self.cov.update(prices)
+
+    def weights(self, positions: dict[str, Position], total_value: float) -> np.ndarray:
+        w = np.zeros(len(self.cov.symbols))
+        if total_value <= 0:
+            return w
+        for symbol, pos in positions.items():
+            idx = self.cov.index.get(symbol)
+            if idx is not None:
+                w[idx] = pos.market_value / total_value
+        return w
+
+    def volatility(self, weights: np.ndarray) -> float:
+        return float(np.sqrt(max(weights @ self.cov.covariance() @ weights, 0.0)))
+
+    def value_at_risk(self, weights: np.ndarray, total_value: float, confidence: float = 0.95) -> float:
+        # Parametrisk VaR över ett bar
+        return NormalDist().inv_cdf(confidence) * self.volatility(weights) * total_value
+
+    def size_multiplier(self, symbol: str, weights: np.ndarray) -> float:
+        idx = self.cov.index.get(symbol)
+        if idx is None or not self.ready or not weights.any():
+            return 1.0
+        cov = self.cov.covariance()
+        var_c = cov[idx, idx]
+        var_p = weights @ cov @ weights
+        if var_c <= 0 or var_p <= 0:
+            return 1.0
+        # Korrelation mellan kandidaten och nuvarande portfölj
+        rho = (cov[idx] @ weights) / np.sqrt(var_c * var_p)
+        if rho <= self.correlation_threshold:
+            return 1.0
+        excess = (rho - self.correlation_threshold) / (1 - self.correlation_threshold)
+        return float(max(self.min_scale, 1.0 - excess))
@@ -1,20 +1,117 @@
-from src.brokers.base import BaseBroker, OrderSide
+import logging
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import date, datetime
+
+from src.brokers.base import BaseBroker, OrderSide, Position
+from src.core.portfolio_risk import PortfolioRiskModel
+
+logger = logging.getLogger("trading-bot")
+
+
+@dataclass
+class AccountSnapshot:
+    cash: float
+    positions: dict[str, Position] = field(default_factory=dict)
+
+    @property
+    def positions_value(self) -> float:
+        return sum(p.market_value for p in self.positions.values())
+
+    @property
+    def total_value(self) -> float:
+        return self.cash + self.positions_value
+
+
+@dataclass
+class OrderCandidate:
+    symbol: str
+    price: float
+    score: float = 0.0  # Högre värde prioriteras när inte alla köp ryms
 
 
 class RiskManager:
 
     def __init__(self, max_position_pct: float = 0.10, stop_loss_pct: float = 0.05,
-                 daily_loss_limit_pct: float = 0.03, max_open_positions: int = 10):
+                 daily_loss_limit_pct: float = 0.03, max_open_positions: int = 10,
+                 portfolio_risk: PortfolioRiskModel | None = None):
         self.max_position_pct = max_position_pct
         self.stop_loss_pct = stop_loss_pct
         self.daily_loss_limit_pct = daily_loss_limit_pct
         self.max_open_positions = max_open_positions
+        self.portfolio_risk = portfolio_risk
+        self.trading_day: date | None = None
+        self.day_start_value = 0.0
+        self.daily_pnl = 0.0
+        self.halted = False
+        # Tidskälla för dagsgränsen; byts ut vid uppspelning av inspelade sessioner
+        self.clock: Callable[[], datetime] = datetime.now
+
+    def snapshot(self, broker: BaseBroker) -> AccountSnapshot:
+        return AccountSnapshot(cash=broker.get_balance(), positions=broker.get_positions())
+
+    def update_daily_pnl(self, total_value: float, now: datetime | None = None) -> float:
+        # Dagens P&L = nuvarande totalvärde (realiserat + orealiserat) mot dagens startvärde
+        today = (now or self.clock()).date()
+        if today != self.trading_day:
+            self.trading_day = today
+            self.day_start_value = total_value
+            if self.halted:
+                logger.info("Ny handelsdag — handelsstopp hävt")
+            self.halted = False
+        self.daily_pnl = total_value - self.day_start_value
+        if (not self.halted and self.day_start_value > 0
+                and self.daily_pnl <= -self.day_start_value * self.daily_loss_limit_pct):
+            self.halted = True
+            logger.warning(f"HANDELSSTOPP: dagsförlust {self.daily_pnl:.0f} överskrider "
+                           f"{self.daily_loss_limit_pct:.1%} av {self.day_start_value:.0f}")
+        return self.daily_pnl
+
+    def evaluate_batch(self, snapshot: AccountSnapshot,
+                       candidates: list[OrderCandidate]) -> list[tuple[OrderCandidate, int]]:
+        if self.halted:
+            return []
+
+        cash = snapshot.cash
+        open_positions = len(snapshot.positions)
+        total_value = snapshot.total_value
+        max_value = total_value * self.max_position_pct
+        model = self.portfolio_risk
+        weights = model.weights(snapshot.positions, total_value) if model else None
+        approved = []
+        for candidate in sorted(candidates, key=lambda c: c.score, reverse=True):
+            if open_positions >= self.max_open_positions:
+                logger.info(f"Riskhantering: max antal positioner ({self.max_open_positions}) uppnått, "
+                            f"resterande köp nekas")
+                break
+            if candidate.price <= 0 or candidate.symbol in snapshot.positions:
+                continue
+            target_value = min(max_value, cash)
+            if model:
+                # Skala ned köp som är starkt korrelerade med det vi redan äger (inkl. tidigare köp i batchen)
+                multiplier = model.size_multiplier(candidate.symbol, weights)
+                if multiplier < 1.0:
+                    logger.info(f"Riskhantering: {candidate.symbol} korrelerar med portföljen, "
+                                f"storlek skalas till {multiplier:.0%}")
+                target_value *= multiplier
+            quantity = int(target_value / candidate.price)
+            if quantity <= 0:
+                continue
+            if model and candidate.symbol in model.cov.index:
+                weights[model.cov.index[candidate.symbol]] += quantity * candidate.price / total_value
+            cash -= quantity * candidate.price
+            open_positions += 1
+            approved.append((candidate, quantity))
+        return approved
 
     def can_open_position(self, broker: BaseBroker, symbol: str, price: float, quantity: float) -> tuple[bool, str]:
         positions = broker.get_positions()
         balance = broker.get_balance()
         total_value = balance + sum(p.market_value for p in positions.values())
 
+        if self.halted:
+            return False, f"Handelsstopp: dagsförlust ({self.daily_pnl:.0f})"
+
         if len(positions) >= self.max_open_positions:
             return False, f"Max antal positioner ({self.max_open_positions}) uppnått"
 
@@ -0,0 +1,275 @@
+import sys
+import os
+import argparse
+import gzip
+import logging
+import pickle
+import threading
+import time
+from collections.abc import Iterator
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.core.engine import TradingEngine
+
+logger = logging.getLogger("trading-bot")
+
+SESSION_VERSION = 1
+
+
+class SessionDivergence(Exception):
+    pass
+
+
+def _public_methods(target) -> list[str]:
+    return [name for name in dir(target) if not name.startswith("_") and callable(getattr(target, name, None))]
+
+
+def _dump_call(target: str, name: str, args: tuple, kwargs: dict, result=None,
+               error: Exception | None = None) -> bytes:
+    # Serialiseras direkt: brokern muterar samma Position-objekt senare i cykeln
+    try:
+        return pickle.dumps((target, name, args, kwargs, result, error), pickle.HIGHEST_PROTOCOL)
+    except (pickle.PicklingError, TypeError, AttributeError):
+        if error is None:
+            raise
+        return pickle.dumps((target, name, args, kwargs, None, RuntimeError(repr(error))), pickle.HIGHEST_PROTOCOL)
+
+
+class _RecordingProxy:
+
+    def __init__(self, target, name: str, recorder: "SessionRecorder"):
+        self._target = target
+        self._name = name
+        self._recorder = recorder
+
+    def __getattr__(self, attr: str):
+        value = getattr(self._target, attr)
+        if attr.startswith("_") or not callable(value):
+            return value
+
+        def call(*args, **kwargs):
+            return self._recorder._call(self._name, attr, value, args, kwargs)
+        return call
+
+
+class SessionRecorder:
+
+    def __init__(self, path: str):
+        # Spelar in allt motorn får från datakällan och brokern under varje cykel. Varje cykel
+        # skrivs som en egen gzip-medlem, så en krasch kostar som mest den pågående cykeln
+        self.path = path
+        self.cycles = 0
+        self._calls: list[bytes] = []
+        self._thread: int | None = None
+        self._started: datetime | None = None
+
+    @classmethod
+    def from_config(cls, config: dict) -> "SessionRecorder":
+        return cls(datetime.now().strftime(config.get("path", "data/sessions/%Y%m%d-%H%M%S.session")))
+
+    def attach(self, engine: TradingEngine) -> "SessionRecorder":
+        # Strategi och riskhantering sparas som de ser ut nu; uppspelningen utgår från samma tillstånd
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        header = {
+            "version": SESSION_VERSION,
+            "created": datetime.now(),
+            "symbols": list(engine.symbols),
+            "strategy": engine.strategy,
+            "risk_manager": engine.risk_manager,
+            "methods": {"data": _public_methods(engine.data_fetcher), "broker": _public_methods(engine.broker)},
+        }
+        with gzip.open(self.path, "wb") as f:
+            pickle.dump(header, f, pickle.HIGHEST_PROTOCOL)
+
+        # Cykelns starttid blir dagsgränsens klocka, så uppspelningen byter handelsdag på samma cykel
+        engine.risk_manager.clock = self._clock
+        engine.data_fetcher = _RecordingProxy(engine.data_fetcher, "data", self)
+        engine.broker = _RecordingProxy(engine.broker, "broker", self)
+        # Bara själva cykeln spelas in; cykellyssnare (t.ex. dashboardens publicering) körs
+        # efteråt i run_once och finns inte vid uppspelning
+        run_cycle = engine._run_cycle
+
+        def recorded_run_cycle():
+            self._begin()
+            try:
+                run_cycle()
+            finally:
+                self._end(engine)
+        engine._run_cycle = recorded_run_cycle
+        logger.info(f"Spelar in sessionen till {self.path}")
+        return self
+
+    def _begin(self):
+        self._calls = []
+        self._started = datetime.now()
+        self._thread = threading.get_ident()
+
+    def _end(self, engine: TradingEngine):
+        self._thread = None
+        record = {
+            "cycle": self.cycles,
+            "time": self._started,
+            "stop_monitor": bool(engine.stop_monitor and engine.stop_monitor.running),
+            "calls": self._calls,
+        }
+        with gzip.open(self.path, "ab") as f:
+            pickle.dump(record, f, pickle.HIGHEST_PROTOCOL)
+        self.cycles += 1
+        self._calls = []
+
+    def _clock(self) -> datetime:
+        if self._thread == threading.get_ident():
+            return self._started
+        return datetime.now()
+
+    def _call(self, target: str, name: str, method, args: tuple, kwargs: dict):
+        # Bara motorns egen tråd under run_once spelas in — dashboarden och StopMonitor
+        # läser samma broker parallellt
+        if self._thread != threading.get_ident():
+            return method(*args, **kwargs)
+        try:
+            result = method(*args, **kwargs)
+        except Exception as e:
+            self._calls.append(_dump_call(target, name, args, kwargs, error=e))
+            raise
+        self._calls.append(_dump_call(target, name, args, kwargs, result))
+        return result
+
+
+def read_session(path: str) -> Iterator[dict]:
+    # Huvudet först, sedan en post per cykel; en avbruten sista cykel ignoreras
+    with gzip.open(path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+class _ReplayProxy:
+
+    def __init__(self, name: str, methods: list[str], player: "SessionPlayer"):
+        self._name = name
+        self._methods = set(methods)
+        self._player = player
+
+    def __getattr__(self, attr: str):
+        # hasattr(broker, "update_prices") ska svara som den inspelade brokern gjorde
+        if attr not in self._methods:
+            raise AttributeError(attr)
+
+        def call(*args, **kwargs):
+            return self._player._next(self._name, attr, args, kwargs)
+        return call
+
+
+class _RecordedStopMonitor:
+
+    def __init__(self, running: bool):
+        self.running = running
+
+    def stop(self):
+        self.running = False
+
+
+class SessionPlayer:
+
+    def __init__(self, path: str):
+        self.path = path
+        self.divergence: SessionDivergence | None = None
+        self._records = read_session(path)
+        header = next(self._records)
+        if header.get("version") != SESSION_VERSION:
+            raise ValueError(f"Okänd sessionsversion {header.get('version')} i {path}")
+        self.header = header
+        self.engine = TradingEngine(
+            broker=_ReplayProxy("broker", header["methods"]["broker"], self),
+            strategy=header["strategy"],
+            risk_manager=header["risk_manager"],
+            data_fetcher=_ReplayProxy("data", header["methods"]["data"], self),
+            symbols=header["symbols"],
+        )
+        self.orders = []
+        self._cycle: dict | None = None
+        self._position = 0
+
+    def run(self, max_cycles: int | None = None) -> dict:
+        # Så fort som möjligt — ingen väntan mellan cyklerna, ingen nätverkstrafik
+        started = time.perf_counter()
+        cycles = calls = 0
+        for record in self._records:
+            if max_cycles is not None and cycles >= max_cycles:
+                break
+            self.play(record)
+            cycles += 1
+            calls += len(record["calls"])
+        return {
+            "cycles": cycles,
+            "calls": calls,
+            "orders": len(self.orders),
+            "trades": self.engine.portfolio.get_trade_count(),
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
+    def play(self, record: dict):
+        self._cycle, self._position = record, 0
+        self.engine.risk_manager.clock = lambda: record["time"]
+        self.engine.stop_monitor = _RecordedStopMonitor(record["stop_monitor"])
+        self.engine.run_once()
+        # Motorn fångar fel per symbol, så en avvikelse rapporteras först när cykeln är klar
+        if self.divergence is None and self._position < len(record["calls"]):
+            target, name, args, kwargs, _, _ = pickle.loads(record["calls"][self._position])
+            self.divergence = SessionDivergence(
+                f"Cykel {record['cycle']}: inspelat anrop {target}.{name}{args} gjordes aldrig vid uppspelning")
+        if self.divergence is not None:
+            raise self.divergence
+
+    def _next(self, target: str, name: str, args: tuple, kwargs: dict):
+        if self.divergence is not None:
+            raise self.divergence
+        calls = self._cycle["calls"]
+        if self._position >= len(calls):
+            self.divergence = SessionDivergence(
+                f"Cykel {self._cycle['cycle']}: oväntat anrop {target}.{name}{args} efter inspelningens slut")
+            raise self.divergence
+        expected = pickle.loads(calls[self._position])
+        if expected[:4] != (target, name, args, kwargs):
+            self.divergence = SessionDivergence(
+                f"Cykel {self._cycle['cycle']}, anrop {self._position}: inspelat {expected[0]}.{expected[1]}"
+                f"{expected[2]}, uppspelat {target}.{name}{args}")
+            raise self.divergence
+        self._position += 1
+        result, error = expected[4], expected[5]
+        if error is not None:
+            raise error
+        if name == "place_order":
+            self.orders.append(result)
+        return result
+
+
+def replay_session(path: str, max_cycles: int | None = None) -> dict:
+    return SessionPlayer(path).run(max_cycles)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Spela upp en inspelad session mot motorn")
+    parser.add_argument("path")
+    parser.add_argument("--cycles", type=int, default=None)
+    parser.add_argument("--verbose", action="store_true", help="Visa motorns loggning under uppspelningen")
+    args = parser.parse_args()
+
+    logging.basicConfig(format="%(asctime)s [%(levelname)s] %(message)s", datefmt="%H:%M:%S")
+    logger.setLevel(logging.INFO if args.verbose else logging.WARNING)
+    try:
+        summary = replay_session(args.path, args.cycles)
+    except SessionDivergence as e:
+        logger.error(f"Uppspelningen avvek från inspelningen: {e}")
+        sys.exit(1)
+    print(" | ".join(f"{key}: {value}" for key, value in summary.items()))
+
+
+if __name__ == "__main__":
+    main()
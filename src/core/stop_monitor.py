@@ -0,0 +1,129 @@
+import logging
+import threading
+from collections.abc import Callable
+
+from src.brokers.base import BaseBroker, Order, OrderSide, OrderStatus, Position
+from src.brokers.ratelimit import RequestPriority, request_priority
+from src.core.portfolio import Portfolio
+from src.utils.logger import log_trade
+
+logger = logging.getLogger("trading-bot")
+
+
+class StopMonitor:
+
+    def __init__(self, broker: BaseBroker, data_fetcher, portfolio: Portfolio, stop_loss_pct: float = 0.05,
+                 trailing_stop_pct: float = 0.0, interval_seconds: float = 5.0,
+                 order_lock=None, on_unknown_order: Callable[[Order, float], None] | None = None):
+        self.broker = broker
+        self.data_fetcher = data_fetcher
+        self.portfolio = portfolio
+        self.stop_loss_pct = stop_loss_pct
+        self.trailing_stop_pct = trailing_stop_pct
+        self.interval_seconds = interval_seconds
+        self.order_lock = order_lock or threading.Lock()
+        # Tar över ordrar med okänt utfall (se TradingEngine._track_unknown)
+        self.on_unknown_order = on_unknown_order
+        # Högsta pris sedan positionen öppnades, uppdateras inkrementellt per pris
+        self.high_water: dict[str, float] = {}
+        self.positions: dict[str, Position] = {}
+        self.pending_exits: set[str] = set()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="stop-monitor", daemon=True)
+        self._thread.start()
+        logger.info(f"Stop-övervakning startad (var {self.interval_seconds:g}s)")
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval_seconds + 1)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Stop-övervakning misslyckades: {e}")
+            self._stop_event.wait(self.interval_seconds)
+
+    def poll(self) -> list[str]:
+        # Hämtar bara priser för det vi faktiskt äger
+        with request_priority(RequestPriority.STOP_LOSS):
+            self.refresh_positions()
+            if not self.positions:
+                return []
+            prices = self.data_fetcher.get_prices_bulk(list(self.positions))
+        if hasattr(self.broker, "update_prices"):
+            with self.order_lock:
+                self.broker.update_prices(prices)
+        exited = []
+        for symbol, price in prices.items():
+            if self.on_price(symbol, price):
+                exited.append(symbol)
+        return exited
+
+    def refresh_positions(self):
+        self.positions = self.broker.get_positions()
+        for symbol in list(self.high_water):
+            if symbol not in self.positions:
+                del self.high_water[symbol]
+        self.pending_exits &= set(self.positions)
+
+    def stop_price(self, symbol: str) -> float:
+        pos = self.positions[symbol]
+        stop = pos.avg_price * (1 - self.stop_loss_pct)
+        if self.trailing_stop_pct > 0 and symbol in self.high_water:
+            stop = max(stop, self.high_water[symbol] * (1 - self.trailing_stop_pct))
+        return stop
+
+    def on_price(self, symbol: str, price: float) -> bool:
+        pos = self.positions.get(symbol)
+        if pos is None or price <= 0 or symbol in self.pending_exits:
+            return False
+        if price > self.high_water.get(symbol, pos.avg_price):
+            self.high_water[symbol] = price
+        if price > self.stop_price(symbol):
+            return False
+        return self._exit(pos, price)
+
+    def _exit(self, pos: Position, price: float) -> bool:
+        symbol = pos.symbol
+        with self.order_lock, request_priority(RequestPriority.STOP_LOSS):
+            # Läs om positionen under låset — motorn kan ha sålt den sedan refresh_positions,
+            # och en live-broker ger nya objekt så ögonblicksbilden visar fortfarande hela innehavet
+            current = self.broker.get_position(symbol)
+            if current is None or current.quantity <= 0:
+                self.positions.pop(symbol, None)
+                self.high_water.pop(symbol, None)
+                return False
+            # Läs av innan ordern — PaperBroker muterar samma Position-objekt vid försäljning
+            quantity, avg_price = current.quantity, current.avg_price
+            trailing = self.high_water.get(symbol, avg_price) > avg_price and self.trailing_stop_pct > 0
+            kind = "TRAILING STOP" if trailing else "STOP-LOSS"
+            logger.warning(f"{kind}: Säljer {symbol} @ {price:.2f} (inköp {avg_price:.2f})")
+            order = self.broker.place_order(symbol, OrderSide.SELL, quantity, price)
+            if order.status in (OrderStatus.PENDING, OrderStatus.UNKNOWN):
+                # Live-order ligger kvar hos brokern — skicka inte en till förrän positionen är borta
+                self.pending_exits.add(symbol)
+                if order.status == OrderStatus.UNKNOWN and self.on_unknown_order:
+                    self.on_unknown_order(order, avg_price)
+                return False
+            if order.status != OrderStatus.FILLED:
+                return False
+            # Bokförs under låset till fyllnadspriset; motortråden skriver till samma Portfolio
+            pnl = (order.price - avg_price) * quantity
+            log_trade(f"{kind} SÅLT", order.order_id, symbol, OrderSide.SELL, quantity, order.price, pnl)
+            self.portfolio.record_trade(symbol, OrderSide.SELL, quantity, order.price, pnl)
+        self.positions.pop(symbol, None)
+        self.high_water.pop(symbol, None)
+        return True
@@ -1,28 +1,25 @@
 import sys
 import os
+import argparse
 import secrets
 import logging
-import threading
-import time
 import functools
+import json
+import time
 from datetime import datetime
 
-from flask import Flask, render_template, jsonify, request, session, redirect, url_for
+from flask import Flask, Response, abort, render_template, jsonify, request, session, redirect, url_for, stream_with_context
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-import yaml
-from src.brokers.paper_broker import PaperBroker
-from src.core.engine import TradingEngine
-from src.core.risk import RiskManager
-from src.data.fetcher import DataFetcher
-from src.strategies.rsi_strategy import RSIStrategy
-from src.strategies.macd_strategy import MACDStrategy
-from src.strategies.bollinger_strategy import BollingerStrategy
-from src.strategies.momentum_strategy import MomentumStrategy
-from src.utils.logger import setup_logger
+from src.brokers.base import OrderSide
+from src.dashboard.backend import EmbeddedBackend, StoreBackend
+from src.dashboard.cache import ResponseCache, cached_json
+from src.dashboard.jobs import BacktestJobs, BacktestRequest, JobQueueFull, StoreBacktestJobs
+from src.dashboard.service import create_engine, load_config
+from src.dashboard.store import StateStore
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", secrets.token_hex(32))
@@ -33,16 +30,17 @@ limiter = Limiter(get_remote_address, app=app, default_limits=["60 per minute"])
 # Audit logger
 audit_log = logging.getLogger("audit")
 
-STRATEGIES = {
-    "rsi": RSIStrategy,
-    "macd": MACDStrategy,
-    "bollinger": BollingerStrategy,
-    "momentum": MomentumStrategy,
-}
+# Med TRADING_BOT_STORE satt körs boten i en egen process (src/dashboard/service.py) och
+# dashboarden läser bara den delade lagringen — då går det bra med flera gunicorn-workers
+STORE_PATH = os.environ.get("TRADING_BOT_STORE")
+backend = StoreBackend(StateStore(STORE_PATH)) if STORE_PATH else EmbeddedBackend(create_engine)
+response_cache = ResponseCache()
+backtests: BacktestJobs | StoreBacktestJobs | None = None
 
-engine = None
-bot_thread = None
-bot_running = False
+# Varje SSE-ström avslutas efter så här lång tid; EventSource ansluter om med Last-Event-ID och
+# fortsätter där den slutade. Håller nere antalet trådar som strömmar binder i gunicorn-workern
+STREAM_MAX_SECONDS = float(os.environ.get("DASHBOARD_STREAM_MAX_SECONDS", 300))
+STREAM_RETRY_MS = 1000
 
 DASHBOARD_USER = os.environ.get("DASHBOARD_USER", "admin")
 DASHBOARD_PASS = os.environ.get("DASHBOARD_PASS")
@@ -111,46 +109,20 @@ def logout():
     return redirect(url_for("login"))
 
 
-# --- Config ---
-
-def load_config(path: str = "config/settings.yaml") -> dict:
-    with open(path) as f:
-        return yaml.safe_load(f)
-
-
-def create_engine():
-    config = load_config()
-    setup_logger(
-        level=config.get("logging", {}).get("level", "INFO"),
-        trade_log=config.get("logging", {}).get("trade_log", "logs/trades.log"),
-        signal_log=config.get("logging", {}).get("signal_log", "logs/signals.log"),
-    )
-
-    symbols = []
-    for market_symbols in config.get("symbols", {}).values():
-        symbols.extend(market_symbols)
-
-    paper_config = config.get("paper_trading", {})
-    broker = PaperBroker(initial_balance=paper_config.get("initial_balance", 100000))
-
-    strategy_name = config.get("strategy", "rsi")
-    strategy = STRATEGIES.get(strategy_name, RSIStrategy)()
+def state_version() -> str | None:
+    return backend.version()
 
-    risk_config = config.get("risk", {})
-    risk_manager = RiskManager(
-        max_position_pct=risk_config.get("max_position_pct", 0.10),
-        stop_loss_pct=risk_config.get("stop_loss_pct", 0.05),
-        daily_loss_limit_pct=risk_config.get("daily_loss_limit_pct", 0.03),
-        max_open_positions=risk_config.get("max_open_positions", 10),
-    )
 
-    return TradingEngine(
-        broker=broker,
-        strategy=strategy,
-        risk_manager=risk_manager,
-        data_fetcher=DataFetcher(),
-        symbols=symbols,
-    )
+def backtest_jobs() -> BacktestJobs | StoreBacktestJobs:
+    # Med en separat bot-process körs jobben där och delas via lagringen; annars i den här processen
+    global backtests
+    if backtests is None:
+        config = load_config()
+        if isinstance(backend, StoreBackend):
+            backtests = StoreBacktestJobs.from_config(backend.store, config)
+        else:
+            backtests = BacktestJobs.from_config(config)
+    return backtests
 
 
 # --- Routes ---
@@ -164,130 +136,159 @@ def index():
 @app.route("/api/status")
 @login_required
 @limiter.limit("30 per minute")
+@cached_json(response_cache, state_version)
 def api_status():
-    global engine, bot_running
-    if not engine:
-        return jsonify({"status": "not_initialized", "bot_running": False})
-
-    broker = engine.broker
-    positions = broker.get_positions()
-    pos_value = sum(p.market_value for p in positions.values())
-
-    return jsonify({
-        "bot_running": bot_running,
-        "strategy": engine.strategy.__class__.__name__,
-        "cash": round(broker.get_balance(), 2),
-        "positions_value": round(pos_value, 2),
-        "total_value": round(broker.get_balance() + pos_value, 2),
-        "initial_balance": broker.initial_balance,
-        "pnl": round(broker.get_balance() + pos_value - broker.initial_balance, 2),
-        "pnl_pct": round((broker.get_balance() + pos_value - broker.initial_balance) / broker.initial_balance * 100, 2),
-        "num_positions": len(positions),
-        "total_trades": engine.portfolio.get_trade_count(),
-        "win_rate": round(engine.portfolio.get_win_rate() * 100, 1),
-        "symbols": engine.symbols,
-    })
+    return backend.status()
 
 
 @app.route("/api/positions")
 @login_required
 @limiter.limit("30 per minute")
+@cached_json(response_cache, state_version)
 def api_positions():
-    if not engine:
-        return jsonify([])
-
-    positions = []
-    for symbol, pos in engine.broker.get_positions().items():
-        positions.append({
-            "symbol": symbol,
-            "quantity": pos.quantity,
-            "avg_price": round(pos.avg_price, 2),
-            "current_price": round(pos.current_price, 2),
-            "market_value": round(pos.market_value, 2),
-            "pnl": round(pos.unrealized_pnl, 2),
-            "pnl_pct": round(pos.unrealized_pnl_pct * 100, 2),
-        })
-    return jsonify(positions)
+    return backend.positions()
 
 
 @app.route("/api/trades")
 @login_required
 @limiter.limit("30 per minute")
+@cached_json(response_cache, state_version)
 def api_trades():
-    if not engine:
-        return jsonify([])
-
-    trades = []
-    for t in reversed(engine.portfolio.trade_records[-50:]):
-        trades.append({
-            "symbol": t.symbol,
-            "side": t.side.value,
-            "quantity": t.quantity,
-            "price": round(t.price, 2),
-            "pnl": round(t.pnl, 2),
-            "timestamp": t.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-        })
-    return jsonify(trades)
+    # Sidor nyast först; next_cursor från svaret hämtar nästa (äldre) sida
+    try:
+        return backend.trade_page(
+            cursor=request.args.get("cursor"),
+            symbol=request.args.get("symbol") or None,
+            side=OrderSide(request.args["side"]) if request.args.get("side") else None,
+            start=datetime.fromisoformat(request.args["start"]) if request.args.get("start") else None,
+            end=datetime.fromisoformat(request.args["end"]) if request.args.get("end") else None,
+            limit=max(1, min(request.args.get("limit", 50, type=int), 500)),
+        )
+    except ValueError as e:
+        abort(Response(json.dumps({"error": str(e)}), status=400, mimetype="application/json"))
+
+
+@app.route("/api/stream")
+@login_required
+@limiter.limit("10 per minute")
+def api_stream():
+    # Server-Sent Events: deltan produceras en gång per cykel och delas av alla klienter
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+
+    def generate(last_id: int | None):
+        deadline = time.monotonic() + STREAM_MAX_SECONDS
+        pending = backend.events_since(last_id) if last_id is not None else None
+        if pending is None:
+            snapshot = backend.snapshot()
+            if snapshot:
+                yield snapshot.encode()
+                last_id = snapshot.id
+            else:
+                last_id = 0
+            pending = []
+        while True:
+            for event in pending:
+                yield event.encode()
+                last_id = event.id
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                yield f"retry: {STREAM_RETRY_MS}\n\n"
+                return
+            pending = backend.wait(last_id, timeout=min(15.0, remaining))
+            if pending is None:
+                # Klienten hann halka efter bufferten — skicka en ny ögonblicksbild
+                snapshot = backend.snapshot()
+                yield snapshot.encode()
+                last_id, pending = snapshot.id, []
+            elif not pending:
+                yield ": keepalive\n\n"
+
+    last_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    return Response(stream_with_context(generate(last_id)), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
 @app.route("/api/equity")
 @login_required
 @limiter.limit("30 per minute")
+@cached_json(response_cache, state_version)
 def api_equity():
-    if not engine:
-        return jsonify([])
-
-    balance = engine.broker.initial_balance
-    equity_curve = [{"time": "Start", "value": balance}]
-    for t in engine.portfolio.trade_records:
-        balance += t.pnl
-        equity_curve.append({
-            "time": t.timestamp.strftime("%H:%M:%S"),
-            "value": round(balance, 2),
-        })
-    return jsonify(equity_curve)
+    # Inkrementell kurva: ?since=<markör> ger bara nya punkter, ?points=N nedsamplar med LTTB
+    return backend.equity(
+        since=request.args.get("since", 0, type=int),
+        max_points=min(request.args.get("points", 500, type=int), 5000),
+        start=request.args.get("start", type=datetime.fromisoformat),
+        end=request.args.get("end", type=datetime.fromisoformat),
+    )
 
 
 @app.route("/api/start", methods=["POST"])
 @login_required
 @limiter.limit("5 per minute")
 def api_start():
-    global engine, bot_thread, bot_running
-    if bot_running:
-        return jsonify({"status": "already_running"})
-
     audit_log.warning(f"BOT STARTAD av {request.remote_addr}")
-    engine = create_engine()
-    bot_running = True
-
-    def run_bot():
-        global bot_running
-        bot_logger = logging.getLogger("trading-bot")
-        while bot_running:
-            try:
-                engine.run_once()
-            except Exception as e:
-                bot_logger.error(f"Bot-cykel misslyckades: {e}")
-            time.sleep(60)
-
-    bot_thread = threading.Thread(target=run_bot, daemon=True)
-    bot_thread.start()
-    return jsonify({"status": "started"})
+    response_cache.clear()
+    return jsonify({"status": backend.start()})
 
 
 @app.route("/api/stop", methods=["POST"])
 @login_required
 @limiter.limit("5 per minute")
 def api_stop():
-    global bot_running
     audit_log.warning(f"BOT STOPPAD av {request.remote_addr}")
-    bot_running = False
-    if engine:
-        engine.stop()
-    return jsonify({"status": "stopped"})
+    return jsonify({"status": backend.stop()})
+
+
+@app.route("/api/backtests", methods=["GET", "POST"])
+@login_required
+@limiter.limit("30 per minute")
+def api_backtests():
+    jobs = backtest_jobs()
+    if request.method == "GET":
+        return jsonify([job.to_dict(include_result=False) for job in jobs.list()])
+    try:
+        job = jobs.submit(BacktestRequest.from_dict(request.get_json(silent=True) or {}))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 429
+    audit_log.warning(f"BACKTEST {job.id} ({job.request.strategy}) av {request.remote_addr}")
+    return jsonify(job.to_dict()), 200 if job.status == "done" else 202
+
+
+@app.route("/api/backtests/<job_id>")
+@login_required
+@limiter.limit("60 per minute")
+def api_backtest(job_id: str):
+    job = backtest_jobs().get(job_id)
+    if job is None:
+        return jsonify({"error": "Okänt jobb"}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route("/api/backtests/<job_id>/cancel", methods=["POST"])
+@login_required
+@limiter.limit("10 per minute")
+def api_backtest_cancel(job_id: str):
+    job = backtest_jobs().cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Okänt jobb"}), 404
+    return jsonify(job.to_dict(include_result=False))
 
 
 if __name__ == "__main__":
     os.chdir(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-    engine = create_engine()
+    parser = argparse.ArgumentParser(description="Dashboard för trading-boten")
+    # Utan flagga (och utan TRADING_BOT_STORE) kör boten i den här processen
+    parser.add_argument("--store", nargs="?", const="", default=None, metavar="PATH",
+                        help="Läs en separat bot-process (src/dashboard/service.py) via dess lagring; "
+                             "utan PATH används dashboard.store från konfigurationen")
+    args = parser.parse_args()
+    store_path = STORE_PATH
+    if args.store is not None:
+        store_path = args.store or load_config().get("dashboard", {}).get("store", "data/dashboard.db")
+    if store_path:
+        backend = StoreBackend(StateStore(store_path))
+    else:
+        backend.init_engine()
     app.run(debug=False, host="127.0.0.1", port=5000)
@@ -0,0 +1,233 @@
+import base64
+import json
+import logging
+import threading
+import time
+from collections.abc import Callable
+from datetime import datetime
+
+import numpy as np
+
+from src.brokers.base import OrderSide
+from src.core.equity import lttb
+from src.core.ledger import to_utc
+from src.dashboard.events import (Event, EventBuffer, StatePublisher, position_payload, status_payload,
+                                  trade_payloads)
+from src.dashboard.store import StateStore
+
+logger = logging.getLogger("trading-bot")
+
+
+def equity_payload(cursor: int, times: np.ndarray, values: np.ndarray, max_points: int) -> dict:
+    if len(times) > max_points:
+        keep = lttb(times.astype(np.int64), values, max_points)
+        times, values = times[keep], values[keep]
+    labels = np.datetime_as_string(times, unit="m")
+    return {
+        "cursor": cursor,
+        "points": [{"time": t.replace("T", " "), "value": round(float(v), 2)} for t, v in zip(labels, values)],
+    }
+
+
+def encode_cursor(before: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"before": before}).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        before = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))["before"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Ogiltig markör: {cursor}") from e
+    if not isinstance(before, int):
+        raise ValueError(f"Ogiltig markör: {cursor}")
+    return before
+
+
+def trade_summary(trades: list[dict]) -> dict:
+    sells = [t for t in trades if t["side"] == OrderSide.SELL.value]
+    wins = sum(1 for t in sells if t["pnl"] > 0)
+    return {
+        "count": len(trades),
+        "buys": len(trades) - len(sells),
+        "sells": len(sells),
+        "volume": round(sum(t["quantity"] * t["price"] for t in trades), 2),
+        "pnl": round(sum(t["pnl"] for t in trades), 2),
+        "win_rate": round(wins / len(sells) * 100, 1) if sells else 0.0,
+    }
+
+
+def trade_page_payload(trades: list[dict], limit: int) -> dict:
+    # En extra rad hämtas för att avgöra om det finns fler sidor
+    page = trades[:limit]
+    return {
+        "trades": page,
+        "next_cursor": encode_cursor(page[-1]["id"]) if len(trades) > limit else None,
+        "summary": trade_summary(page),
+    }
+
+
+class EmbeddedBackend:
+
+    def __init__(self, engine_factory: Callable, interval_seconds: float = 60):
+        # Motorn körs i en tråd i webbprocessen — fungerar bara med en enda worker
+        self.engine_factory = engine_factory
+        self.interval_seconds = interval_seconds
+        self.engine = None
+        self.publisher: StatePublisher | None = None
+        self.events = EventBuffer()
+        self.generation = 0
+        self.running = False
+        self._thread: threading.Thread | None = None
+        self._stop_event = threading.Event()
+
+    def attach(self, engine):
+        self.engine = engine
+        self.generation += 1
+        self.publisher = StatePublisher(engine, self.events)
+        engine.cycle_listeners.append(self.publisher.publish_cycle)
+        self.publisher.publish_cycle()
+        return engine
+
+    def init_engine(self):
+        return self.attach(self.engine_factory())
+
+    def version(self) -> str | None:
+        # Generation skiljer en omstartad motor från den förra, vars räknare också började på noll
+        if not self.engine:
+            return None
+        return f"{self.generation}.{self.engine.state_version}.{int(self.running)}"
+
+    def status(self) -> dict:
+        if not self.engine:
+            return {"status": "not_initialized", "bot_running": False}
+        return status_payload(self.engine, self.running)
+
+    def positions(self) -> list[dict]:
+        if not self.engine:
+            return []
+        return [position_payload(pos) for pos in self.engine.broker.get_positions().values()]
+
+    def trades(self, limit: int = 50) -> list[dict]:
+        if not self.engine:
+            return []
+        ledger = self.engine.portfolio.ledger
+        trades = trade_payloads(ledger, ledger.tail(limit))
+        trades.reverse()
+        return trades
+
+    def trade_page(self, cursor: str | None = None, symbol: str | None = None, side: OrderSide | None = None,
+                   start: datetime | None = None, end: datetime | None = None, limit: int = 50) -> dict:
+        if not self.engine:
+            return trade_page_payload([], limit)
+        ledger = self.engine.portfolio.ledger
+        # Ledgern är i UTC, filtren anges i lokal tid
+        rows = ledger.query(symbol, side, start and to_utc(start), end and to_utc(end),
+                            decode_cursor(cursor) if cursor else None, limit + 1)
+        trades = trade_payloads(ledger, ledger.take(rows))
+        for trade, row in zip(trades, rows.tolist()):
+            trade["id"] = row
+        return trade_page_payload(trades, limit)
+
+    def equity(self, since: int = 0, max_points: int = 500, start: datetime | None = None,
+               end: datetime | None = None) -> dict:
+        if not self.engine:
+            return {"cursor": 0, "points": []}
+        equity = self.engine.portfolio.equity
+        times, values = equity.window(since, start, end)
+        return equity_payload(len(equity), times, values, max_points)
+
+    def snapshot(self) -> Event | None:
+        return self.publisher.snapshot() if self.publisher else None
+
+    def events_since(self, last_id: int) -> list[Event] | None:
+        return self.events.since(last_id)
+
+    def wait(self, last_id: int, timeout: float = 15.0) -> list[Event] | None:
+        return self.events.wait(last_id, timeout)
+
+    def start(self) -> str:
+        if self.running:
+            return "already_running"
+        engine = self.init_engine()
+        self.running = True
+        self.publisher.set_running(True)
+        # Egen stoppsignal per körning, så att en gammal tråd aldrig lever vidare efter omstart
+        self._stop_event = stop_event = threading.Event()
+
+        def run_bot():
+            while not stop_event.is_set():
+                try:
+                    engine.run_once()
+                except Exception as e:
+                    logger.error(f"Bot-cykel misslyckades: {e}")
+                stop_event.wait(self.interval_seconds)
+
+        self._thread = threading.Thread(target=run_bot, daemon=True)
+        self._thread.start()
+        if engine.stop_monitor:
+            engine.stop_monitor.start()
+        return "started"
+
+    def stop(self) -> str:
+        self.running = False
+        self._stop_event.set()
+        if self.engine:
+            self.engine.stop()
+        if self.publisher:
+            self.publisher.set_running(False)
+        return "stopped"
+
+
+class StoreBackend:
+
+    def __init__(self, store: StateStore, poll_seconds: float = 0.5):
+        # Läser det boten publicerat i den delade lagringen; inga broker-anrop i webbprocessen
+        self.store = store
+        self.poll_seconds = poll_seconds
+
+    def version(self) -> str | None:
+        return self.store.get("version")
+
+    def status(self) -> dict:
+        return self.store.get("status") or {"status": "not_initialized", "bot_running": False}
+
+    def positions(self) -> list[dict]:
+        return self.store.get("positions", [])
+
+    def trades(self, limit: int = 50) -> list[dict]:
+        return self.store.recent_trades(limit)
+
+    def trade_page(self, cursor: str | None = None, symbol: str | None = None, side: OrderSide | None = None,
+                   start: datetime | None = None, end: datetime | None = None, limit: int = 50) -> dict:
+        trades = self.store.trade_page(
+            symbol, side.value if side else None, start.isoformat() if start else None,
+            end.isoformat() if end else None, decode_cursor(cursor) if cursor else None, limit + 1)
+        return trade_page_payload(trades, limit)
+
+    def equity(self, since: int = 0, max_points: int = 500, start: datetime | None = None,
+               end: datetime | None = None) -> dict:
+        cursor, times, values = self.store.equity(
+            since, start.isoformat() if start else None, end.isoformat() if end else None)
+        return equity_payload(cursor, times, values, max_points)
+
+    def snapshot(self) -> Event:
+        return self.store.snapshot()
+
+    def events_since(self, last_id: int) -> list[Event] | None:
+        return self.store.events_since(last_id)
+
+    def wait(self, last_id: int, timeout: float = 15.0) -> list[Event] | None:
+        deadline = time.monotonic() + timeout
+        while True:
+            events = self.store.events_since(last_id)
+            if events != [] or time.monotonic() >= deadline:
+                return events
+            time.sleep(self.poll_seconds)
+
+    def start(self) -> str:
+        self.store.send_command("start")
+        return "start_requested"
+
+    def stop(self) -> str:
+        self.store.send_command("stop")
+        return "stop_requested"
@@ -0,0 +1,69 @@
+import functools
+import json
+import threading
+import zlib
+from collections.abc import Callable
+
+from flask import Response, jsonify, request
+
+
+class ResponseCache:
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        # nyckel -> (version, serialiserad kropp)
+        self.entries: dict[str, tuple[str, bytes]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def etag(key: str, version: str) -> str:
+        # Härleds enbart från nyckel och version, så 304 kan avgöras innan något byggs
+        return f"{zlib.crc32(key.encode()):08x}-{version}"
+
+    def get(self, key: str, version: str, build: Callable[[], object]) -> bytes:
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] == version:
+                self.hits += 1
+                return entry[1]
+        body = json.dumps(build(), separators=(",", ":")).encode()
+        with self._lock:
+            self.misses += 1
+            if key not in self.entries and len(self.entries) >= self.max_entries:
+                self.entries.pop(next(iter(self.entries)))
+            self.entries[key] = (version, body)
+        return body
+
+    def mark_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+
+def cached_json(cache: ResponseCache, version: Callable[[], str | None]):
+    # Svaret byggs om bara när motorns tillståndsversion ändrats; oförändrade pollningar får 304
+    def decorator(f):
+        @functools.wraps(f)
+        def decorated(*args, **kwargs):
+            current = version()
+            if current is None:
+                return jsonify(f(*args, **kwargs))
+            key = request.full_path
+            etag = cache.etag(key, current)
+            if request.if_none_match.contains(etag):
+                cache.mark_not_modified()
+                response = Response(status=304)
+            else:
+                body = cache.get(key, current, lambda: f(*args, **kwargs))
+                response = Response(body, mimetype="application/json")
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = "no-cache"
+            return response
+        return decorated
+    return decorator
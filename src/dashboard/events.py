@@ -0,0 +1,162 @@
+import json
+import threading
+from collections import deque
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.brokers.base import Position
+from src.core.ledger import TradeLedger, utc_to_local
+from src.utils.memory import rss_mb
+
+RECENT_TRADES = 50
+
+
+@dataclass
+class Event:
+    id: int
+    type: str
+    data: object
+
+    def encode(self) -> str:
+        return f"id: {self.id}\nevent: {self.type}\ndata: {json.dumps(self.data, separators=(',', ':'))}\n\n"
+
+
+def position_payload(pos: Position) -> dict:
+    return {
+        "symbol": pos.symbol,
+        "quantity": pos.quantity,
+        "avg_price": round(pos.avg_price, 2),
+        "current_price": round(pos.current_price, 2),
+        "market_value": round(pos.market_value, 2),
+        "pnl": round(pos.unrealized_pnl, 2),
+        "pnl_pct": round(pos.unrealized_pnl_pct * 100, 2),
+    }
+
+
+def trade_payloads(ledger: TradeLedger, cols: dict[str, np.ndarray]) -> list[dict]:
+    return [
+        {
+            "symbol": ledger.symbols[symbol_id],
+            "side": side.value,
+            "quantity": float(quantity),
+            "price": round(float(price), 2),
+            "pnl": round(float(pnl), 2),
+            "timestamp": timestamp.isoformat(sep=" ", timespec="seconds"),
+        }
+        for symbol_id, side, quantity, price, pnl, timestamp in zip(
+            cols["symbol_id"], ledger.sides(cols["side"]), cols["quantity"], cols["price"], cols["pnl"],
+            utc_to_local(cols["timestamp"]))
+    ]
+
+
+def status_payload(engine, bot_running: bool, positions: dict[str, Position] | None = None,
+                   cash: float | None = None) -> dict:
+    broker = engine.broker
+    positions = broker.get_positions() if positions is None else positions
+    cash = broker.get_balance() if cash is None else cash
+    pos_value = sum(p.market_value for p in positions.values())
+    total_value = cash + pos_value
+    return {
+        "bot_running": bot_running,
+        "strategy": engine.strategy.__class__.__name__,
+        "cash": round(cash, 2),
+        "positions_value": round(pos_value, 2),
+        "total_value": round(total_value, 2),
+        "initial_balance": broker.initial_balance,
+        "pnl": round(total_value - broker.initial_balance, 2),
+        "pnl_pct": round((total_value - broker.initial_balance) / broker.initial_balance * 100, 2),
+        "num_positions": len(positions),
+        "total_trades": engine.portfolio.get_trade_count(),
+        "win_rate": round(engine.portfolio.get_win_rate() * 100, 1),
+        "symbols": engine.symbols,
+        "memory_mb": round(rss_mb(), 1),
+    }
+
+
+class EventBuffer:
+
+    def __init__(self, maxlen: int = 1000):
+        self.events: deque[Event] = deque(maxlen=maxlen)
+        self.last_id = 0
+        self._cond = threading.Condition()
+
+    def publish(self, type_: str, data) -> Event:
+        with self._cond:
+            self.last_id += 1
+            event = Event(self.last_id, type_, data)
+            self.events.append(event)
+            self._cond.notify_all()
+        return event
+
+    def since(self, last_id: int) -> list[Event] | None:
+        # None = klienten ligger efter bufferten och behöver en ny ögonblicksbild
+        with self._cond:
+            oldest = self.events[0].id if self.events else self.last_id + 1
+            if last_id > self.last_id or last_id < oldest - 1:
+                return None
+            return [e for e in self.events if e.id > last_id]
+
+    def wait(self, last_id: int, timeout: float = 15.0) -> list[Event] | None:
+        with self._cond:
+            self._cond.wait_for(lambda: self.last_id > last_id, timeout=timeout)
+        return self.since(last_id)
+
+
+class StatePublisher:
+
+    def __init__(self, engine, buffer: EventBuffer):
+        self.engine = engine
+        self.buffer = buffer
+        self.running = False
+        # Senast publicerade tillstånd — nya klienter får det utan att brokern anropas
+        self.status: dict = {}
+        self.positions: dict[str, dict] = {}
+        self.trades: deque[dict] = deque(maxlen=RECENT_TRADES)
+        self._trade_cursor = 0
+        self._lock = threading.Lock()
+
+    def publish_cycle(self):
+        # Körs en gång per motorcykel; alla klienter delar samma deltan
+        with self._lock:
+            for type_, data in self._collect():
+                self.buffer.publish(type_, data)
+
+    def _collect(self) -> list[tuple[str, object]]:
+        engine = self.engine
+        positions = engine.broker.get_positions()
+        self.status = status_payload(engine, self.running, positions)
+
+        current = {symbol: position_payload(pos) for symbol, pos in positions.items()}
+        changed = [p for symbol, p in current.items() if self.positions.get(symbol) != p]
+        removed = [symbol for symbol in self.positions if symbol not in current]
+        self.positions = current
+
+        ledger = engine.portfolio.ledger
+        new_trades = trade_payloads(ledger, ledger.slice(self._trade_cursor, len(ledger)))
+        self._trade_cursor = len(ledger)
+        self.trades.extend(new_trades)
+
+        events = []
+        if new_trades:
+            events.append(("trades", new_trades))
+        if changed or removed:
+            events.append(("positions", {"changed": changed, "removed": removed}))
+        events.append(("status", self.status))
+        return events
+
+    def set_running(self, running: bool):
+        with self._lock:
+            self.running = running
+            if self.status:
+                self.status = {**self.status, "bot_running": running}
+                self.buffer.publish("status", self.status)
+
+    def snapshot(self) -> Event:
+        with self._lock:
+            data = {
+                "status": self.status,
+                "positions": list(self.positions.values()),
+                "trades": list(reversed(self.trades)),
+            }
+            return Event(self.buffer.last_id, "snapshot", data)
@@ -0,0 +1,349 @@
+import hashlib
+import itertools
+import json
+import logging
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from src.brokers.matching import SimulationConfig
+from src.core.backtest import BacktestCancelled, run_backtest
+from src.dashboard.store import StateStore
+from src.utils.registry import STRATEGIES
+
+logger = logging.getLogger("trading-bot")
+
+TERMINAL = ("done", "failed", "cancelled")
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+@dataclass
+class BacktestRequest:
+    strategy: str
+    symbols: list[str]
+    start: datetime
+    end: datetime
+    params: dict = field(default_factory=dict)
+    initial_balance: float = 100000.0
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BacktestRequest":
+        strategy = data.get("strategy")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Okänd strategi: {strategy}. Välj: {', '.join(STRATEGIES.names())}")
+        symbols = data.get("symbols")
+        if not symbols or not isinstance(symbols, list) or not all(isinstance(s, str) for s in symbols):
+            raise ValueError("symbols måste vara en icke-tom lista")
+        params = data.get("params") or {}
+        if not isinstance(params, dict):
+            raise ValueError("params måste vara ett objekt")
+        try:
+            start = datetime.fromisoformat(data["start"])
+            end = datetime.fromisoformat(data["end"])
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError("start och end måste vara ISO-datum") from e
+        if end <= start:
+            raise ValueError("end måste vara efter start")
+        request = cls(strategy, sorted(set(symbols)), start, end, params,
+                      float(data.get("initial_balance", 100000.0)))
+        request.create_strategy()  # Felaktiga parametrar avvisas redan vid inskickning
+        return request
+
+    def create_strategy(self):
+        try:
+            return STRATEGIES.get(self.strategy)(**self.params)
+        except TypeError as e:
+            raise ValueError(f"Ogiltiga parametrar för {self.strategy}: {e}") from e
+
+    def to_dict(self) -> dict:
+        return {
+            "strategy": self.strategy,
+            "symbols": self.symbols,
+            "start": self.start.isoformat(),
+            "end": self.end.isoformat(),
+            "params": self.params,
+            "initial_balance": self.initial_balance,
+        }
+
+    def key(self, data_config: dict, simulation_config: dict | None = None) -> str:
+        # Identiska indata (inklusive datakälla och simulering) ger samma nyckel och därmed samma cachade resultat
+        payload = json.dumps([self.to_dict(), data_config, simulation_config or {}], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+@dataclass
+class Job:
+    id: str
+    key: str
+    request: BacktestRequest
+    status: str = "queued"
+    progress: float = 0.0
+    result: dict | None = None
+    error: str | None = None
+    cached: bool = False
+    submitted: datetime = field(default_factory=datetime.now)
+    future: Future | None = None
+
+    def to_dict(self, include_result: bool = True) -> dict:
+        data = {
+            "id": self.id,
+            "status": self.status,
+            "progress": round(self.progress, 3),
+            "cached": self.cached,
+            "submitted": self.submitted.isoformat(timespec="seconds"),
+            "request": self.request.to_dict(),
+            "error": self.error,
+        }
+        if include_result:
+            data["result"] = self.result
+        elif self.result:
+            # Listvyn får nyckeltalen utan equity-kurvan
+            data["summary"] = {k: v for k, v in self.result.items() if k != "equity"}
+        return data
+
+
+def _run_job(job_id: str, request: BacktestRequest, data_config: dict, risk_config: dict, simulation_config: dict,
+             shared) -> dict:
+    # Körs i en arbetsprocess; framsteg och avbrott går via managerns delade dict
+    return run_backtest(
+        request.create_strategy(), request.symbols, request.start, request.end,
+        data_config=data_config, initial_balance=request.initial_balance, risk_config=risk_config,
+        simulation=SimulationConfig.from_config(simulation_config),
+        progress=lambda fraction: shared.__setitem__(job_id, fraction),
+        cancelled=lambda: shared.get(f"cancel:{job_id}", False),
+    )
+
+
+class BacktestJobs:
+
+    def __init__(self, data_config: dict | None = None, risk_config: dict | None = None, max_workers: int = 2,
+                 max_queue: int = 8, cache_size: int = 32, max_jobs: int = 100,
+                 simulation_config: dict | None = None):
+        # Tunga forskningskörningar i egna processer — blockerar aldrig requests eller live-motorn
+        self.data_config = data_config or {}
+        self.risk_config = risk_config or {}
+        self.simulation_config = simulation_config or {}
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.cache_size = cache_size
+        self.max_jobs = max_jobs
+        self.jobs: OrderedDict[str, Job] = OrderedDict()
+        self.results: OrderedDict[str, dict] = OrderedDict()
+        self._ids = itertools.count(1)
+        # Återinträdande: ett jobb som redan är klart kör sin callback direkt inne i submit
+        self._lock = threading.RLock()
+        self._pool: ProcessPoolExecutor | None = None
+        self._manager = None
+        self._shared = None
+
+    @classmethod
+    def from_config(cls, config: dict) -> "BacktestJobs":
+        backtest = config.get("backtest", {})
+        return cls(
+            data_config=config.get("data", {}),
+            risk_config=config.get("risk", {}),
+            max_workers=backtest.get("max_workers", 2),
+            max_queue=backtest.get("max_queue", 8),
+            cache_size=backtest.get("cache_size", 32),
+            simulation_config=config.get("paper_trading", {}).get("simulation", {}),
+        )
+
+    def submit(self, request: BacktestRequest) -> Job:
+        key = request.key(self.data_config, self.simulation_config)
+        with self._lock:
+            # Samma indata som ett jobb som redan körs eller ligger i kö → samma jobb
+            for job in self.jobs.values():
+                if job.key == key and job.status in ("queued", "running"):
+                    return job
+            job = Job(f"bt-{next(self._ids)}", key, request)
+            result = self.results.get(key)
+            if result is not None:
+                self.results.move_to_end(key)
+                job.status, job.progress, job.result, job.cached = "done", 1.0, result, True
+            else:
+                if self.pending() >= self.max_workers + self.max_queue:
+                    raise JobQueueFull(f"Backtest-kön är full ({self.max_queue} väntande jobb)")
+                self._ensure_pool()
+                job.future = self._pool.submit(_run_job, job.id, request, self.data_config, self.risk_config,
+                                               self.simulation_config, self._shared)
+                job.future.add_done_callback(lambda future, job=job: self._finish(job, future))
+            self.jobs[job.id] = job
+            self._prune()
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            job = self.jobs.get(job_id)
+        if job is not None:
+            self._refresh(job)
+        return job
+
+    def list(self) -> list[Job]:
+        with self._lock:
+            jobs = list(self.jobs.values())
+        for job in jobs:
+            self._refresh(job)
+        return list(reversed(jobs))
+
+    def cancel(self, job_id: str) -> Job | None:
+        job = self.get(job_id)
+        if job is None or job.status in TERMINAL:
+            return job
+        # Köade jobb stryks direkt; ett jobb som redan körs avbryts vid nästa framstegskontroll
+        if job.future.cancel():
+            job.status = "cancelled"
+        else:
+            self._shared[f"cancel:{job.id}"] = True
+        return job
+
+    def pending(self) -> int:
+        return sum(1 for job in self.jobs.values() if job.status in ("queued", "running"))
+
+    def shutdown(self):
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        if self._manager:
+            self._manager.shutdown()
+            self._manager = self._shared = None
+
+    def _ensure_pool(self):
+        if self._pool is None:
+            # Poolen och managern startas först vid första jobbet — dashboarden startar lika snabbt som förut
+            # spawn, inte fork: processen kör motorn, StopMonitor och loggtråden, och en fork kopierar
+            # deras lås i godtyckligt tillstånd till barnen
+            context = multiprocessing.get_context("spawn")
+            self._manager = context.Manager()
+            self._shared = self._manager.dict()
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+
+    def _refresh(self, job: Job):
+        if job.status == "queued" and job.future and job.future.running():
+            job.status = "running"
+        if job.status == "running" and self._shared is not None:
+            job.progress = self._shared.get(job.id, job.progress)
+
+    def _finish(self, job: Job, future: Future):
+        with self._lock:
+            if future.cancelled():
+                job.status = "cancelled"
+            elif isinstance(future.exception(), BacktestCancelled):
+                job.status = "cancelled"
+            elif future.exception() is not None:
+                job.status, job.error = "failed", str(future.exception())
+                logger.error(f"Backtest {job.id} misslyckades: {job.error}")
+            else:
+                job.status, job.progress, job.result = "done", 1.0, future.result()
+                self.results[job.key] = job.result
+                if len(self.results) > self.cache_size:
+                    self.results.popitem(last=False)
+            if self._shared is not None:
+                self._shared.pop(job.id, None)
+                self._shared.pop(f"cancel:{job.id}", None)
+
+    def _prune(self):
+        # Äldsta avslutade jobb glöms först; resultaten ligger kvar i cachen
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in TERMINAL]
+        for job_id in finished[:max(0, len(self.jobs) - self.max_jobs)]:
+            del self.jobs[job_id]
+
+
+def _store_id(job_id: str) -> int | None:
+    number = job_id.removeprefix("bt-")
+    return int(number) if number.isdigit() else None
+
+
+def _job_from_row(row: dict) -> Job:
+    return Job(f"bt-{row['id']}", row["key"], BacktestRequest.from_dict(row["request"]), status=row["status"],
+               progress=row["progress"], result=row["result"], error=row["error"], cached=row["cached"],
+               submitted=datetime.fromisoformat(row["submitted"]))
+
+
+class StoreBacktestJobs:
+
+    def __init__(self, store: StateStore, data_config: dict | None = None, simulation_config: dict | None = None,
+                 max_workers: int = 2, max_queue: int = 8, max_jobs: int = 100):
+        # Dashboardens sida när boten kör i en egen process: jobben köas i den delade lagringen och körs
+        # av BacktestRunner i bot-processen, så id, kö och resultat är desamma i alla gunicorn-workers
+        self.store = store
+        self.data_config = data_config or {}
+        self.simulation_config = simulation_config or {}
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.max_jobs = max_jobs
+
+    @classmethod
+    def from_config(cls, store: StateStore, config: dict) -> "StoreBacktestJobs":
+        backtest = config.get("backtest", {})
+        return cls(
+            store,
+            data_config=config.get("data", {}),
+            simulation_config=config.get("paper_trading", {}).get("simulation", {}),
+            max_workers=backtest.get("max_workers", 2),
+            max_queue=backtest.get("max_queue", 8),
+        )
+
+    def submit(self, request: BacktestRequest) -> Job:
+        job_id = self.store.submit_backtest(request.key(self.data_config, self.simulation_config), request.to_dict(),
+                                            self.max_workers + self.max_queue, self.max_jobs)
+        if job_id is None:
+            raise JobQueueFull(f"Backtest-kön är full ({self.max_queue} väntande jobb)")
+        return _job_from_row(self.store.get_backtest(job_id))
+
+    def get(self, job_id: str) -> Job | None:
+        store_id = _store_id(job_id)
+        row = self.store.get_backtest(store_id) if store_id is not None else None
+        return _job_from_row(row) if row else None
+
+    def list(self) -> list[Job]:
+        return [_job_from_row(row) for row in self.store.list_backtests(self.max_jobs)]
+
+    def cancel(self, job_id: str) -> Job | None:
+        store_id = _store_id(job_id)
+        row = self.store.cancel_backtest(store_id) if store_id is not None else None
+        return _job_from_row(row) if row else None
+
+
+class BacktestRunner:
+
+    def __init__(self, store: StateStore, jobs: BacktestJobs):
+        # Bot-processens sida: hämtar köade jobb ur lagringen, kör dem i den lokala poolen och
+        # skriver tillbaka status, framsteg och resultat
+        self.store = store
+        self.jobs = jobs
+        self.active: dict[int, str] = {}  # Lagringens id → lokalt jobb-id
+        store.requeue_backtests()
+
+    def tick(self):
+        cancelled = self.store.backtest_cancellations(list(self.active))
+        for store_id, local_id in list(self.active.items()):
+            if store_id in cancelled:
+                self.jobs.cancel(local_id)
+            job = self.jobs.get(local_id)
+            self._write(store_id, job)
+            if job.status in TERMINAL:
+                del self.active[store_id]
+        # Kön ligger i lagringen; bara så många jobb som poolen kan starta direkt hämtas
+        for row in self.store.claim_backtests(self.jobs.max_workers - self.jobs.pending()):
+            try:
+                job = self.jobs.submit(BacktestRequest.from_dict(row["request"]))
+            except (ValueError, JobQueueFull) as e:
+                self.store.update_backtest(row["id"], "failed", 0.0, error=str(e))
+                continue
+            self.active[row["id"]] = job.id
+            self._write(row["id"], job)
+
+    def _write(self, store_id: int, job: Job):
+        # Ett hämtat jobb är "running" i lagringen även de millisekunder det ligger i poolens kö;
+        # "queued" där betyder att det väntar på att hämtas
+        status = "running" if job.status == "queued" else job.status
+        self.store.update_backtest(store_id, status, job.progress, job.result, job.error)
+
+    def shutdown(self):
+        self.jobs.shutdown()
@@ -0,0 +1,172 @@
+import sys
+import os
+import logging
+import time
+from collections.abc import Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import yaml
+from src.brokers.matching import SimulationConfig
+from src.brokers.paper_broker import PaperBroker
+from src.brokers.retention import RetentionPolicy
+from src.core.engine import TradingEngine
+from src.core.ledger import TradeLedger
+from src.core.portfolio import Portfolio
+from src.core.portfolio_risk import PortfolioRiskModel
+from src.core.risk import RiskManager
+from src.core.session import SessionRecorder
+from src.dashboard.jobs import BacktestJobs, BacktestRunner
+from src.dashboard.store import StateStore, StorePublisher
+from src.data.source import create_data_source
+from src.utils.logger import setup_logger_from_config
+from src.utils.registry import STRATEGIES
+from src.utils.tracing import configure_tracing
+
+logger = logging.getLogger("trading-bot")
+
+
+def load_config(path: str = "config/settings.yaml") -> dict:
+    with open(path) as f:
+        return yaml.safe_load(f)
+
+
+def create_engine(config: dict | None = None) -> TradingEngine:
+    config = config or load_config()
+    setup_logger_from_config(config.get("logging", {}))
+    configure_tracing(config.get("tracing", {}))
+
+    symbols = []
+    for market_symbols in config.get("symbols", {}).values():
+        symbols.extend(market_symbols)
+
+    paper_config = config.get("paper_trading", {})
+    broker = PaperBroker(initial_balance=paper_config.get("initial_balance", 100000),
+                         simulation=SimulationConfig.from_config(paper_config.get("simulation", {})),
+                         retention=RetentionPolicy.from_config(paper_config.get("retention", {})))
+
+    strategy_name = config.get("strategy", "rsi")
+    strategy = STRATEGIES.get(strategy_name if strategy_name in STRATEGIES else "rsi")()
+
+    risk_config = config.get("risk", {})
+    risk_manager = RiskManager(
+        max_position_pct=risk_config.get("max_position_pct", 0.10),
+        stop_loss_pct=risk_config.get("stop_loss_pct", 0.05),
+        daily_loss_limit_pct=risk_config.get("daily_loss_limit_pct", 0.03),
+        max_open_positions=risk_config.get("max_open_positions", 10),
+        portfolio_risk=PortfolioRiskModel.from_config(symbols, risk_config.get("correlation", {})),
+    )
+
+    engine = TradingEngine(
+        broker=broker,
+        strategy=strategy,
+        risk_manager=risk_manager,
+        data_fetcher=create_data_source(config.get("data", {})),
+        symbols=symbols,
+        portfolio=Portfolio(ledger=TradeLedger.from_config(config.get("ledger", {})),
+                            max_equity_points=config.get("ledger", {}).get("max_equity_points", 100_000)),
+    )
+
+    monitor_config = config.get("stop_monitor", {})
+    if monitor_config.get("enabled", False):
+        engine.attach_stop_monitor(
+            trailing_stop_pct=monitor_config.get("trailing_stop_pct", 0.0),
+            interval_seconds=monitor_config.get("interval_seconds", 5),
+        )
+
+    session_config = config.get("session", {})
+    if session_config.get("record", False):
+        SessionRecorder.from_config(session_config).attach(engine)
+    return engine
+
+
+class BotService:
+
+    def __init__(self, engine_factory: Callable[[], TradingEngine], store: StateStore,
+                 interval_seconds: float = 60, poll_seconds: float = 1.0, backtests: BacktestRunner | None = None):
+        # Boten i en egen process: tar emot start/stopp via lagringens kommandokö
+        # och publicerar sitt tillstånd dit efter varje cykel
+        self.engine_factory = engine_factory
+        self.store = store
+        self.interval_seconds = interval_seconds
+        self.poll_seconds = poll_seconds
+        # Dashboardens backtest-jobb körs här, så att alla workers ser samma kö och resultat
+        self.backtests = backtests
+        self.engine: TradingEngine | None = None
+        self.publisher: StorePublisher | None = None
+        self.running = False
+        self._next_cycle = 0.0
+
+    def start(self):
+        if self.running:
+            return
+        self.store.reset()
+        self.engine = self.engine_factory()
+        self.publisher = StorePublisher(self.engine, self.store)
+        self.engine.cycle_listeners.append(self.publisher.publish_cycle)
+        self.running = True
+        self.publisher.running = True
+        self.publisher.publish_cycle()
+        if self.engine.stop_monitor:
+            self.engine.stop_monitor.start()
+        self._next_cycle = time.monotonic()
+        logger.info("Bot startad via kontrollkanalen")
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        self.engine.stop()
+        self.publisher.set_running(False)
+        logger.info("Bot stoppad via kontrollkanalen")
+
+    def handle_commands(self):
+        for command in self.store.take_commands():
+            if command == "start":
+                self.start()
+            elif command == "stop":
+                self.stop()
+            else:
+                logger.warning(f"Okänt kommando ignoreras: {command}")
+
+    def tick(self):
+        self.handle_commands()
+        if self.backtests:
+            try:
+                self.backtests.tick()
+            except Exception as e:
+                logger.error(f"Backtest-kön kunde inte hanteras: {e}")
+        if self.running and time.monotonic() >= self._next_cycle:
+            self._next_cycle = time.monotonic() + self.interval_seconds
+            try:
+                self.engine.run_once()
+            except Exception as e:
+                logger.error(f"Bot-cykel misslyckades: {e}")
+
+    def run(self):
+        try:
+            while True:
+                self.tick()
+                time.sleep(self.poll_seconds)
+        except KeyboardInterrupt:
+            self.stop()
+        finally:
+            if self.backtests:
+                self.backtests.shutdown()
+
+
+def main():
+    os.chdir(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    config = load_config()
+    dashboard_config = config.get("dashboard", {})
+    store = StateStore(dashboard_config.get("store", "data/dashboard.db"))
+    service = BotService(lambda: create_engine(config), store,
+                         interval_seconds=dashboard_config.get("interval_seconds", 60),
+                         backtests=BacktestRunner(store, BacktestJobs.from_config(config)))
+    if dashboard_config.get("autostart", False):
+        service.start()
+    service.run()
+
+
+if __name__ == "__main__":
+    main()
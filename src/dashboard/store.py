@@ -0,0 +1,302 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+from src.dashboard.events import Event, StatePublisher
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS trades (
+    id INTEGER PRIMARY KEY,
+    symbol TEXT NOT NULL,
+    side TEXT NOT NULL,
+    quantity REAL NOT NULL,
+    price REAL NOT NULL,
+    pnl REAL NOT NULL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS trades_symbol ON trades (symbol, id);
+CREATE INDEX IF NOT EXISTS trades_side ON trades (side, id);
+CREATE INDEX IF NOT EXISTS trades_timestamp ON trades (timestamp);
+CREATE TABLE IF NOT EXISTS equity (id INTEGER PRIMARY KEY, timestamp TEXT NOT NULL, value REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS equity_timestamp ON equity (timestamp);
+CREATE TABLE IF NOT EXISTS events (id INTEGER PRIMARY KEY, type TEXT NOT NULL, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS commands (id INTEGER PRIMARY KEY AUTOINCREMENT, command TEXT NOT NULL, created TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS backtests (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL,
+    request TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    cached INTEGER NOT NULL DEFAULT 0,
+    cancel INTEGER NOT NULL DEFAULT 0,
+    submitted TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS backtests_key ON backtests (key, status);
+"""
+
+BACKTEST_COLUMNS = ("id", "key", "request", "status", "progress", "result", "error", "cached", "submitted")
+ACTIVE_BACKTESTS = "('queued', 'running')"
+
+
+def _backtest_row(row: tuple) -> dict:
+    data = dict(zip(BACKTEST_COLUMNS, row))
+    data["request"] = json.loads(data["request"])
+    data["result"] = json.loads(data["result"]) if data["result"] else None
+    data["cached"] = bool(data["cached"])
+    return data
+
+
+class StateStore:
+
+    def __init__(self, path: str, max_events: int = 1000):
+        # Delad lagring mellan bot-processen (skriver) och dashboardens workers (läser)
+        self.path = path
+        self.max_events = max_events
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db.executescript(SCHEMA)
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        # En anslutning per tråd; WAL låter läsare arbeta parallellt med skrivaren
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        db = self.db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    @contextmanager
+    def _read(self):
+        # Ögonblicksbild: alla läsningar i blocket ser samma commit
+        db = self.db
+        db.execute("BEGIN")
+        try:
+            yield db
+        finally:
+            db.execute("COMMIT")
+
+    # --- Skrivsidan (bot-processen) ---
+
+    def write_cycle(self, state: dict, trades: list[dict], equity: list[tuple[str, float]],
+                    events: list[tuple[str, object]]):
+        with self._transaction() as db:
+            db.executemany("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)",
+                           [(key, json.dumps(value)) for key, value in state.items()])
+            db.executemany(
+                "INSERT INTO trades (symbol, side, quantity, price, pnl, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
+                [(t["symbol"], t["side"], t["quantity"], t["price"], t["pnl"], t["timestamp"]) for t in trades])
+            db.executemany("INSERT INTO equity (timestamp, value) VALUES (?, ?)", equity)
+            db.executemany("INSERT INTO events (type, data) VALUES (?, ?)",
+                           [(type_, json.dumps(data, separators=(",", ":"))) for type_, data in events])
+            db.execute("DELETE FROM events WHERE id <= (SELECT MAX(id) FROM events) - ?", (self.max_events,))
+
+    def reset(self):
+        # Ny bot-session: gammal historik och väntande kommandon gäller inte längre
+        with self._transaction() as db:
+            for table in ("state", "trades", "equity", "commands"):
+                db.execute(f"DELETE FROM {table}")
+
+    def take_commands(self) -> list[str]:
+        with self._transaction() as db:
+            rows = db.execute("SELECT id, command FROM commands ORDER BY id").fetchall()
+            if rows:
+                db.execute("DELETE FROM commands WHERE id <= ?", (rows[-1][0],))
+        return [command for _, command in rows]
+
+    # --- Backtest-jobb: dashboardens workers köar, bot-processen kör (se jobs.BacktestRunner) ---
+
+    def claim_backtests(self, limit: int) -> list[dict]:
+        if limit <= 0:
+            return []
+        with self._transaction() as db:
+            rows = db.execute(f"SELECT {', '.join(BACKTEST_COLUMNS)} FROM backtests WHERE status = 'queued' "
+                              "ORDER BY id LIMIT ?", (limit,)).fetchall()
+            db.executemany("UPDATE backtests SET status = 'running' WHERE id = ?", [(row[0],) for row in rows])
+        return [_backtest_row(row) for row in rows]
+
+    def update_backtest(self, job_id: int, status: str, progress: float, result: dict | None = None,
+                        error: str | None = None):
+        with self._transaction() as db:
+            db.execute("UPDATE backtests SET status = ?, progress = ?, result = ?, error = ? WHERE id = ?",
+                       (status, progress, json.dumps(result) if result is not None else None, error, job_id))
+
+    def backtest_cancellations(self, job_ids: list[int]) -> set[int]:
+        if not job_ids:
+            return set()
+        rows = self.db.execute(f"SELECT id FROM backtests WHERE cancel = 1 AND id IN ({', '.join('?' * len(job_ids))})",
+                               job_ids).fetchall()
+        return {row[0] for row in rows}
+
+    def requeue_backtests(self):
+        # Jobb som körde när en tidigare bot-process dog börjar om från början
+        with self._transaction() as db:
+            db.execute("UPDATE backtests SET status = 'queued', progress = 0 WHERE status = 'running'")
+
+    # --- Läsesidan (dashboarden) ---
+
+    def submit_backtest(self, key: str, request: dict, max_pending: int, max_jobs: int = 100) -> int | None:
+        # Atomiskt över alla workers: samma indata som ett aktivt jobb ger samma jobb, ett tidigare
+        # resultat återanvänds, annars köas jobbet om kön har plats. None betyder att kön är full
+        now = datetime.now().isoformat(timespec="seconds")
+        with self._transaction() as db:
+            row = db.execute(f"SELECT id FROM backtests WHERE key = ? AND status IN {ACTIVE_BACKTESTS} "
+                             "ORDER BY id DESC LIMIT 1", (key,)).fetchone()
+            if row:
+                return row[0]
+            done = db.execute("SELECT result FROM backtests WHERE key = ? AND status = 'done' ORDER BY id DESC LIMIT 1",
+                              (key,)).fetchone()
+            if done:
+                job_id = db.execute(
+                    "INSERT INTO backtests (key, request, status, progress, result, cached, submitted) "
+                    "VALUES (?, ?, 'done', 1, ?, 1, ?)", (key, json.dumps(request), done[0], now)).lastrowid
+            else:
+                pending = db.execute(f"SELECT COUNT(*) FROM backtests WHERE status IN {ACTIVE_BACKTESTS}").fetchone()[0]
+                if pending >= max_pending:
+                    return None
+                job_id = db.execute(
+                    "INSERT INTO backtests (key, request, status, submitted) VALUES (?, ?, 'queued', ?)",
+                    (key, json.dumps(request), now)).lastrowid
+            # Äldsta avslutade jobb glöms först
+            db.execute(f"DELETE FROM backtests WHERE status NOT IN {ACTIVE_BACKTESTS} AND id NOT IN "
+                       "(SELECT id FROM backtests ORDER BY id DESC LIMIT ?)", (max_jobs,))
+        return job_id
+
+    def cancel_backtest(self, job_id: int) -> dict | None:
+        # Köade jobb stryks direkt; ett jobb som körs avbryts av bot-processen vid nästa framstegskontroll
+        with self._transaction() as db:
+            db.execute("UPDATE backtests SET status = 'cancelled' WHERE id = ? AND status = 'queued'", (job_id,))
+            db.execute("UPDATE backtests SET cancel = 1 WHERE id = ? AND status = 'running'", (job_id,))
+        return self.get_backtest(job_id)
+
+    def get_backtest(self, job_id: int) -> dict | None:
+        row = self.db.execute(f"SELECT {', '.join(BACKTEST_COLUMNS)} FROM backtests WHERE id = ?",
+                              (job_id,)).fetchone()
+        return _backtest_row(row) if row else None
+
+    def list_backtests(self, limit: int = 100) -> list[dict]:
+        rows = self.db.execute(f"SELECT {', '.join(BACKTEST_COLUMNS)} FROM backtests ORDER BY id DESC LIMIT ?",
+                               (limit,)).fetchall()
+        return [_backtest_row(row) for row in rows]
+
+    def send_command(self, command: str):
+        with self._transaction() as db:
+            db.execute("INSERT INTO commands (command, created) VALUES (?, ?)",
+                       (command, datetime.now().isoformat(timespec="seconds")))
+
+    def get(self, key: str, default=None):
+        row = self.db.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def recent_trades(self, limit: int = 50) -> list[dict]:
+        rows = self.db.execute(
+            "SELECT symbol, side, quantity, price, pnl, timestamp FROM trades ORDER BY id DESC LIMIT ?",
+            (limit,)).fetchall()
+        return [dict(zip(("symbol", "side", "quantity", "price", "pnl", "timestamp"), row)) for row in rows]
+
+    def trade_page(self, symbol: str | None = None, side: str | None = None, start: str | None = None,
+                   end: str | None = None, before: int | None = None, limit: int = 50) -> list[dict]:
+        # Keyset-paginering på id: indexen gör varje sida lika billig oavsett djup
+        query, params = "SELECT id, symbol, side, quantity, price, pnl, timestamp FROM trades WHERE 1 = 1", []
+        for clause, value in (("id < ?", before), ("symbol = ?", symbol), ("side = ?", side),
+                              ("timestamp >= ?", start and start.replace("T", " ")),
+                              ("timestamp <= ?", end and end.replace("T", " "))):
+            if value is not None:
+                query, params = f"{query} AND {clause}", params + [value]
+        rows = self.db.execute(query + " ORDER BY id DESC LIMIT ?", params + [limit]).fetchall()
+        return [dict(zip(("id", "symbol", "side", "quantity", "price", "pnl", "timestamp"), row)) for row in rows]
+
+    def equity(self, since: int = 0, start: str | None = None,
+               end: str | None = None) -> tuple[int, np.ndarray, np.ndarray]:
+        with self._read() as db:
+            cursor = db.execute("SELECT COALESCE(MAX(id), 0) FROM equity").fetchone()[0]
+            query, params = "SELECT timestamp, value FROM equity WHERE id > ?", [since]
+            if start:
+                query, params = query + " AND timestamp >= ?", params + [start.replace("T", " ")]
+            if end:
+                query, params = query + " AND timestamp <= ?", params + [end.replace("T", " ")]
+            rows = db.execute(query + " ORDER BY id", params).fetchall()
+        times = np.array([r[0] for r in rows], dtype="datetime64[us]")
+        values = np.array([r[1] for r in rows], dtype=np.float64)
+        return cursor, times, values
+
+    def last_event_id(self) -> int:
+        return self.db.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+
+    def events_since(self, last_id: int) -> list[Event] | None:
+        with self._read() as db:
+            oldest, newest = db.execute("SELECT MIN(id), COALESCE(MAX(id), 0) FROM events").fetchone()
+            if last_id > newest or (oldest is not None and last_id < oldest - 1):
+                return None
+            rows = db.execute("SELECT id, type, data FROM events WHERE id > ? ORDER BY id", (last_id,)).fetchall()
+        return [Event(id_, type_, json.loads(data)) for id_, type_, data in rows]
+
+    def snapshot(self) -> Event:
+        with self._read() as db:
+            last_id = db.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+            state = dict(db.execute("SELECT key, value FROM state WHERE key IN ('status', 'positions')").fetchall())
+            trades = self.recent_trades()
+        data = {
+            "status": json.loads(state.get("status", "{}")),
+            "positions": json.loads(state.get("positions", "[]")),
+            "trades": trades,
+        }
+        return Event(last_id, "snapshot", data)
+
+
+class StorePublisher(StatePublisher):
+
+    def __init__(self, engine, store: StateStore, generation: str | None = None):
+        super().__init__(engine, buffer=None)
+        self.store = store
+        # Skiljer en omstartad bot från den förra i dashboardens ETags
+        self.generation = generation or datetime.now().strftime("%Y%m%d%H%M%S")
+        self._equity_cursor = 0
+
+    def publish_cycle(self):
+        with self._lock:
+            events = self._collect()
+            equity = self.engine.portfolio.equity
+            times, values = equity.window(since=self._equity_cursor)
+            self._equity_cursor += len(times)
+            self.store.write_cycle(
+                self._state(),
+                trades=next((data for type_, data in events if type_ == "trades"), []),
+                equity=[(t.replace("T", " "), v)
+                        for t, v in zip(np.datetime_as_string(times, unit="s").tolist(), values.tolist())],
+                events=events,
+            )
+
+    def set_running(self, running: bool):
+        with self._lock:
+            self.running = running
+            self.status = {**self.status, "bot_running": running}
+            self.store.write_cycle(self._state(), trades=[], equity=[], events=[("status", self.status)])
+
+    def _state(self) -> dict:
+        return {
+            "status": self.status,
+            "positions": list(self.positions.values()),
+            "version": f"{self.generation}.{self.engine.state_version}.{int(self.running)}",
+        }
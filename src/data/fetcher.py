@@ -1,34 +1,38 @@
 import logging
+from datetime import datetime, timedelta
 
 import yfinance as yf
 import pandas as pd
 
+from src.data.source import MarketDataSource, lookback_days
+from src.utils.tracing import span
+
 logger = logging.getLogger("trading-bot")
 
 
-class DataFetcher:
+class DataFetcher(MarketDataSource):
 
     def get_historical(self, symbol: str, period: str = "3mo", interval: str = "1d") -> pd.DataFrame:
         ticker = yf.Ticker(symbol)
-        df = ticker.history(period=period, interval=interval)
+        with span("yfinance.history", symbol=symbol, period=period, interval=interval):
+            df = ticker.history(period=period, interval=interval)
         if df.empty:
             raise ValueError(f"Ingen data hittades för {symbol}")
         return df
 
+    def get_recent(self, symbol: str, bars: int, interval: str = "1d") -> pd.DataFrame:
+        # yfinance tar bara fasta perioder ("1mo", "3mo" ...) — ett startdatum ger exakt fönster
+        start = datetime.now() - timedelta(days=lookback_days(bars, interval))
+        with span("yfinance.history", symbol=symbol, bars=bars, interval=interval):
+            df = yf.Ticker(symbol).history(start=start.strftime("%Y-%m-%d"), interval=interval)
+        if df.empty:
+            raise ValueError(f"Ingen data hittades för {symbol}")
+        return df.iloc[-bars:]
+
     def get_current_price(self, symbol: str) -> float:
         ticker = yf.Ticker(symbol)
-        data = ticker.history(period="1d")
+        with span("yfinance.price", symbol=symbol):
+            data = ticker.history(period="1d")
         if data.empty:
             raise ValueError(f"Kunde inte hämta pris för {symbol}")
         return float(data["Close"].iloc[-1])
-
-    def get_prices_bulk(self, symbols: list[str]) -> dict[str, float]:
-        prices = {}
-        for symbol in symbols:
-            try:
-                prices[symbol] = self.get_current_price(symbol)
-            except ValueError:
-                logger.warning(f"Ingen data för {symbol}")
-            except Exception as e:
-                logger.error(f"Fel vid hämtning av {symbol}: {e}")
-        return prices
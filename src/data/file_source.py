@@ -0,0 +1,173 @@
+import logging
+import os
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from src.data.source import MarketDataSource, period_to_offset
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet är valfritt; CSV fungerar utan pyarrow
+    pq = None
+
+logger = logging.getLogger("trading-bot")
+
+OHLCV = ["Open", "High", "Low", "Close", "Volume"]
+_TIME_COLUMNS = ("Date", "Datetime", "date", "datetime", "timestamp", "time")
+
+
+def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+    for name in _TIME_COLUMNS:
+        if name in df.columns:
+            df = df.set_index(name)
+            break
+    df = df.rename(columns={c: c.capitalize() for c in df.columns if c.capitalize() in OHLCV})
+    if not isinstance(df.index, pd.DatetimeIndex):
+        df.index = pd.to_datetime(df.index)
+    df.index.name = "Date"
+    df = df[[c for c in OHLCV if c in df.columns]]
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index()
+    return df
+
+
+class FileDataSource(MarketDataSource):
+
+    def __init__(self, path: str, interval: str = "1d", cache_size: int = 256,
+                 cache_dir: str | None = None, as_of: datetime | None = None):
+        # path är antingen en katalog med en fil per symbol (AAPL.parquet / AAPL.csv)
+        # eller en bulkfil med en symbol-kolumn
+        self.path = path
+        self.interval = interval
+        self.cache_size = cache_size
+        self.cache_dir = cache_dir
+        self.as_of = pd.Timestamp(as_of) if as_of is not None else None
+        self._frames: OrderedDict[str, pd.DataFrame] = OrderedDict()
+        self._bulk: dict[str, pd.DataFrame] | None = None
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config: dict) -> "FileDataSource":
+        return cls(
+            config["path"],
+            interval=config.get("interval", "1d"),
+            cache_size=config.get("cache_size", 256),
+            cache_dir=config.get("cache_dir"),
+        )
+
+    def set_time(self, as_of: datetime | None):
+        # Replay-markör: allt efter as_of är osynligt för get_historical/get_prices_bulk
+        self.as_of = pd.Timestamp(as_of) if as_of is not None else None
+
+    def symbols(self) -> list[str]:
+        if os.path.isdir(self.path):
+            return sorted({os.path.splitext(f)[0] for f in os.listdir(self.path)
+                           if f.endswith((".parquet", ".csv"))})
+        return sorted(self._load_bulk())
+
+    def frame(self, symbol: str) -> pd.DataFrame:
+        df = self._frames.get(symbol)
+        if df is not None:
+            self._frames.move_to_end(symbol)
+            return df
+        df = self._load(symbol)
+        self._frames[symbol] = df
+        if len(self._frames) > self.cache_size:
+            self._frames.popitem(last=False)
+        return df
+
+    def get_historical(self, symbol: str, period: str = "3mo", interval: str = "1d") -> pd.DataFrame:
+        df, end = self._visible(symbol, interval)
+        start = 0
+        offset = period_to_offset(period)
+        if offset is not None:
+            start = int(df.index.searchsorted(df.index[end - 1] - offset, side="right"))
+        return df.iloc[start:end]
+
+    def get_recent(self, symbol: str, bars: int, interval: str = "1d") -> pd.DataFrame:
+        df, end = self._visible(symbol, interval)
+        return df.iloc[max(0, end - bars):end]
+
+    def get_current_price(self, symbol: str) -> float:
+        df = self.frame(symbol)
+        end = self._end(df)
+        if end == 0:
+            raise ValueError(f"Kunde inte hämta pris för {symbol}")
+        return float(df["Close"].to_numpy()[end - 1])
+
+    def _visible(self, symbol: str, interval: str) -> tuple[pd.DataFrame, int]:
+        if interval != self.interval:
+            raise ValueError(f"{symbol}: källan har {self.interval}-data, inte {interval}")
+        df = self.frame(symbol)
+        end = self._end(df)
+        if end == 0:
+            raise ValueError(f"Ingen data hittades för {symbol}")
+        return df, end
+
+    def _end(self, df: pd.DataFrame) -> int:
+        if self.as_of is None:
+            return len(df)
+        as_of = self.as_of
+        if df.index.tz is not None and as_of.tzinfo is None:
+            as_of = as_of.tz_localize(df.index.tz)
+        return int(df.index.searchsorted(as_of, side="right"))
+
+    def _load(self, symbol: str) -> pd.DataFrame:
+        if not os.path.isdir(self.path):
+            df = self._load_bulk_symbol(symbol)
+        else:
+            parquet = os.path.join(self.path, f"{symbol}.parquet")
+            csv = os.path.join(self.path, f"{symbol}.csv")
+            if os.path.exists(parquet):
+                df = self._read_parquet(parquet)
+            elif os.path.exists(csv):
+                df = self._read_csv(symbol, csv)
+            else:
+                raise ValueError(f"Ingen datafil för {symbol} i {self.path}")
+        if df.empty:
+            raise ValueError(f"Ingen data hittades för {symbol}")
+        return df
+
+    def _read_parquet(self, path: str, filters: list | None = None) -> pd.DataFrame:
+        if pq is None:
+            raise ImportError("pyarrow krävs för att läsa Parquet-filer")
+        # Minnesmappad läsning — sidorna läses in från OS-cachen vid behov
+        table = pq.read_table(path, memory_map=True, filters=filters)
+        return _normalize(table.to_pandas())
+
+    def _read_csv(self, symbol: str, path: str) -> pd.DataFrame:
+        cached = os.path.join(self.cache_dir, f"{symbol}.parquet") if self.cache_dir and pq else None
+        if cached and os.path.exists(cached) and os.path.getmtime(cached) >= os.path.getmtime(path):
+            return self._read_parquet(cached)
+        df = _normalize(pd.read_csv(path))
+        if cached:
+            # CSV tolkas bara en gång; nästa körning läser den binära kopian
+            df.to_parquet(cached)
+        return df
+
+    def _load_bulk_symbol(self, symbol: str) -> pd.DataFrame:
+        if self.path.endswith(".parquet"):
+            # Predikatet trycks ned till radgrupperna, så bara symbolens data läses
+            df = self._read_parquet(self.path, filters=[("symbol", "==", symbol)])
+            return df
+        frames = self._load_bulk()
+        if symbol not in frames:
+            raise ValueError(f"Ingen data för {symbol} i {self.path}")
+        return frames[symbol]
+
+    def _load_bulk(self) -> dict[str, pd.DataFrame]:
+        if self._bulk is None:
+            if self.path.endswith(".parquet"):
+                if pq is None:
+                    raise ImportError("pyarrow krävs för att läsa Parquet-filer")
+                column = pq.read_table(self.path, columns=["symbol"], memory_map=True).column("symbol")
+                self._bulk = {s: None for s in np.unique(column.to_numpy(zero_copy_only=False))}
+            else:
+                raw = pd.read_csv(self.path)
+                self._bulk = {symbol: _normalize(group.drop(columns="symbol"))
+                              for symbol, group in raw.groupby("symbol", sort=False)}
+        return self._bulk
@@ -0,0 +1,98 @@
+import logging
+import math
+import re
+from abc import ABC, abstractmethod
+
+import pandas as pd
+
+logger = logging.getLogger("trading-bot")
+
+_PERIOD_UNITS = {"d": "days", "wk": "weeks", "mo": "months", "y": "years"}
+_INTERVAL_UNITS = {"m": "min", "h": "h", "d": "D"}
+TRADING_MINUTES_PER_DAY = 390
+
+
+def period_to_offset(period: str) -> pd.DateOffset | None:
+    # yfinance-perioder ("5d", "3mo", "1y", "max") som kalenderoffset; None = all historik
+    if period in ("max", "", None):
+        return None
+    if period == "ytd":
+        raise ValueError("Perioden 'ytd' stöds inte av lokala datakällor")
+    match = re.fullmatch(r"(\d+)(d|wk|mo|y)", period)
+    if not match:
+        raise ValueError(f"Ogiltig period: {period}")
+    return pd.DateOffset(**{_PERIOD_UNITS[match.group(2)]: int(match.group(1))})
+
+
+def interval_to_timedelta(interval: str) -> pd.Timedelta:
+    if interval == "1wk":
+        return pd.Timedelta(weeks=1)
+    match = re.fullmatch(r"(\d+)(m|h|d)", interval)
+    if not match:
+        raise ValueError(f"Ogiltigt intervall: {interval}")
+    return pd.Timedelta(int(match.group(1)), unit=_INTERVAL_UNITS[match.group(2)])
+
+
+def lookback_days(bars: int, interval: str) -> int:
+    # Kalenderdagar som garanterat rymmer `bars` bars, med marginal för helger och helgdagar
+    step = interval_to_timedelta(interval)
+    if step >= pd.Timedelta(days=1):
+        trading_days = bars * step.days
+    else:
+        trading_days = math.ceil(bars * step / pd.Timedelta(minutes=TRADING_MINUTES_PER_DAY))
+    return math.ceil(trading_days * 1.5) + 4
+
+
+class MarketDataSource(ABC):
+
+    @abstractmethod
+    def get_historical(self, symbol: str, period: str = "3mo", interval: str = "1d") -> pd.DataFrame:
+        pass
+
+    def get_recent(self, symbol: str, bars: int, interval: str = "1d") -> pd.DataFrame:
+        # De senaste `bars` raderna — hämtar bara ett kalenderfönster som rymmer dem
+        df = self.get_historical(symbol, period=f"{lookback_days(bars, interval)}d", interval=interval)
+        return df.iloc[-bars:]
+
+    def get_timeframes(self, symbol: str, intervals: list[str], period: str = "3mo",
+                       bars: int | None = None) -> dict[str, pd.DataFrame]:
+        # Standard: en hämtning per tidsram. MultiTimeframeSource härleder dem från ett basintervall
+        if bars:
+            return {interval: self.get_recent(symbol, bars, interval) for interval in intervals}
+        return {interval: self.get_historical(symbol, period=period, interval=interval) for interval in intervals}
+
+    def get_current_price(self, symbol: str) -> float:
+        df = self.get_historical(symbol, period="5d")
+        return float(df["Close"].iloc[-1])
+
+    def get_prices_bulk(self, symbols: list[str]) -> dict[str, float]:
+        prices = {}
+        for symbol in symbols:
+            try:
+                prices[symbol] = self.get_current_price(symbol)
+            except ValueError:
+                logger.warning(f"Ingen data för {symbol}")
+            except Exception as e:
+                logger.error(f"Fel vid hämtning av {symbol}: {e}")
+        return prices
+
+
+def create_data_source(config: dict) -> MarketDataSource:
+    source = config.get("source", "yfinance")
+    if source == "yfinance":
+        from src.data.fetcher import DataFetcher
+        backend = DataFetcher()
+    elif source == "file":
+        from src.data.file_source import FileDataSource
+        backend = FileDataSource.from_config(config)
+    elif source == "synthetic":
+        from src.data.synthetic import SyntheticSource
+        backend = SyntheticSource.from_config(config.get("synthetic", {}))
+    else:
+        raise ValueError(f"Okänd datakälla: {source}. Välj: yfinance, file, synthetic")
+
+    timeframes = config.get("timeframes", {})
+    if timeframes.get("enabled", False):
+        from src.data.timeframes import MultiTimeframeSource
+        return MultiTimeframeSource.from_config(backend, timeframes)
+    return backend
@@ -0,0 +1,204 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from collections import deque
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+logger = logging.getLogger("trading-bot")
+
+
+@dataclass(slots=True)
+class Tick:
+    symbol: str
+    price: float
+    volume: float
+    timestamp: datetime
+
+
+@dataclass(slots=True)
+class Bar:
+    symbol: str
+    start: datetime
+    end: datetime
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+
+
+def parse_tick(line: str) -> Tick:
+    # Format: timestamp,symbol,price,volume (ISO-tidsstämpel)
+    timestamp, symbol, price, volume = line.strip().split(",")
+    return Tick(symbol, float(price), float(volume), datetime.fromisoformat(timestamp))
+
+
+class TickSource(ABC):
+
+    @abstractmethod
+    def ticks(self) -> AsyncIterator[Tick]:
+        pass
+
+
+class ReplayTickSource(TickSource):
+
+    def __init__(self, path: str, speed: float = 0.0):
+        self.path = path
+        self.speed = speed  # 0 = så fort som möjligt, 1 = realtid
+
+    async def ticks(self) -> AsyncIterator[Tick]:
+        previous = None
+        with open(self.path) as f:
+            for line in f:
+                if not line.strip() or line.startswith("#") or line.startswith("timestamp"):
+                    continue
+                tick = parse_tick(line)
+                if self.speed > 0 and previous is not None:
+                    await asyncio.sleep(max(0.0, (tick.timestamp - previous).total_seconds() / self.speed))
+                previous = tick.timestamp
+                yield tick
+                await asyncio.sleep(0)
+
+
+class SocketTickSource(TickSource):
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9100):
+        self.host = host
+        self.port = port
+
+    async def ticks(self) -> AsyncIterator[Tick]:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            while line := await reader.readline():
+                try:
+                    yield parse_tick(line.decode())
+                except ValueError as e:
+                    logger.warning(f"Ogiltig tick ignoreras: {e}")
+        finally:
+            writer.close()
+
+
+def create_tick_source(config: dict) -> TickSource:
+    source = config.get("source", "replay")
+    if source == "replay":
+        return ReplayTickSource(config["path"], speed=config.get("speed", 0.0))
+    if source == "socket":
+        return SocketTickSource(config.get("host", "127.0.0.1"), config.get("port", 9100))
+    raise ValueError(f"Okänd tick-källa: {source}. Välj: replay, socket")
+
+
+class BarAggregator:
+
+    def __init__(self, interval: timedelta = timedelta(minutes=1)):
+        self.interval = interval
+        self.open_bars: dict[str, Bar] = {}
+        self._next_close: datetime | None = None
+
+    def bucket_start(self, timestamp: datetime) -> datetime:
+        epoch = datetime(1970, 1, 1, tzinfo=timestamp.tzinfo)
+        return timestamp - (timestamp - epoch) % self.interval
+
+    def add(self, tick: Tick) -> list[Bar]:
+        # Tickens tid fungerar som vattenstämpel: alla bars som slutat före den stängs
+        closed = self.advance(tick.timestamp)
+        bar = self.open_bars.get(tick.symbol)
+        if bar is None:
+            start = self.bucket_start(tick.timestamp)
+            bar = Bar(tick.symbol, start, start + self.interval,
+                      tick.price, tick.price, tick.price, tick.price, tick.volume)
+            self.open_bars[tick.symbol] = bar
+            if self._next_close is None or bar.end < self._next_close:
+                self._next_close = bar.end
+        else:
+            bar.high = max(bar.high, tick.price)
+            bar.low = min(bar.low, tick.price)
+            bar.close = tick.price
+            bar.volume += tick.volume
+        return closed
+
+    def advance(self, now: datetime) -> list[Bar]:
+        if self._next_close is None or now < self._next_close:
+            return []
+        closed = [bar for bar in self.open_bars.values() if bar.end <= now]
+        for bar in closed:
+            del self.open_bars[bar.symbol]
+        self._next_close = min((b.end for b in self.open_bars.values()), default=None)
+        return closed
+
+    def flush(self) -> list[Bar]:
+        closed = list(self.open_bars.values())
+        self.open_bars.clear()
+        self._next_close = None
+        return closed
+
+
+class BarHistory:
+
+    def __init__(self, maxlen: int = 500):
+        self.maxlen = maxlen
+        self.bars: dict[str, deque[Bar]] = {}
+
+    def append(self, bar: Bar):
+        history = self.bars.get(bar.symbol)
+        if history is None:
+            history = self.bars[bar.symbol] = deque(maxlen=self.maxlen)
+        history.append(bar)
+
+    def to_frame(self, symbol: str) -> pd.DataFrame:
+        history = self.bars.get(symbol, ())
+        return pd.DataFrame(
+            {
+                "Open": [b.open for b in history],
+                "High": [b.high for b in history],
+                "Low": [b.low for b in history],
+                "Close": [b.close for b in history],
+                "Volume": [b.volume for b in history],
+            },
+            index=pd.DatetimeIndex([b.start for b in history]),
+        )
+
+
+class StreamingPipeline:
+
+    def __init__(self, source: TickSource, on_bar: Callable[[str, pd.DataFrame], None],
+                 interval: timedelta = timedelta(minutes=1), history: int = 500,
+                 on_tick: Callable[[Tick], None] | None = None):
+        self.source = source
+        self.on_bar = on_bar
+        self.on_tick = on_tick
+        self.aggregator = BarAggregator(interval)
+        self.history = BarHistory(history)
+        self.bars_closed = 0
+
+    @classmethod
+    def from_config(cls, config: dict, on_bar: Callable[[str, pd.DataFrame], None],
+                    on_tick: Callable[[Tick], None] | None = None) -> "StreamingPipeline":
+        return cls(
+            create_tick_source(config),
+            on_bar,
+            interval=timedelta(seconds=config.get("bar_seconds", 60)),
+            history=config.get("history", 500),
+            on_tick=on_tick,
+        )
+
+    async def run(self):
+        async for tick in self.source.ticks():
+            if self.on_tick:
+                self.on_tick(tick)
+            for bar in self.aggregator.add(tick):
+                self._emit(bar)
+        for bar in self.aggregator.flush():
+            self._emit(bar)
+
+    def _emit(self, bar: Bar):
+        # Bara den påverkade symbolen utvärderas vid bar-stängning
+        self.history.append(bar)
+        self.bars_closed += 1
+        try:
+            self.on_bar(bar.symbol, self.history.to_frame(bar.symbol))
+        except Exception as e:
+            logger.error(f"Fel vid bar-utvärdering av {bar.symbol}: {e}")
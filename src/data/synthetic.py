@@ -0,0 +1,165 @@
+import logging
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from src.data.source import TRADING_MINUTES_PER_DAY, MarketDataSource, interval_to_timedelta, period_to_offset
+
+logger = logging.getLogger("trading-bot")
+
+BARS_PER_YEAR = 252
+
+
+@dataclass(slots=True)
+class MarketModel:
+    drift: float = 0.08                  # Årlig förväntad avkastning
+    volatility: float = 0.25             # Årlig idiosynkratisk volatilitet (median över symboler)
+    market_volatility: float = 0.15      # Gemensam marknadsfaktor
+    sector_volatility: float = 0.10      # Sektorfaktor, delas av symboler i samma sektor
+    sectors: int = 11
+    jump_intensity: float = 0.5          # Förväntat antal kurshopp per symbol och år
+    jump_mean: float = -0.02
+    jump_std: float = 0.06
+    volatile_multiplier: float = 2.5     # Volatilitet i orolig regim relativt lugn
+    calm_persistence: float = 0.98       # Sannolikhet att stanna i lugn regim per bar
+    volatile_persistence: float = 0.90   # Sannolikhet att stanna i orolig regim per bar
+
+    @classmethod
+    def from_config(cls, config: dict) -> "MarketModel":
+        defaults = cls()
+        return cls(**{name: config.get(name, getattr(defaults, name)) for name in cls.__slots__})
+
+
+def _regimes(rng: np.random.Generator, bars: int, model: MarketModel) -> np.ndarray:
+    # Tvåtillstånds-Markovkedja (0 = lugn, 1 = orolig), gemensam för hela marknaden
+    draws = rng.random(bars)
+    regime = np.zeros(bars, dtype=np.int8)
+    for t in range(1, bars):
+        stay = model.volatile_persistence if regime[t - 1] else model.calm_persistence
+        regime[t] = regime[t - 1] if draws[t] < stay else 1 - regime[t - 1]
+    return regime
+
+
+def generate_ohlcv(symbols: int, bars: int, seed: int = 0, model: MarketModel | None = None,
+                   dt: float = 1 / BARS_PER_YEAR) -> dict[str, np.ndarray]:
+    # GBM med hopp: log-avkastning = drift + beta * marknad + sektor + idiosynkratiskt + hopp,
+    # skalat med regimens volatilitet. Arrayer i form (bars, symbols), float32
+    model = model or MarketModel()
+    rng = np.random.default_rng(seed)
+    sqrt_dt = np.float32(np.sqrt(dt))
+
+    scale = np.where(_regimes(rng, bars, model) == 1, model.volatile_multiplier, 1.0).astype(np.float32)[:, None]
+    sector = rng.integers(0, model.sectors, symbols)
+    beta = rng.normal(1.0, 0.3, symbols).clip(0.2, 2.0).astype(np.float32)
+    sigma = (model.volatility * rng.lognormal(0.0, 0.3, symbols)).astype(np.float32)
+
+    market = rng.standard_normal(bars, dtype=np.float32) * np.float32(model.market_volatility) * sqrt_dt
+    sectors = rng.standard_normal((bars, model.sectors), dtype=np.float32) * np.float32(model.sector_volatility) * sqrt_dt
+    returns = rng.standard_normal((bars, symbols), dtype=np.float32)
+    returns *= sigma * sqrt_dt
+    returns += market[:, None] * beta
+    returns += sectors[:, sector]
+    returns *= scale
+    # Itô-korrektion så att driften gäller det förväntade priset, inte log-priset
+    variance = (beta * model.market_volatility) ** 2 + model.sector_volatility ** 2 + sigma ** 2
+    returns += (np.float32(model.drift) - np.float32(0.5) * variance * scale ** 2) * np.float32(dt)
+
+    # Hopp: Bernoulli per bar räcker när intensiteten * dt är liten
+    hits = np.flatnonzero(rng.random(returns.size, dtype=np.float32) < model.jump_intensity * dt)
+    returns.flat[hits] += rng.normal(model.jump_mean, model.jump_std, len(hits)).astype(np.float32)
+
+    start = rng.lognormal(np.log(50.0), 1.0, symbols).astype(np.float32)
+    close = start * np.exp(np.cumsum(returns, axis=0))
+
+    # Öppning nära föregående stängning, high/low utanför kroppen med regimberoende spridning
+    spread = sigma * sqrt_dt * scale
+    open_ = np.empty_like(close)
+    open_[0] = start
+    open_[1:] = close[:-1]
+    open_ *= np.exp(rng.standard_normal((bars, symbols), dtype=np.float32) * spread * np.float32(0.2))
+    high = np.maximum(open_, close)
+    high *= np.exp(np.abs(rng.standard_normal((bars, symbols), dtype=np.float32)) * spread * np.float32(0.5))
+    low = np.minimum(open_, close)
+    low *= np.exp(-np.abs(rng.standard_normal((bars, symbols), dtype=np.float32)) * spread * np.float32(0.5))
+
+    # Volym ökar med barens rörelse
+    base_volume = rng.lognormal(np.log(1e6), 1.0, symbols).astype(np.float32)
+    volume = base_volume * np.exp(rng.normal(0.0, 0.3, (bars, symbols)).astype(np.float32))
+    volume *= 1 + 20 * np.abs(returns)
+    return {"Open": open_, "High": high, "Low": low, "Close": close, "Volume": np.round(volume),
+            "sector": sector}
+
+
+class SyntheticSource(MarketDataSource):
+
+    def __init__(self, symbols: int = 1000, bars: int = 260, seed: int = 0, model: MarketModel | None = None,
+                 interval: str = "1d", end: str = "2024-01-02"):
+        # Hela universumet genereras i förväg; markören (set_cursor/advance) styr vad som är "nu"
+        step = interval_to_timedelta(interval)
+        if step >= pd.Timedelta(days=1):
+            dt = step.days / BARS_PER_YEAR
+            self.index = pd.bdate_range(end=end, periods=bars, name="Date")
+        else:
+            dt = step / pd.Timedelta(minutes=TRADING_MINUTES_PER_DAY) / BARS_PER_YEAR
+            self.index = pd.date_range(end=end, periods=bars, freq=step, name="Date")
+        self.interval = interval
+        self.seed = seed
+        self.symbols = [f"SYN{i:05d}" for i in range(symbols)]
+        self._columns = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.data = generate_ohlcv(symbols, bars, seed, model, dt)
+        self.sectors = self.data.pop("sector")
+        self.cursor = bars
+
+    @classmethod
+    def from_config(cls, config: dict) -> "SyntheticSource":
+        return cls(
+            symbols=config.get("symbols", 1000),
+            bars=config.get("bars", 260),
+            seed=config.get("seed", 0),
+            model=MarketModel.from_config(config.get("model", {})),
+            interval=config.get("interval", "1d"),
+            end=config.get("end", "2024-01-02"),
+        )
+
+    def set_cursor(self, bar: int):
+        self.cursor = max(1, min(bar, len(self.index)))
+
+    def advance(self, bars: int = 1) -> bool:
+        # Falskt när historiken är slut
+        if self.cursor >= len(self.index):
+            return False
+        self.set_cursor(self.cursor + bars)
+        return True
+
+    def _column(self, symbol: str, interval: str) -> int:
+        if interval != self.interval:
+            raise ValueError(f"Syntetisk data genereras med intervall {self.interval}, inte {interval}")
+        column = self._columns.get(symbol)
+        if column is None:
+            raise ValueError(f"Ingen data hittades för {symbol}")
+        return column
+
+    def _frame(self, column: int, lo: int, hi: int) -> pd.DataFrame:
+        return pd.DataFrame({name: values[lo:hi, column].astype(np.float64) for name, values in self.data.items()},
+                            index=self.index[lo:hi])
+
+    def get_historical(self, symbol: str, period: str = "3mo", interval: str = "1d") -> pd.DataFrame:
+        column = self._column(symbol, interval)
+        offset = period_to_offset(period)
+        lo = 0 if offset is None else int(self.index.searchsorted(self.index[self.cursor - 1] - offset))
+        return self._frame(column, lo, self.cursor)
+
+    def get_recent(self, symbol: str, bars: int, interval: str = "1d") -> pd.DataFrame:
+        return self._frame(self._column(symbol, interval), max(0, self.cursor - bars), self.cursor)
+
+    def get_current_price(self, symbol: str) -> float:
+        return float(self.data["Close"][self.cursor - 1, self._column(symbol, self.interval)])
+
+    def get_prices_bulk(self, symbols: list[str]) -> dict[str, float]:
+        # En enda indexering över hela tvärsnittet i stället för en uppslagning per symbol
+        known = [symbol for symbol in symbols if symbol in self._columns]
+        if len(known) < len(symbols):
+            logger.warning(f"Ingen syntetisk data för {len(symbols) - len(known)} symboler")
+        closes = self.data["Close"][self.cursor - 1, [self._columns[symbol] for symbol in known]]
+        return dict(zip(known, closes.tolist()))
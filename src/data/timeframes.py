@@ -0,0 +1,166 @@
+import logging
+import time
+from collections.abc import Callable
+from datetime import datetime
+
+import pandas as pd
+
+from src.data.source import MarketDataSource, interval_to_timedelta, period_to_offset
+
+logger = logging.getLogger("trading-bot")
+
+_AGG = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+
+
+def bucket_starts(index: pd.DatetimeIndex, interval: str) -> pd.DatetimeIndex:
+    if interval == "1wk":
+        # Veckor börjar på måndag, inte på epokens torsdag
+        days = index.normalize()
+        return days - pd.to_timedelta(days.weekday, unit="D")
+    return index.floor(interval_to_timedelta(interval))
+
+
+def resample(df: pd.DataFrame, interval: str) -> pd.DataFrame:
+    agg = {c: f for c, f in _AGG.items() if c in df.columns}
+    out = df.groupby(bucket_starts(df.index, interval), sort=True).agg(agg)
+    out.index.name = df.index.name
+    return out
+
+
+class ResampledSeries:
+
+    def __init__(self, interval: str, max_bars: int | None = None):
+        self.interval = interval
+        self.max_bars = max_bars
+        self.completed = pd.DataFrame()
+        self.current = pd.DataFrame()  # Det senaste, ofullständiga baret
+        self.open_start: pd.Timestamp | None = None
+        self._frame: pd.DataFrame | None = None
+
+    def update(self, base: pd.DataFrame):
+        # Bara basbar från det öppna barets början räknas om; stängda bars är slutgiltiga
+        start = 0 if self.open_start is None else int(base.index.searchsorted(self.open_start))
+        tail = resample(base.iloc[start:], self.interval)
+        if tail.empty:
+            return
+        if len(tail) > 1:
+            finished = tail.iloc[:-1]
+            self.completed = finished if self.completed.empty else pd.concat([self.completed, finished])
+            if self.max_bars and len(self.completed) > self.max_bars:
+                self.completed = self.completed.iloc[-self.max_bars:]
+        self.current = tail.iloc[-1:]
+        self.open_start = tail.index[-1]
+        self._frame = None
+
+    def reset(self):
+        self.completed = pd.DataFrame()
+        self.current = pd.DataFrame()
+        self.open_start = None
+        self._frame = None
+
+    def frame(self) -> pd.DataFrame:
+        if self._frame is None:
+            self._frame = self.current if self.completed.empty else pd.concat([self.completed, self.current])
+        return self._frame
+
+
+class MultiTimeframeSource(MarketDataSource):
+
+    def __init__(self, source: MarketDataSource, base_interval: str = "5m", history_period: str = "60d",
+                 refresh_period: str = "1d", min_refresh_seconds: float = 30.0, max_bars: int = 50000):
+        # Hämtar ett enda basintervall per symbol; högre tidsramar härleds lokalt
+        interval_to_timedelta(base_interval)
+        self.source = source
+        self.base_interval = base_interval
+        self.history_period = history_period
+        self.refresh_period = refresh_period
+        self.min_refresh_seconds = min_refresh_seconds
+        self.max_bars = max_bars
+        self.base: dict[str, pd.DataFrame] = {}
+        self.series: dict[str, dict[str, ResampledSeries]] = {}
+        self._refreshed: dict[str, float] = {}
+        # Avgör om den korta hämtningen når tillbaka till senaste kända bar; kan bytas ut i tester
+        self.clock: Callable[[], datetime] = datetime.now
+
+    @classmethod
+    def from_config(cls, source: MarketDataSource, config: dict) -> "MultiTimeframeSource":
+        return cls(
+            source,
+            base_interval=config.get("base_interval", "5m"),
+            history_period=config.get("history_period", "60d"),
+            refresh_period=config.get("refresh_period", "1d"),
+            min_refresh_seconds=config.get("min_refresh_seconds", 30),
+            max_bars=config.get("max_bars", 50000),
+        )
+
+    def refresh(self, symbol: str, force: bool = False) -> pd.DataFrame:
+        now = time.monotonic()
+        base = self.base.get(symbol)
+        if base is not None and not force and now - self._refreshed[symbol] < self.min_refresh_seconds:
+            return base
+        if base is not None and not self._refresh_covers(base.index[-1]):
+            # Längre sedan senaste bar än den korta hämtningen sträcker sig (t.ex. efter ett avbrott);
+            # bars däremellan skulle saknas, så hela historiken hämtas om
+            logger.info(f"Basdata för {symbol} slutar {base.index[-1]}, hämtar om historiken")
+            base = None
+            for series in self.series.get(symbol, {}).values():
+                series.reset()
+        if base is None:
+            base = self.source.get_historical(symbol, period=self.history_period, interval=self.base_interval)
+        else:
+            # Kort hämtning räcker; överlappande rader (t.ex. ett växande sista bar) ersätts.
+            # Ett nattuppehåll ryms i fönstret och ger ingen omhämtning
+            new = self.source.get_historical(symbol, period=self.refresh_period, interval=self.base_interval)
+            if len(new):
+                base = pd.concat([base.iloc[:int(base.index.searchsorted(new.index[0]))], new])
+        if len(base) > self.max_bars:
+            base = base.iloc[-self.max_bars:]
+        self.base[symbol] = base
+        self._refreshed[symbol] = now
+        for series in self.series.get(symbol, {}).values():
+            series.update(base)
+        return base
+
+    def _refresh_covers(self, last: pd.Timestamp) -> bool:
+        offset = period_to_offset(self.refresh_period)
+        if offset is None:
+            return True
+        now = pd.Timestamp(self.clock())
+        if last.tzinfo is not None and now.tzinfo is None:
+            now = now.tz_localize(datetime.now().astimezone().tzinfo)
+        elif last.tzinfo is None and now.tzinfo is not None:
+            now = now.tz_localize(None)
+        return last + offset >= now
+
+    def get_timeframes(self, symbol: str, intervals: list[str], period: str = "3mo",
+                       bars: int | None = None) -> dict[str, pd.DataFrame]:
+        base = self.refresh(symbol)
+        per_symbol = self.series.setdefault(symbol, {})
+        offset = period_to_offset(period)
+        frames = {}
+        for interval in intervals:
+            if interval == self.base_interval:
+                df = base
+            else:
+                if interval_to_timedelta(interval) < interval_to_timedelta(self.base_interval):
+                    raise ValueError(f"{interval} är finare än basintervallet {self.base_interval}")
+                series = per_symbol.get(interval)
+                if series is None:
+                    series = per_symbol[interval] = ResampledSeries(interval, self.max_bars)
+                    series.update(base)
+                df = series.frame()
+            if bars:
+                df = df.iloc[-bars:]
+            elif offset is not None and len(df):
+                df = df.iloc[int(df.index.searchsorted(df.index[-1] - offset, side="right")):]
+            frames[interval] = df
+        return frames
+
+    def get_historical(self, symbol: str, period: str = "3mo", interval: str = "1d") -> pd.DataFrame:
+        return self.get_timeframes(symbol, [interval], period)[interval]
+
+    def get_recent(self, symbol: str, bars: int, interval: str = "1d") -> pd.DataFrame:
+        return self.get_timeframes(symbol, [interval], bars=bars)[interval]
+
+    def get_current_price(self, symbol: str) -> float:
+        return float(self.refresh(symbol)["Close"].iloc[-1])
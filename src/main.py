@@ -1,28 +1,25 @@
+import asyncio
 import sys
 import os
 import yaml
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.brokers.paper_broker import PaperBroker
-from src.brokers.alpaca_broker import AlpacaBroker
-from src.brokers.binance_broker import BinanceBroker
-from src.brokers.avanza_broker import AvanzaBroker
+from src.brokers.matching import SimulationConfig
+from src.brokers.ratelimit import RateLimitScheduler
+from src.brokers.retention import RetentionPolicy
+from src.brokers.transport import BrokerTransport
 from src.core.engine import TradingEngine
+from src.core.ledger import TradeLedger
+from src.core.portfolio import Portfolio
+from src.core.portfolio_risk import PortfolioRiskModel
 from src.core.risk import RiskManager
-from src.data.fetcher import DataFetcher
-from src.strategies.rsi_strategy import RSIStrategy
-from src.strategies.macd_strategy import MACDStrategy
-from src.strategies.bollinger_strategy import BollingerStrategy
-from src.strategies.momentum_strategy import MomentumStrategy
-from src.utils.logger import setup_logger
-
-STRATEGIES = {
-    "rsi": RSIStrategy,
-    "macd": MACDStrategy,
-    "bollinger": BollingerStrategy,
-    "momentum": MomentumStrategy,
-}
+from src.core.session import SessionRecorder
+from src.data.source import create_data_source
+from src.data.streaming import StreamingPipeline
+from src.utils.logger import setup_logger_from_config
+from src.utils.registry import BROKERS, STRATEGIES
+from src.utils.tracing import configure_tracing
 
 
 def load_config(path: str = "config/settings.yaml") -> dict:
@@ -30,13 +27,15 @@ def load_config(path: str = "config/settings.yaml") -> dict:
         return yaml.safe_load(f)
 
 
+def make_transport(broker_name: str, config: dict) -> BrokerTransport:
+    scheduler = RateLimitScheduler.for_broker(broker_name, config.get("rate_limits", {}).get(broker_name))
+    return BrokerTransport.from_config(broker_name, config.get("transport", {}), scheduler=scheduler)
+
+
 def main():
     config = load_config()
-    logger = setup_logger(
-        level=config.get("logging", {}).get("level", "INFO"),
-        trade_log=config.get("logging", {}).get("trade_log", "logs/trades.log"),
-        signal_log=config.get("logging", {}).get("signal_log", "logs/signals.log"),
-    )
+    logger = setup_logger_from_config(config.get("logging", {}))
+    configure_tracing(config.get("tracing", {}))
 
     # Samla alla symboler
     symbols_config = config.get("symbols", {})
@@ -46,11 +45,22 @@ def main():
 
     logger.info(f"Laddar konfiguration: mode={config['mode']}, strategi={config['strategy']}")
 
-    # Broker
+    # Broker — bara det valda brokerns SDK importeras
     mode = config["mode"]
-    if mode == "paper":
+    if mode not in BROKERS:
+        logger.error(f"Okänt mode: {mode}. Välj: {', '.join(BROKERS.names())}")
+        sys.exit(1)
+    try:
+        broker_class = BROKERS.get(mode)
+    except ImportError as e:
+        logger.error(f"Broker {mode} kräver ett paket som inte är installerat: {e}")
+        sys.exit(1)
+
+    if mode in ("paper", "paper_array"):
         paper_config = config.get("paper_trading", {})
-        broker = PaperBroker(initial_balance=paper_config.get("initial_balance", 100000))
+        broker = broker_class(initial_balance=paper_config.get("initial_balance", 100000),
+                              simulation=SimulationConfig.from_config(paper_config.get("simulation", {})),
+                              retention=RetentionPolicy.from_config(paper_config.get("retention", {})))
         logger.info(f"Paper trading aktiverat med {broker.cash:.0f} {paper_config.get('currency', 'SEK')}")
     elif mode == "alpaca":
         api_key = os.environ.get("ALPACA_API_KEY", "")
@@ -59,7 +69,8 @@ def main():
             logger.error("ALPACA_API_KEY och ALPACA_API_SECRET måste sättas som miljövariabler")
             sys.exit(1)
         base_url = config.get("alpaca", {}).get("base_url", "https://paper-api.alpaca.markets")
-        broker = AlpacaBroker(api_key=api_key, api_secret=api_secret, base_url=base_url)
+        broker = broker_class(api_key=api_key, api_secret=api_secret, base_url=base_url,
+                              transport=make_transport("alpaca", config))
         if not broker.connect():
             sys.exit(1)
         symbols = config.get("symbols", {}).get("us", [])
@@ -71,7 +82,8 @@ def main():
             logger.error("BINANCE_API_KEY och BINANCE_API_SECRET måste sättas som miljövariabler")
             sys.exit(1)
         testnet = config.get("binance", {}).get("testnet", True)
-        broker = BinanceBroker(api_key=api_key, api_secret=api_secret, testnet=testnet)
+        broker = broker_class(api_key=api_key, api_secret=api_secret, testnet=testnet,
+                               transport=make_transport("binance", config))
         if not broker.connect():
             sys.exit(1)
         symbols = config.get("symbols", {}).get("crypto", [])
@@ -83,21 +95,25 @@ def main():
         if not username or not password or not totp_secret:
             logger.error("AVANZA_USERNAME, AVANZA_PASSWORD och AVANZA_TOTP_SECRET måste sättas som miljövariabler")
             sys.exit(1)
-        broker = AvanzaBroker(username=username, password=password, totp_secret=totp_secret)
+        broker = broker_class(username=username, password=password, totp_secret=totp_secret,
+                              transport=make_transport("avanza", config))
         if not broker.connect():
             sys.exit(1)
         symbols = config.get("symbols", {}).get("swedish", [])
         logger.info("Avanza live-trading aktiverat (svenska aktier)")
     else:
-        logger.error(f"Okänt mode: {mode}. Välj: paper, alpaca, binance, avanza")
-        sys.exit(1)
+        # Broker från ett plugin (entry point trading_bot.brokers) konfigurerar sig själv
+        broker = broker_class.from_config(config)
+        if not broker.connect():
+            sys.exit(1)
+        logger.info(f"Broker-plugin {mode} aktiverat")
 
     # Strategi
     strategy_name = config.get("strategy", "rsi")
     if strategy_name not in STRATEGIES:
-        logger.error(f"Okänd strategi: {strategy_name}. Välj: {', '.join(STRATEGIES.keys())}")
+        logger.error(f"Okänd strategi: {strategy_name}. Välj: {', '.join(STRATEGIES.names())}")
         sys.exit(1)
-    strategy = STRATEGIES[strategy_name]()
+    strategy = STRATEGIES.get(strategy_name)()
 
     # Riskhantering
     risk_config = config.get("risk", {})
@@ -106,26 +122,47 @@ def main():
         stop_loss_pct=risk_config.get("stop_loss_pct", 0.05),
         daily_loss_limit_pct=risk_config.get("daily_loss_limit_pct", 0.03),
         max_open_positions=risk_config.get("max_open_positions", 10),
+        portfolio_risk=PortfolioRiskModel.from_config(symbols, risk_config.get("correlation", {})),
     )
 
     # Engine
-    data_fetcher = DataFetcher()
+    data_fetcher = create_data_source(config.get("data", {}))
     engine = TradingEngine(
         broker=broker,
         strategy=strategy,
         risk_manager=risk_manager,
         data_fetcher=data_fetcher,
         symbols=symbols,
+        portfolio=Portfolio(ledger=TradeLedger.from_config(config.get("ledger", {})),
+                            max_equity_points=config.get("ledger", {}).get("max_equity_points", 100_000)),
     )
 
+    monitor_config = config.get("stop_monitor", {})
+    if monitor_config.get("enabled", False):
+        engine.attach_stop_monitor(
+            trailing_stop_pct=monitor_config.get("trailing_stop_pct", 0.0),
+            interval_seconds=monitor_config.get("interval_seconds", 5),
+        )
+
+    session_config = config.get("session", {})
+    if session_config.get("record", False):
+        SessionRecorder.from_config(session_config).attach(engine)
+
     logger.info("=== Trading Bot Startad ===")
     logger.info(f"Strategi: {strategy_name} | Symboler: {len(symbols)} st")
 
+    streaming_config = config.get("streaming", {})
     try:
-        engine.run(interval_seconds=300)  # Kör var 5:e minut
+        if streaming_config.get("enabled", False):
+            pipeline = StreamingPipeline.from_config(streaming_config, engine.on_bar, on_tick=engine.on_tick)
+            asyncio.run(engine.run_streaming(pipeline))
+        else:
+            engine.run(interval_seconds=300)  # Kör var 5:e minut
     except KeyboardInterrupt:
         logger.info("Bot stoppad. Slutstatus:")
         engine._log_status()
+    finally:
+        engine.stop()
 
 
 if __name__ == "__main__":
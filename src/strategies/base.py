@@ -1,8 +1,14 @@
+import logging
+import math
 from abc import ABC, abstractmethod
 from enum import Enum
 
 import pandas as pd
 
+from src.utils.logger import SIGNAL_LOGGER
+
+signal_logger = logging.getLogger(SIGNAL_LOGGER)
+
 
 class Signal(Enum):
     BUY = "buy"
@@ -10,8 +16,34 @@ class Signal(Enum):
     HOLD = "hold"
 
 
+def ema_warmup(alpha: float, tolerance: float = 0.01) -> int:
+    # Antal extra bars innan startvärdets vikt i en EMA fallit under `tolerance`
+    return math.ceil(math.log(tolerance) / math.log(1 - alpha))
+
+
 class BaseStrategy(ABC):
+    # Tidsramar strategin vill ha per anrop, t.ex. ("5m", "1h", "1d"); tomt = bara standardintervallet
+    timeframes: tuple[str, ...] = ()
+    # Styrkan i den senaste köpsignalen, sätts av analyze. Motorn rankar köpen med den när
+    # inte alla ryms; bara jämförbar inom samma strategi
+    last_score: float = 0.0
+
+    @property
+    def lookback(self) -> int | None:
+        # Minsta antal bars strategin behöver, inkl. insvängning för exponentiella indikatorer.
+        # None = okänt, motorn hämtar då standardperioden
+        return None
 
     @abstractmethod
     def analyze(self, df: pd.DataFrame, symbol: str) -> Signal:
         pass
+
+    def analyze_timeframes(self, frames: dict[str, pd.DataFrame], symbol: str) -> Signal:
+        # Standard: analysera den första (primära) tidsramen
+        return self.analyze(frames[self.timeframes[0]], symbol)
+
+    def log_signal(self, symbol: str, signal: Signal, message: str, *args, **fields):
+        # Hamnar i signalströmmen (JSON-rader); meddelandet formateras först när posten faktiskt loggas
+        if signal_logger.isEnabledFor(logging.INFO):
+            signal_logger.info(message, *args, extra={"fields": {
+                "symbol": symbol, "signal": signal.value, "strategy": type(self).__name__, **fields}})
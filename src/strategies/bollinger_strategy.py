@@ -14,6 +14,10 @@ class BollingerStrategy(BaseStrategy):
         self.period = period
         self.std_dev = std_dev
 
+    @property
+    def lookback(self) -> int:
+        return self.period + 1
+
     def analyze(self, df: pd.DataFrame, symbol: str) -> Signal:
         if len(df) < self.period + 1:
             return Signal.HOLD
@@ -23,16 +27,19 @@ class BollingerStrategy(BaseStrategy):
         lower_band = bb.bollinger_lband().iloc[-1]
         upper_band = bb.bollinger_hband().iloc[-1]
 
-        logger.debug(f"{symbol} Pris: {current_price:.2f} | BB: [{lower_band:.2f} - {upper_band:.2f}]")
+        logger.debug("%s Pris: %.2f | BB: [%.2f - %.2f]", symbol, current_price, lower_band, upper_band)
 
         # Pris under undre bandet → överssålt, köp
         if current_price < lower_band:
-            logger.info(f"{symbol} under Bollinger undre band → KÖP-signal")
+            self.last_score = float((lower_band - current_price) / current_price)
+            self.log_signal(symbol, Signal.BUY, "%s under Bollinger undre band → KÖP-signal", symbol,
+                            price=float(current_price), band=float(lower_band))
             return Signal.BUY
 
         # Pris över övre bandet → överköpt, sälj
         if current_price > upper_band:
-            logger.info(f"{symbol} över Bollinger övre band → SÄLJ-signal")
+            self.log_signal(symbol, Signal.SELL, "%s över Bollinger övre band → SÄLJ-signal", symbol,
+                            price=float(current_price), band=float(upper_band))
             return Signal.SELL
 
         return Signal.HOLD
@@ -1,11 +1,7 @@
-import logging
-
 import pandas as pd
 import ta
 
-from .base import BaseStrategy, Signal
-
-logger = logging.getLogger("trading-bot")
+from .base import BaseStrategy, Signal, ema_warmup
 
 
 class MACDStrategy(BaseStrategy):
@@ -15,6 +11,11 @@ class MACDStrategy(BaseStrategy):
         self.slow = slow
         self.signal_period = signal
 
+    @property
+    def lookback(self) -> int:
+        return (self.slow + self.signal_period
+                + ema_warmup(2 / (self.slow + 1)) + ema_warmup(2 / (self.signal_period + 1)))
+
     def analyze(self, df: pd.DataFrame, symbol: str) -> Signal:
         if len(df) < self.slow + self.signal_period:
             return Signal.HOLD
@@ -31,12 +32,15 @@ class MACDStrategy(BaseStrategy):
 
         # Bullish crossover: MACD korsar uppåt genom signallinjen
         if prev_macd <= prev_signal and current_macd > current_signal:
-            logger.info(f"{symbol} MACD bullish crossover → KÖP-signal")
+            self.last_score = float((current_macd - current_signal) / df["Close"].iloc[-1])
+            self.log_signal(symbol, Signal.BUY, "%s MACD bullish crossover → KÖP-signal", symbol,
+                            macd=float(current_macd), macd_signal=float(current_signal))
             return Signal.BUY
 
         # Bearish crossover: MACD korsar nedåt genom signallinjen
         if prev_macd >= prev_signal and current_macd < current_signal:
-            logger.info(f"{symbol} MACD bearish crossover → SÄLJ-signal")
+            self.log_signal(symbol, Signal.SELL, "%s MACD bearish crossover → SÄLJ-signal", symbol,
+                            macd=float(current_macd), macd_signal=float(current_signal))
             return Signal.SELL
 
         return Signal.HOLD
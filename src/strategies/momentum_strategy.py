@@ -14,6 +14,10 @@ class MomentumStrategy(BaseStrategy):
         self.long_window = long_window
         self.momentum_threshold = momentum_threshold
 
+    @property
+    def lookback(self) -> int:
+        return self.long_window + 1
+
     def analyze(self, df: pd.DataFrame, symbol: str) -> Signal:
         if len(df) < self.long_window + 1:
             return Signal.HOLD
@@ -29,16 +33,20 @@ class MomentumStrategy(BaseStrategy):
         # Beräkna momentum som procentuell förändring
         momentum = (current_short - current_long) / current_long
 
-        logger.debug(f"{symbol} Momentum: {momentum:.3f} | SMA{self.short_window}: {current_short:.2f} | SMA{self.long_window}: {current_long:.2f}")
+        logger.debug("%s Momentum: %.3f | SMA%d: %.2f | SMA%d: %.2f", symbol, momentum,
+                     self.short_window, current_short, self.long_window, current_long)
 
         # Bullish: kort MA korsar uppåt genom lång MA med tillräckligt momentum
         if prev_short <= prev_long and current_short > current_long and momentum > self.momentum_threshold:
-            logger.info(f"{symbol} Momentum bullish crossover ({momentum:.1%}) → KÖP-signal")
+            self.last_score = float(momentum)
+            self.log_signal(symbol, Signal.BUY, "%s Momentum bullish crossover (%.1f%%) → KÖP-signal", symbol,
+                            momentum * 100, momentum=float(momentum))
             return Signal.BUY
 
         # Bearish: kort MA korsar nedåt genom lång MA
         if prev_short >= prev_long and current_short < current_long:
-            logger.info(f"{symbol} Momentum bearish crossover → SÄLJ-signal")
+            self.log_signal(symbol, Signal.SELL, "%s Momentum bearish crossover → SÄLJ-signal", symbol,
+                            momentum=float(momentum))
             return Signal.SELL
 
         return Signal.HOLD
@@ -3,7 +3,7 @@ import logging
 import pandas as pd
 import ta
 
-from .base import BaseStrategy, Signal
+from .base import BaseStrategy, Signal, ema_warmup
 
 logger = logging.getLogger("trading-bot")
 
@@ -15,6 +15,11 @@ class RSIStrategy(BaseStrategy):
         self.oversold = oversold
         self.overbought = overbought
 
+    @property
+    def lookback(self) -> int:
+        # ta:s RSI är en Wilder-EMA (alpha = 1/period)
+        return self.period + 1 + ema_warmup(1 / self.period)
+
     def analyze(self, df: pd.DataFrame, symbol: str) -> Signal:
         if len(df) < self.period + 1:
             return Signal.HOLD
@@ -22,13 +27,16 @@ class RSIStrategy(BaseStrategy):
         rsi = ta.momentum.RSIIndicator(df["Close"], window=self.period).rsi()
         current_rsi = rsi.iloc[-1]
 
-        logger.debug(f"{symbol} RSI: {current_rsi:.1f}")
+        logger.debug("%s RSI: %.1f", symbol, current_rsi)
 
         if current_rsi < self.oversold:
-            logger.info(f"{symbol} RSI={current_rsi:.1f} < {self.oversold} → KÖP-signal")
+            self.last_score = float(self.oversold - current_rsi)
+            self.log_signal(symbol, Signal.BUY, "%s RSI=%.1f < %s → KÖP-signal", symbol, current_rsi, self.oversold,
+                            rsi=round(float(current_rsi), 2))
             return Signal.BUY
         elif current_rsi > self.overbought:
-            logger.info(f"{symbol} RSI={current_rsi:.1f} > {self.overbought} → SÄLJ-signal")
+            self.log_signal(symbol, Signal.SELL, "%s RSI=%.1f > %s → SÄLJ-signal", symbol, current_rsi, self.overbought,
+                            rsi=round(float(current_rsi), 2))
             return Signal.SELL
 
         return Signal.HOLD
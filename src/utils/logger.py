@@ -1,11 +1,56 @@
+import atexit
+import json
 import logging
 import os
+import queue
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
 
+TRADE_LOGGER = "trading-bot.trades"
+SIGNAL_LOGGER = "trading-bot.signals"
 
-def setup_logger(level: str = "INFO", trade_log: str = "logs/trades.log",
-                 signal_log: str = "logs/signals.log"):
-    os.makedirs(os.path.dirname(trade_log), exist_ok=True)
+_listener: QueueListener | None = None
+
+
+class JsonLinesFormatter(logging.Formatter):
+
+    def format(self, record: logging.LogRecord) -> str:
+        # En JSON-rad per händelse; strukturerade fält skickas med extra={"fields": {...}}
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def log_trade(action: str, order_id: str, symbol: str, side, quantity: float, price: float, pnl: float = 0.0,
+              **fields):
+    # Trade-strömmen (JSON-rader); meddelandet formateras först i loggtråden
+    trade_logger = logging.getLogger(TRADE_LOGGER)
+    if trade_logger.isEnabledFor(logging.INFO):
+        trade_logger.info("%s %s st %s @ %.2f (P&L: %+.2f)", action, quantity, symbol, price, pnl,
+                          extra={"fields": {"order_id": order_id, "symbol": symbol, "side": side.value,
+                                            "quantity": quantity, "price": price, "pnl": pnl, **fields}})
+
+
+def _file_handler(path: str, max_bytes: int, backup_count: int, rotate_when: str | None,
+                  formatter: logging.Formatter | None = None) -> logging.Handler:
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    if rotate_when:
+        handler = TimedRotatingFileHandler(path, when=rotate_when, backupCount=backup_count, encoding="utf-8")
+    else:
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+    handler.setFormatter(formatter or JsonLinesFormatter())
+    return handler
 
+
+def setup_logger(level: str = "INFO", trade_log: str = "logs/trades.log",
+                 signal_log: str = "logs/signals.log", max_bytes: int = 10_000_000, backup_count: int = 5,
+                 rotate_when: str | None = None, log_file: str | None = "logs/bot.log"):
+    global _listener
     logger = logging.getLogger("trading-bot")
     logger.setLevel(getattr(logging, level.upper(), logging.INFO))
 
@@ -16,12 +61,51 @@ def setup_logger(level: str = "INFO", trade_log: str = "logs/trades.log",
     console = logging.StreamHandler()
     console.setLevel(logging.INFO)
     console.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s", datefmt="%H:%M:%S"))
-    logger.addHandler(console)
 
-    # Trade log
-    trade_handler = logging.FileHandler(trade_log)
-    trade_handler.setLevel(logging.INFO)
-    trade_handler.setFormatter(logging.Formatter("%(asctime)s | %(message)s"))
-    logger.addHandler(trade_handler)
+    # Trade- och signalströmmar som JSON-rader, med storleks- eller tidsrotation
+    trade_handler = _file_handler(trade_log, max_bytes, backup_count, rotate_when)
+    trade_handler.addFilter(logging.Filter(TRADE_LOGGER))
+    signal_handler = _file_handler(signal_log, max_bytes, backup_count, rotate_when)
+    signal_handler.addFilter(logging.Filter(SIGNAL_LOGGER))
+    handlers = [console, trade_handler, signal_handler]
 
+    # Allmän logg utan filter: allt som når konsolen (fel, varningar, cykelrader) sparas även på disk
+    if log_file:
+        general = _file_handler(log_file, max_bytes, backup_count, rotate_when,
+                                logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
+        general.setLevel(logging.INFO)
+        handlers.append(general)
+
+    # Handelstråden lägger bara posten på kön; all I/O sker i lyssnarens bakgrundstråd
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(QueueHandler(log_queue))
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logger)
     return logger
+
+
+def setup_logger_from_config(config: dict):
+    return setup_logger(
+        level=config.get("level", "INFO"),
+        trade_log=config.get("trade_log", "logs/trades.log"),
+        signal_log=config.get("signal_log", "logs/signals.log"),
+        max_bytes=config.get("max_bytes", 10_000_000),
+        backup_count=config.get("backup_count", 5),
+        rotate_when=config.get("rotate_when"),
+        log_file=config.get("file", "logs/bot.log"),
+    )
+
+
+def shutdown_logger():
+    # Tömmer kön och stänger filerna; anropas vid avslut
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+    logger = logging.getLogger("trading-bot")
+    for handler in [h for h in logger.handlers if isinstance(h, QueueHandler)]:
+        logger.removeHandler(handler)
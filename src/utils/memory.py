@@ -0,0 +1,18 @@
+import os
+import sys
+
+
+def rss_mb() -> float:
+    # Aktuellt residentminne; /proc finns bara på Linux, annars toppvärdet från getrusage
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1_048_576
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource  # Finns inte på Windows
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss är i byte på macOS men i kB på Linux
+    return peak / 1_048_576 if sys.platform == "darwin" else peak / 1024
@@ -0,0 +1,75 @@
+import importlib
+from importlib.metadata import EntryPoint, entry_points
+
+
+class Registry:
+
+    def __init__(self, kind: str, group: str, builtins: dict[str, str]):
+        # Namn -> "modul:klass". Modulen importeras först när namnet väljs, så ett saknat
+        # SDK för en broker som inte används stoppar inte uppstarten
+        self.kind = kind
+        self.group = group
+        self._targets: dict[str, str | EntryPoint | type] = dict(builtins)
+        self._loaded: dict[str, type] = {}
+        self._discovered = False
+
+    def register(self, name: str, target: str | type | None = None):
+        # Kan användas direkt eller som dekorator: @STRATEGIES.register("min_strategi")
+        if target is None:
+            def decorator(cls: type) -> type:
+                self.register(name, cls)
+                return cls
+            return decorator
+        self._targets[name] = target
+        self._loaded.pop(name, None)
+        return target
+
+    def names(self) -> list[str]:
+        self._discover()
+        return list(self._targets)
+
+    def __contains__(self, name: str) -> bool:
+        self._discover()
+        return name in self._targets
+
+    def get(self, name: str) -> type:
+        cls = self._loaded.get(name)
+        if cls is not None:
+            return cls
+        self._discover()
+        target = self._targets.get(name)
+        if target is None:
+            raise ValueError(f"Okänd {self.kind}: {name}. Välj: {', '.join(self._targets)}")
+        if isinstance(target, str):
+            module, _, attr = target.partition(":")
+            cls = getattr(importlib.import_module(module), attr)
+        elif isinstance(target, EntryPoint):
+            cls = target.load()
+        else:
+            cls = target
+        self._loaded[name] = cls
+        return cls
+
+    def _discover(self):
+        # Tredjepartsplugins via entry points; bara metadata läses, inget importeras
+        if self._discovered:
+            return
+        self._discovered = True
+        for entry_point in entry_points(group=self.group):
+            self._targets.setdefault(entry_point.name, entry_point)
+
+
+STRATEGIES = Registry("strategi", "trading_bot.strategies", {
+    "rsi": "src.strategies.rsi_strategy:RSIStrategy",
+    "macd": "src.strategies.macd_strategy:MACDStrategy",
+    "bollinger": "src.strategies.bollinger_strategy:BollingerStrategy",
+    "momentum": "src.strategies.momentum_strategy:MomentumStrategy",
+})
+
+BROKERS = Registry("broker", "trading_bot.brokers", {
+    "paper": "src.brokers.paper_broker:PaperBroker",
+    "paper_array": "src.brokers.array_paper_broker:ArrayPaperBroker",
+    "alpaca": "src.brokers.alpaca_broker:AlpacaBroker",
+    "binance": "src.brokers.binance_broker:BinanceBroker",
+    "avanza": "src.brokers.avanza_broker:AvanzaBroker",
+})
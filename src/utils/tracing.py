@@ -0,0 +1,126 @@
+import json
+import os
+import random
+import threading
+import time
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    __slots__ = ("tracer", "name", "attrs", "start", "recording")
+
+    def __init__(self, tracer: "Tracer", name: str, attrs: dict):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.start = 0
+        self.recording = False
+
+    def __enter__(self):
+        self.recording = self.tracer._enter()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.tracer._exit(self, end)
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class Tracer:
+
+    def __init__(self, path: str = "logs/trace.json", sample_rate: float = 1.0, enabled: bool = False):
+        # Spans i Chrome trace-format (öppnas i chrome://tracing eller ui.perfetto.dev).
+        # Urvalet görs per rot-span, så en cykel spåras antingen helt eller inte alls
+        self.path = path
+        self.sample_rate = sample_rate
+        self.enabled = enabled
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def span(self, name: str, **attrs):
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, attrs)
+
+    def _enter(self) -> bool:
+        local = self._local
+        depth = getattr(local, "depth", 0)
+        if depth == 0:
+            local.sampled = random.random() < self.sample_rate
+            local.events = []
+        local.depth = depth + 1
+        return local.sampled
+
+    def _exit(self, span: Span, end: int):
+        local = self._local
+        local.depth -= 1
+        if not span.recording:
+            return
+        local.events.append({
+            "name": span.name,
+            "cat": "trading-bot",
+            "ph": "X",
+            "ts": span.start // 1000,
+            "dur": (end - span.start) / 1000,
+            "pid": self._pid,
+            "tid": threading.get_ident(),
+            "args": span.attrs,
+        })
+        if local.depth == 0:
+            self._write(local.events)
+            local.events = []
+
+    def _write(self, events: list[dict]):
+        # JSON Array Format: avslutande ']' är valfri, så filen kan växa rot för rot utan omskrivning
+        with self._lock:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            with open(self.path, "a", encoding="utf-8") as f:
+                if new:
+                    f.write("[\n")
+                f.writelines(json.dumps(event, default=str) + ",\n" for event in events)
+
+
+tracer = Tracer()
+
+
+def span(name: str, **attrs):
+    return tracer.span(name, **attrs)
+
+
+def configure_tracing(config: dict) -> Tracer:
+    tracer.path = config.get("path", "logs/trace.json")
+    tracer.sample_rate = config.get("sample_rate", 1.0)
+    tracer.enabled = config.get("enabled", False)
+    return tracer
+
+
+def load_trace(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        text = f.read().rstrip().rstrip(",")
+    if not text.endswith("]"):
+        text += "]"
+    return json.loads(text)
@@ -0,0 +1,121 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.brokers.matching import SimulationConfig
+from src.core.backtest import BacktestCancelled, run_backtest
+from src.dashboard.jobs import BacktestJobs, BacktestRequest, BacktestRunner, JobQueueFull, StoreBacktestJobs
+from src.dashboard.store import StateStore
+from src.strategies.rsi_strategy import RSIStrategy
+
+
+def _write_data(path, symbols=("AAPL", "MSFT"), bars=300):
+    rng = np.random.default_rng(7)
+    dates = pd.bdate_range("2023-01-02", periods=bars)
+    for symbol in symbols:
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, bars)))
+        pd.DataFrame({"Date": dates, "Open": close, "High": close * 1.01, "Low": close * 0.99,
+                      "Close": close, "Volume": 1000}).to_csv(path / f"{symbol}.csv", index=False)
+    return {"source": "file", "path": str(path)}
+
+
+def _wait(jobs: BacktestJobs, job_id: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while jobs.get(job_id).status not in ("done", "failed", "cancelled"):
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    return jobs.get(job_id)
+
+
+def test_backtest_replays_history_without_lookahead(tmp_path):
+    data_config = _write_data(tmp_path)
+    progress = []
+    result = run_backtest(RSIStrategy(), ["AAPL", "MSFT", "NOPE"], datetime(2023, 6, 1), datetime(2023, 12, 29),
+                          data_config=data_config, progress=progress.append)
+    assert result["symbols"] == ["AAPL", "MSFT"]
+    assert result["bars"] == len(pd.bdate_range("2023-06-01", "2023-12-29"))
+    assert result["trades"] > 0 and result["max_drawdown_pct"] <= 0
+    assert result["equity"][0]["time"] == "2023-06-01"
+    assert progress[-1] == pytest.approx(1.0, abs=0.02)
+
+    with pytest.raises(BacktestCancelled):
+        run_backtest(RSIStrategy(), ["AAPL"], datetime(2023, 6, 1), datetime(2023, 12, 29),
+                     data_config=data_config, cancelled=lambda: True)
+
+
+def test_backtest_uses_simulated_latency_and_slippage(tmp_path):
+    data_config = _write_data(tmp_path)
+    args = (RSIStrategy(), ["AAPL", "MSFT"], datetime(2023, 6, 1), datetime(2023, 12, 29))
+    instant = run_backtest(*args, data_config=data_config)
+    # Latensen mäts i bartid: market-ordern vilar en bar och fylls till nästa stängning
+    delayed = run_backtest(*args, data_config=data_config,
+                           simulation=SimulationConfig(slippage_bps=10, latency_seconds=60))
+    assert delayed["trades"] > 0
+    assert delayed["final_value"] != instant["final_value"]
+
+
+def test_backtest_request_validation():
+    base = {"strategy": "rsi", "symbols": ["AAPL"], "start": "2023-01-01", "end": "2023-06-01"}
+    assert BacktestRequest.from_dict(base).symbols == ["AAPL"]
+    for bad in ({"strategy": "magic"}, {"symbols": []}, {"end": "2022-01-01"}, {"params": {"window": 3}}):
+        with pytest.raises(ValueError):
+            BacktestRequest.from_dict({**base, **bad})
+
+
+def test_jobs_run_in_pool_and_cache_identical_requests(tmp_path):
+    jobs = BacktestJobs(data_config=_write_data(tmp_path), max_workers=1)
+    request = {"strategy": "rsi", "symbols": ["AAPL"], "start": "2023-06-01", "end": "2023-12-29"}
+    try:
+        first = jobs.submit(BacktestRequest.from_dict(request))
+        # Samma indata medan jobbet pågår → samma jobb
+        assert jobs.submit(BacktestRequest.from_dict(request)) is first
+        queued = jobs.submit(BacktestRequest.from_dict({**request, "params": {"period": 10}}))
+        assert jobs.cancel(queued.id).status in ("cancelled", "queued", "running")
+
+        done = _wait(jobs, first.id)
+        assert done.status == "done" and done.result["bars"] > 0
+        assert _wait(jobs, queued.id).status == "cancelled"
+
+        again = jobs.submit(BacktestRequest.from_dict(request))
+        assert again.id != first.id and again.cached and again.result == done.result
+    finally:
+        jobs.shutdown()
+
+
+def test_store_jobs_are_shared_between_workers_and_run_by_the_bot(tmp_path):
+    data_config = _write_data(tmp_path)
+    store = StateStore(str(tmp_path / "dashboard.db"))
+    # Två gunicorn-workers mot samma lagring, jobben körs av bot-processens runner
+    worker_a = StoreBacktestJobs(store, data_config=data_config, max_workers=1, max_queue=1)
+    worker_b = StoreBacktestJobs(StateStore(store.path), data_config=data_config, max_workers=1, max_queue=1)
+    runner = BacktestRunner(StateStore(store.path), BacktestJobs(data_config=data_config, max_workers=1))
+    request = {"strategy": "rsi", "symbols": ["AAPL"], "start": "2023-06-01", "end": "2023-12-29"}
+    try:
+        first = worker_a.submit(BacktestRequest.from_dict(request))
+        assert worker_b.submit(BacktestRequest.from_dict(request)).id == first.id
+        queued = worker_b.submit(BacktestRequest.from_dict({**request, "params": {"period": 10}}))
+        with pytest.raises(JobQueueFull):
+            worker_a.submit(BacktestRequest.from_dict({**request, "params": {"period": 20}}))
+        assert worker_a.cancel(queued.id).status == "cancelled"
+
+        deadline = time.monotonic() + 30
+        while worker_b.get(first.id).status != "done":
+            assert time.monotonic() < deadline
+            runner.tick()
+            time.sleep(0.05)
+        done = worker_b.get(first.id)
+        assert done.result["bars"] > 0
+        assert worker_a.get(queued.id).status == "cancelled"
+
+        again = worker_b.submit(BacktestRequest.from_dict(request))
+        assert again.id != first.id and again.cached and again.result == done.result
+        assert [job.id for job in worker_a.list()][:2] == [again.id, queued.id]
+    finally:
+        runner.shutdown()
@@ -2,8 +2,16 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from src.brokers.array_paper_broker import ArrayPaperBroker
 from src.brokers.base import OrderSide, OrderStatus
+from src.brokers.matching import SimulationConfig
 from src.brokers.paper_broker import PaperBroker
+from src.brokers.retention import RetentionPolicy
 
 
 def test_paper_broker_initial_balance():
@@ -46,3 +54,127 @@ def test_paper_broker_total_value():
     broker.place_order("AAPL", OrderSide.BUY, 10, 100.0)
     broker.update_prices({"AAPL": 120.0})
     assert broker.get_total_value() == 9000 + (10 * 120)
+
+
+def test_paper_broker_limit_order_rests_until_crossed():
+    broker = PaperBroker(initial_balance=10000)
+    order = broker.place_limit_order("AAPL", OrderSide.BUY, 10, 95.0)
+    assert order.status == OrderStatus.PENDING
+    broker.process_bar("AAPL", 100.0, 101.0, 96.0, 99.0)
+    assert order.status == OrderStatus.PENDING
+    fills = broker.process_bar("AAPL", 97.0, 98.0, 94.0, 96.0)
+    assert order.status == OrderStatus.FILLED
+    assert fills[0].price == 95.0
+    assert broker.get_balance() == 10000 - 950
+
+
+def test_paper_broker_cancel_resting_order():
+    broker = PaperBroker(initial_balance=10000)
+    order = broker.place_limit_order("AAPL", OrderSide.BUY, 10, 95.0)
+    assert broker.cancel_order(order.order_id)
+    broker.process_bar("AAPL", 90.0, 91.0, 89.0, 90.0)
+    assert broker.get_order_status(order.order_id) == OrderStatus.CANCELLED
+    assert broker.get_balance() == 10000
+
+
+def test_paper_broker_stop_order_with_slippage_and_gap():
+    broker = PaperBroker(initial_balance=10000, simulation=SimulationConfig(slippage_bps=10))
+    broker.place_order("AAPL", OrderSide.BUY, 10, 100.0)
+    stop = broker.place_stop_order("AAPL", OrderSide.SELL, 10, 95.0)
+    # Gap ned under stop-nivån: fylls på öppningspriset minus glidning
+    fills = broker.process_bar("AAPL", 90.0, 92.0, 88.0, 91.0)
+    assert stop.status == OrderStatus.FILLED
+    assert fills[0].price == pytest.approx(90.0 * 0.999)
+    assert "AAPL" not in broker.get_positions()
+
+
+def test_paper_broker_partial_fills_by_volume():
+    broker = PaperBroker(initial_balance=100000, simulation=SimulationConfig(volume_participation=0.1))
+    order = broker.place_limit_order("AAPL", OrderSide.BUY, 100, 100.0)
+    broker.process_bar("AAPL", 99.0, 100.0, 98.0, 99.0, volume=600)
+    assert order.filled_quantity == 60
+    assert order.status == OrderStatus.PENDING
+    broker.process_bar("AAPL", 99.0, 100.0, 98.0, 99.0, volume=600)
+    assert order.status == OrderStatus.FILLED
+    assert broker.get_positions()["AAPL"].quantity == 100
+
+
+def test_paper_broker_latency_delays_market_order():
+    broker = PaperBroker(initial_balance=10000, simulation=SimulationConfig(latency_seconds=60))
+    start = datetime(2024, 1, 2, 10, 0)
+    order = broker.place_order("AAPL", OrderSide.BUY, 10, 100.0, timestamp=start)
+    assert order.status == OrderStatus.PENDING
+    broker.process_bar("AAPL", 101.0, 101.0, 101.0, 101.0, timestamp=start + timedelta(seconds=30))
+    assert order.status == OrderStatus.PENDING
+    broker.process_bar("AAPL", 102.0, 103.0, 101.0, 102.0, timestamp=start + timedelta(seconds=60))
+    assert order.status == OrderStatus.FILLED
+    assert broker.get_positions()["AAPL"].avg_price == 102.0
+
+
+def test_array_paper_broker_matches_paper_broker():
+    brokers = [PaperBroker(initial_balance=100000), ArrayPaperBroker(initial_balance=100000, capacity=2)]
+    for broker in brokers:
+        broker.place_order("AAPL", OrderSide.BUY, 10, 100.0)
+        broker.place_order("TSLA", OrderSide.BUY, 5, 200.0)
+        broker.place_order("AAPL", OrderSide.BUY, 10, 110.0)
+        broker.place_order("MSFT", OrderSide.BUY, 3, 300.0)
+        broker.place_order("TSLA", OrderSide.SELL, 5, 210.0)
+        broker.update_prices({"AAPL": 120.0, "MSFT": 310.0, "GOOGL": 50.0})
+    paper, array = brokers
+    assert array.get_balance() == paper.get_balance()
+    assert array.get_total_value() == pytest.approx(paper.get_total_value())
+    assert array.get_positions() == paper.get_positions()
+    assert array.get_unrealized_pnl() == pytest.approx(10 * 20 + 10 * 10 + 3 * 10)
+
+
+def test_array_paper_broker_incremental_totals():
+    broker = ArrayPaperBroker(initial_balance=1e9, capacity=4)
+    symbols = [f"S{i}" for i in range(50)]
+    for i, symbol in enumerate(symbols):
+        broker.place_order(symbol, OrderSide.BUY, i + 1, 10.0)
+    broker.update_prices({s: 11.0 + i for i, s in enumerate(symbols)})
+    broker.place_order("S3", OrderSide.SELL, 4, 14.0)
+    value = broker.get_positions_value()
+    broker.book.recompute_totals()
+    assert value == pytest.approx(broker.book.market_value)
+    assert broker.book.open_count == 49
+    assert broker.get_position("S3") is None
+
+
+def test_array_paper_broker_mark_many_dedupes_and_skips_bad_prices():
+    broker = ArrayPaperBroker(initial_balance=100000)
+    broker.place_order("AAPL", OrderSide.BUY, 10, 100.0)
+    broker.place_order("TSLA", OrderSide.BUY, 5, 200.0)
+    indices = np.array([0, 1, 0, 1], dtype=np.intp)
+    broker.update_prices_array(indices, np.array([105.0, 210.0, 110.0, np.nan]))
+    assert broker.get_position("AAPL").current_price == 110.0
+    assert broker.get_position("TSLA").current_price == 210.0
+    value = broker.get_positions_value()
+    broker.book.recompute_totals()
+    assert value == pytest.approx(broker.book.market_value) == 10 * 110.0 + 5 * 210.0
+
+
+def test_paper_broker_retention_evicts_to_archive(tmp_path):
+    archive = str(tmp_path / "orders.jsonl")
+    broker = PaperBroker(initial_balance=1_000_000,
+                         retention=RetentionPolicy(max_orders=5, max_history=3, archive_path=archive))
+    orders = [broker.place_order("AAPL", OrderSide.BUY, 1, 100.0) for _ in range(20)]
+    rejected = broker.place_order("AAPL", OrderSide.SELL, 1000, 100.0)
+
+    assert rejected.status == OrderStatus.REJECTED
+    assert rejected.order_id not in broker.orders
+    assert len(broker.orders) == 5
+    assert len(broker.trade_history) == 3
+    assert broker.memory_stats()["archived_orders"] == 15
+    # Utkastade ordrar hittas fortfarande via arkivet
+    assert broker.get_order_status(orders[0].order_id) == OrderStatus.FILLED
+    assert broker.get_positions()["AAPL"].quantity == 20
+
+
+def test_paper_broker_evicted_order_without_archive_is_unknown():
+    broker = PaperBroker(initial_balance=100000, retention=RetentionPolicy(max_orders=2))
+    first = broker.place_order("AAPL", OrderSide.BUY, 1, 100.0)
+    for _ in range(3):
+        broker.place_order("AAPL", OrderSide.BUY, 1, 100.0)
+    assert broker.get_order_status(first.order_id) == OrderStatus.UNKNOWN
+    assert broker.get_order_status("99999999") == OrderStatus.CANCELLED
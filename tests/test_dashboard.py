@@ -0,0 +1,225 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DASHBOARD_PASS", "test")
+
+import json
+
+import pytest
+
+from src.brokers.base import OrderSide
+from src.brokers.paper_broker import PaperBroker
+from src.core.engine import TradingEngine
+from src.core.risk import RiskManager
+from src.dashboard import app as dashboard
+from src.dashboard.backend import EmbeddedBackend, StoreBackend
+from src.dashboard.events import EventBuffer, StatePublisher
+from src.dashboard.jobs import BacktestJobs, BacktestRequest
+from src.dashboard.service import BotService
+from src.dashboard.store import StateStore
+from src.strategies.base import BaseStrategy, Signal
+
+
+class _StubFetcher:
+
+    def __init__(self, prices: dict[str, float]):
+        self.prices = prices
+
+    def get_prices_bulk(self, symbols: list[str]) -> dict[str, float]:
+        return {s: self.prices[s] for s in symbols if s in self.prices}
+
+    def get_historical(self, symbol: str, period: str = "3mo", interval: str = "1d"):
+        return None
+
+
+class _AlwaysBuy(BaseStrategy):
+
+    def analyze(self, df, symbol: str) -> Signal:
+        return Signal.BUY
+
+
+def _engine() -> TradingEngine:
+    fetcher = _StubFetcher({"AAPL": 100.0, "TSLA": 200.0})
+    return TradingEngine(PaperBroker(initial_balance=10000), _AlwaysBuy(), RiskManager(max_position_pct=0.2),
+                         fetcher, ["AAPL", "TSLA"])
+
+
+@pytest.fixture
+def client(monkeypatch):
+    backend = EmbeddedBackend(_engine)
+    backend.init_engine()
+    monkeypatch.setattr(dashboard, "backend", backend)
+    monkeypatch.setattr(dashboard.limiter, "enabled", False)
+    dashboard.response_cache.clear()
+    with dashboard.app.test_client() as client:
+        with client.session_transaction() as session:
+            session["authenticated"] = True
+        yield client
+
+
+def _read_events(response, count: int) -> list[tuple[int, str, dict]]:
+    events, chunks = [], iter(response.response)
+    while len(events) < count:
+        chunk = next(chunks)
+        chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+        fields = dict(line.split(": ", 1) for line in chunk.strip().splitlines())
+        events.append((int(fields["id"]), fields["event"], json.loads(fields["data"])))
+    response.close()
+    return events
+
+
+def test_event_buffer_replays_and_detects_gaps():
+    buffer = EventBuffer(maxlen=3)
+    assert buffer.since(0) == []
+    for i in range(5):
+        buffer.publish("status", {"i": i})
+    assert [e.id for e in buffer.since(3)] == [4, 5]
+    assert [e.id for e in buffer.since(2)] == [3, 4, 5]
+    assert buffer.since(1) is None  # Händelse 2 har fallit ur bufferten
+    assert buffer.since(99) is None
+
+
+def test_publisher_emits_deltas_once_per_cycle():
+    engine = _engine()
+    buffer = EventBuffer()
+    publisher = StatePublisher(engine, buffer)
+    engine.cycle_listeners.append(publisher.publish_cycle)
+
+    engine.run_once()
+    types = [e.type for e in buffer.since(0)]
+    assert types == ["trades", "positions", "status"]
+    assert {p["symbol"] for p in buffer.events[1].data["changed"]} == {"AAPL", "TSLA"}
+
+    # Inget ändrat → bara en statustick
+    engine.run_once()
+    assert [e.type for e in buffer.since(3)] == ["status"]
+    assert len(publisher.snapshot().data["trades"]) == 2
+
+
+def test_stream_sends_snapshot_then_resumes_from_last_event_id(client):
+    dashboard.backend.engine.run_once()
+    events = _read_events(client.get("/api/stream"), 1)
+    assert events[0][1] == "snapshot"
+    assert len(events[0][2]["positions"]) == 2
+
+    dashboard.backend.engine.data_fetcher.prices["AAPL"] = 110.0
+    dashboard.backend.engine.run_once()
+    resumed = _read_events(client.get("/api/stream", headers={"Last-Event-ID": str(events[0][0])}), 2)
+    assert [t for _, t, _ in resumed] == ["positions", "status"]
+    assert resumed[0][2]["changed"][0]["current_price"] == 110.0
+
+
+def test_stream_ends_after_max_lifetime_and_resumes(client, monkeypatch):
+    monkeypatch.setattr(dashboard, "STREAM_MAX_SECONDS", 0)
+    dashboard.backend.engine.run_once()
+    body = client.get("/api/stream").get_data(as_text=True)
+    assert body.startswith("id: ") and body.endswith(f"retry: {dashboard.STREAM_RETRY_MS}\n\n")
+    last_id = int(body.split("\n", 1)[0][4:])
+
+    dashboard.backend.engine.data_fetcher.prices["AAPL"] = 110.0
+    dashboard.backend.engine.run_once()
+    resumed = client.get("/api/stream", headers={"Last-Event-ID": str(last_id)}).get_data(as_text=True)
+    assert "event: positions" in resumed and "event: snapshot" not in resumed
+
+
+def test_api_returns_304_until_state_version_changes(client):
+    engine = dashboard.backend.engine
+    engine.run_once()
+    first = client.get("/api/positions")
+    assert first.status_code == 200 and len(first.get_json()) == 2
+    etag = first.headers["ETag"]
+
+    calls = []
+    original = engine.broker.get_positions
+    engine.broker.get_positions = lambda: calls.append(1) or original()
+    again = client.get("/api/positions", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert client.get("/api/positions").status_code == 200
+    assert calls == []  # Både 304 och cacheträff klarar sig utan brokern
+
+    engine.run_once()
+    after = client.get("/api/positions", headers={"If-None-Match": etag})
+    assert after.status_code == 200 and after.headers["ETag"] != etag
+
+
+def test_equity_api_returns_new_points_after_cursor(client):
+    engine = dashboard.backend.engine
+    for _ in range(3):
+        engine.run_once()
+    full = client.get("/api/equity").get_json()
+    assert full["cursor"] == 3 and len(full["points"]) == 3
+
+    engine.run_once()
+    delta = client.get(f"/api/equity?since={full['cursor']}").get_json()
+    assert delta["cursor"] == 4 and len(delta["points"]) == 1
+    assert delta["points"][0]["value"] == round(engine.broker.get_total_value(), 2)
+
+
+def test_bot_service_publishes_to_store_for_other_processes(tmp_path):
+    path = str(tmp_path / "dashboard.db")
+    service = BotService(_engine, StateStore(path), interval_seconds=0)
+    # Dashboardens sida öppnar en egen anslutning, precis som en separat process
+    reader = StoreBackend(StateStore(path), poll_seconds=0.01)
+    assert reader.status()["status"] == "not_initialized"
+
+    assert reader.start() == "start_requested"
+    service.tick()
+    assert service.running
+    status = reader.status()
+    assert status["bot_running"] and status["num_positions"] == 2
+    assert {p["symbol"] for p in reader.positions()} == {"AAPL", "TSLA"}
+    assert [t["symbol"] for t in reader.trades()] == ["TSLA", "AAPL"]
+    page = reader.trade_page(limit=1)
+    assert [t["symbol"] for t in page["trades"]] == ["TSLA"] and page["next_cursor"]
+    assert [t["symbol"] for t in reader.trade_page(cursor=page["next_cursor"])["trades"]] == ["AAPL"]
+    assert reader.trade_page(symbol="AAPL", side=OrderSide.SELL)["trades"] == []
+    assert reader.equity()["cursor"] == 1
+
+    snapshot, version = reader.snapshot(), reader.version()
+    service.engine.data_fetcher.prices["AAPL"] = 97.0
+    service.tick()
+    events = reader.wait(snapshot.id, timeout=1)
+    assert [e.type for e in events] == ["positions", "status"]
+    assert reader.version() != version
+
+    reader.stop()
+    service.tick()
+    assert not service.running and not reader.status()["bot_running"]
+
+
+def test_trades_api_paginates_with_cursor_and_filters(client):
+    engine = dashboard.backend.engine
+    for symbol, side, price, pnl in [("AAPL", OrderSide.BUY, 100, 0), ("TSLA", OrderSide.BUY, 200, 0),
+                                     ("AAPL", OrderSide.SELL, 110, 10), ("TSLA", OrderSide.SELL, 190, -10),
+                                     ("AAPL", OrderSide.BUY, 105, 0)]:
+        engine.portfolio.record_trade(symbol, side, 1, price, pnl)
+
+    first = client.get("/api/trades?limit=2").get_json()
+    assert [t["id"] for t in first["trades"]] == [4, 3]
+    assert first["summary"]["count"] == 2 and first["summary"]["pnl"] == -10
+    second = client.get(f"/api/trades?limit=2&cursor={first['next_cursor']}").get_json()
+    assert [t["id"] for t in second["trades"]] == [2, 1]
+    last = client.get(f"/api/trades?limit=2&cursor={second['next_cursor']}").get_json()
+    assert [t["id"] for t in last["trades"]] == [0] and last["next_cursor"] is None
+
+    sells = client.get("/api/trades?symbol=AAPL&side=sell").get_json()
+    assert [t["price"] for t in sells["trades"]] == [110]
+    assert sells["summary"]["win_rate"] == 100.0
+    assert client.get("/api/trades?cursor=bogus").status_code == 400
+    assert client.get("/api/trades?side=short").status_code == 400
+
+
+def test_backtest_api_validates_and_reports_jobs(client, monkeypatch):
+    jobs = BacktestJobs()
+    monkeypatch.setattr(dashboard, "backtests", jobs)
+    bad = client.post("/api/backtests", json={"strategy": "magic", "symbols": ["AAPL"]})
+    assert bad.status_code == 400 and "magic" in bad.get_json()["error"]
+    assert client.get("/api/backtests/bt-1").status_code == 404
+
+    request = BacktestRequest.from_dict({"strategy": "rsi", "symbols": ["AAPL"], "start": "2023-01-01",
+                                         "end": "2023-06-01"})
+    jobs.results[request.key(jobs.data_config)] = {"return_pct": 1.5, "equity": []}
+    cached = client.post("/api/backtests", json=request.to_dict())
+    assert cached.status_code == 200 and cached.get_json()["cached"]
+    listed = client.get("/api/backtests").get_json()
+    assert listed[0]["summary"] == {"return_pct": 1.5}
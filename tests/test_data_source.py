@@ -0,0 +1,109 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.brokers.paper_broker import PaperBroker
+from src.core.engine import TradingEngine
+from src.core.risk import RiskManager
+from src.data.file_source import FileDataSource
+from src.data.source import lookback_days, period_to_offset
+from src.strategies.base import BaseStrategy, Signal
+
+
+def _ohlcv(days: int = 200, start: float = 100.0) -> pd.DataFrame:
+    index = pd.date_range("2024-01-01", periods=days, freq="D", name="Date")
+    close = start + np.arange(days, dtype=float)
+    return pd.DataFrame({"Open": close, "High": close + 1, "Low": close - 1, "Close": close,
+                         "Volume": np.full(days, 1000.0)}, index=index)
+
+
+def test_period_to_offset():
+    assert period_to_offset("max") is None
+    assert pd.Timestamp("2024-04-01") - period_to_offset("3mo") == pd.Timestamp("2024-01-01")
+    with pytest.raises(ValueError):
+        period_to_offset("3q")
+
+
+def test_file_source_csv_directory_with_replay_cursor(tmp_path):
+    _ohlcv().to_csv(tmp_path / "AAPL.csv")
+    _ohlcv(start=50.0).rename(columns=str.lower).to_csv(tmp_path / "MSFT.csv")
+    source = FileDataSource(str(tmp_path))
+
+    df = source.get_historical("AAPL", period="1mo")
+    assert df.index[-1] == pd.Timestamp("2024-07-18")
+    assert df.index[0] == pd.Timestamp("2024-06-19")
+
+    source.set_time(pd.Timestamp("2024-01-10"))
+    assert source.get_prices_bulk(["AAPL", "MSFT", "NOPE"]) == {"AAPL": 109.0, "MSFT": 59.0}
+    assert len(source.get_historical("MSFT", period="max")) == 10
+    with pytest.raises(ValueError):
+        source.get_historical("AAPL", interval="1h")
+
+
+def test_file_source_loads_lazily_and_caches(tmp_path):
+    for symbol in ("A", "B", "C"):
+        _ohlcv().to_csv(tmp_path / f"{symbol}.csv")
+    source = FileDataSource(str(tmp_path), cache_size=2, cache_dir=str(tmp_path / "cache"))
+    assert source.symbols() == ["A", "B", "C"]
+    assert not source._frames
+
+    source.get_current_price("A")
+    source.get_current_price("B")
+    source.get_current_price("C")
+    assert list(source._frames) == ["B", "C"]
+    assert os.path.exists(tmp_path / "cache" / "A.parquet")
+
+    # Andra läsningen går via Parquet-kopian och ger samma data
+    again = FileDataSource(str(tmp_path), cache_dir=str(tmp_path / "cache"))
+    pd.testing.assert_frame_equal(again.frame("A"), source.frame("A"), check_freq=False)
+
+
+def test_file_source_bulk_parquet_filters_per_symbol(tmp_path):
+    pytest.importorskip("pyarrow")
+    frames = []
+    for i, symbol in enumerate(("AAPL", "TSLA")):
+        df = _ohlcv(start=100.0 * (i + 1)).reset_index()
+        df["symbol"] = symbol
+        frames.append(df)
+    path = tmp_path / "bulk.parquet"
+    pd.concat(frames).to_parquet(path, index=False)
+
+    source = FileDataSource(str(path))
+    assert source.symbols() == ["AAPL", "TSLA"]
+    df = source.get_historical("TSLA", period="max")
+    assert len(df) == 200 and df["Close"].iloc[0] == 200.0
+    assert list(df.columns) == ["Open", "High", "Low", "Close", "Volume"]
+
+
+class _BuyAfterFiveBars(BaseStrategy):
+
+    def analyze(self, df, symbol: str) -> Signal:
+        return Signal.BUY if len(df) >= 5 else Signal.HOLD
+
+
+def test_engine_runs_offline_on_file_source(tmp_path):
+    _ohlcv().to_csv(tmp_path / "AAPL.csv")
+    source = FileDataSource(str(tmp_path), as_of=pd.Timestamp("2024-01-03"))
+    broker = PaperBroker(initial_balance=10000)
+    engine = TradingEngine(broker, _BuyAfterFiveBars(), RiskManager(), source, ["AAPL"])
+    engine.run_once()
+    assert not broker.get_positions()
+
+    source.set_time(pd.Timestamp("2024-01-05"))
+    engine.run_once()
+    assert broker.get_positions()["AAPL"].avg_price == 104.0
+
+
+def test_get_recent_slices_only_the_lookback(tmp_path):
+    _ohlcv().to_csv(tmp_path / "AAPL.csv")
+    source = FileDataSource(str(tmp_path), as_of=pd.Timestamp("2024-03-01"))
+    df = source.get_recent("AAPL", 15)
+    assert len(df) == 15 and df.index[-1] == pd.Timestamp("2024-03-01")
+
+    # Kalenderfönstret som skickas till nätverkskällor rymmer alltid lookbacken
+    assert lookback_days(78, "1d") >= 78 * 7 / 5
+    assert lookback_days(390, "1m") < 10
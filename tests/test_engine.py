@@ -2,10 +2,20 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.brokers.base import OrderSide
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.brokers.base import OrderSide, OrderStatus, Position
+from src.brokers.matching import SimulationConfig
 from src.brokers.paper_broker import PaperBroker
+from src.core.engine import TradingEngine
+from src.core.ledger import TradeLedger
 from src.core.portfolio import Portfolio
-from src.core.risk import RiskManager
+from src.core.risk import AccountSnapshot, OrderCandidate, RiskManager
+from src.core.stop_monitor import StopMonitor
+from src.strategies.base import BaseStrategy, Signal
 
 
 def test_risk_manager_blocks_large_position():
@@ -52,3 +62,275 @@ def test_portfolio_win_rate():
     portfolio.record_trade("AAPL", OrderSide.SELL, 10, 120.0, pnl=200.0)
     portfolio.record_trade("TSLA", OrderSide.SELL, 5, 80.0, pnl=-100.0)
     assert portfolio.get_win_rate() == 0.5
+
+
+def test_portfolio_aggregates_match_full_scan():
+    random.seed(7)
+    portfolio = Portfolio()
+    for i in range(500):
+        side = OrderSide.SELL if i % 3 else OrderSide.BUY
+        pnl = random.uniform(-50, 50) if side == OrderSide.SELL else 0.0
+        portfolio.record_trade(random.choice(["AAPL", "TSLA", "MSFT"]), side, 1, 100.0, pnl)
+
+    # Verifiering mot de gamla listskanningarna
+    records = portfolio.trade_records
+    sells = [t for t in records if t.side == OrderSide.SELL]
+    today = datetime.now().date()
+    assert portfolio.get_total_pnl() == pytest.approx(sum(t.pnl for t in records))
+    assert portfolio.get_daily_pnl() == pytest.approx(sum(t.pnl for t in records if t.timestamp.date() == today))
+    assert portfolio.get_win_rate() == sum(1 for t in sells if t.pnl > 0) / len(sells)
+    stats = portfolio.get_symbol_stats("AAPL")
+    assert stats.trades == sum(1 for t in records if t.symbol == "AAPL")
+    assert stats.pnl == pytest.approx(sum(t.pnl for t in records if t.symbol == "AAPL"))
+
+
+def test_risk_manager_batch_ranks_and_limits():
+    risk = RiskManager(max_position_pct=0.10, max_open_positions=3)
+    snapshot = AccountSnapshot(cash=25000, positions={"AAPL": Position("AAPL", 10, 100.0, 100.0)})
+    candidates = [
+        OrderCandidate("AAPL", 100.0, score=5),
+        OrderCandidate("TSLA", 200.0, score=1),
+        OrderCandidate("MSFT", 300.0, score=3),
+        OrderCandidate("GOOGL", 100.0, score=2),
+    ]
+    approved = risk.evaluate_batch(snapshot, candidates)
+    # AAPL ägs redan, max 3 positioner → två bästa nya köp
+    assert [(c.symbol, q) for c, q in approved] == [("MSFT", 8), ("GOOGL", 26)]
+
+
+def test_risk_manager_batch_respects_cash():
+    risk = RiskManager(max_position_pct=0.5)
+    snapshot = AccountSnapshot(cash=1000, positions={"AAPL": Position("AAPL", 10, 100.0, 100.0)})
+    approved = risk.evaluate_batch(snapshot, [OrderCandidate("TSLA", 100.0), OrderCandidate("MSFT", 100.0)])
+    assert [(c.symbol, q) for c, q in approved] == [("TSLA", 10)]
+
+
+def test_risk_manager_daily_loss_halt():
+    risk = RiskManager(daily_loss_limit_pct=0.03)
+    day = datetime(2024, 1, 2, 9, 0)
+    risk.update_daily_pnl(100000, now=day)
+    risk.update_daily_pnl(98000, now=day.replace(hour=11))
+    assert not risk.halted
+    risk.update_daily_pnl(96900, now=day.replace(hour=12))
+    assert risk.halted
+    assert risk.evaluate_batch(AccountSnapshot(cash=96900), [OrderCandidate("AAPL", 10.0)]) == []
+    broker = PaperBroker(initial_balance=100000)
+    can_buy, _ = risk.can_open_position(broker, "AAPL", 10.0, 1)
+    assert not can_buy
+    # Ny dag nollställer stoppet
+    risk.update_daily_pnl(96900, now=day.replace(day=3))
+    assert not risk.halted
+
+
+class _StubFetcher:
+
+    def __init__(self, prices: dict[str, float]):
+        self.prices = prices
+
+    def get_prices_bulk(self, symbols: list[str]) -> dict[str, float]:
+        return {s: self.prices[s] for s in symbols if s in self.prices}
+
+    def get_historical(self, symbol: str, period: str = "3mo", interval: str = "1d"):
+        return None
+
+
+class _AlwaysBuy(BaseStrategy):
+
+    def analyze(self, df, symbol: str) -> Signal:
+        return Signal.BUY
+
+
+class _AlwaysSell(BaseStrategy):
+
+    def analyze(self, df, symbol: str) -> Signal:
+        return Signal.SELL
+
+
+def test_engine_run_once_batches_buys():
+    broker = PaperBroker(initial_balance=10000)
+    risk = RiskManager(max_position_pct=0.4, max_open_positions=2)
+    fetcher = _StubFetcher({"AAPL": 100.0, "TSLA": 200.0, "MSFT": 50.0})
+    engine = TradingEngine(broker, _AlwaysBuy(), risk, fetcher, ["AAPL", "TSLA", "MSFT"])
+    engine.run_once()
+    positions = broker.get_positions()
+    assert set(positions) == {"AAPL", "TSLA"}
+    assert positions["AAPL"].quantity == 40
+    assert engine.portfolio.get_trade_count() == 2
+
+
+def test_engine_stop_flushes_ledger(tmp_path):
+    broker = PaperBroker(initial_balance=10000)
+    ledger = TradeLedger(chunk_size=4, spill_dir=str(tmp_path))
+    engine = TradingEngine(broker, _AlwaysBuy(), RiskManager(max_position_pct=0.4), _StubFetcher({"AAPL": 100.0}),
+                           ["AAPL"], portfolio=Portfolio(ledger=ledger))
+    engine.run_once()
+    engine.stop()
+    assert len(TradeLedger.from_config({"spill_dir": str(tmp_path)})) == 1
+
+
+def test_stop_monitor_trailing_stop():
+    broker = PaperBroker(initial_balance=10000)
+    broker.place_order("AAPL", OrderSide.BUY, 10, 100.0)
+    fetcher = _StubFetcher({"AAPL": 100.0})
+    portfolio = Portfolio()
+    monitor = StopMonitor(broker, fetcher, portfolio, stop_loss_pct=0.05, trailing_stop_pct=0.03)
+
+    for price in (104.0, 110.0, 108.0):
+        fetcher.prices["AAPL"] = price
+        assert monitor.poll() == []
+    assert monitor.high_water["AAPL"] == 110.0
+
+    # 110 * 0.97 = 106.7 → trailing stop utlöses
+    fetcher.prices["AAPL"] = 106.5
+    assert monitor.poll() == ["AAPL"]
+    assert "AAPL" not in broker.get_positions()
+    assert portfolio.get_total_pnl() == pytest.approx(65.0)
+
+
+class _Hold(BaseStrategy):
+
+    def analyze(self, df, symbol: str) -> Signal:
+        return Signal.HOLD
+
+
+def test_engine_defers_stop_loss_to_running_monitor(monkeypatch):
+    broker = PaperBroker(initial_balance=10000)
+    broker.place_order("AAPL", OrderSide.BUY, 10, 100.0)
+    fetcher = _StubFetcher({"AAPL": 90.0})
+    engine = TradingEngine(broker, _Hold(), RiskManager(stop_loss_pct=0.05), fetcher, ["AAPL"])
+    monitor = engine.attach_stop_monitor(interval_seconds=60)
+    # Övervakaren kör men säljer inget, så en försäljning här kan bara komma från motorn
+    monkeypatch.setattr(monitor, "poll", lambda: [])
+    monitor.start()
+    try:
+        engine.run_once()
+        assert "AAPL" in broker.get_positions()
+    finally:
+        engine.stop()
+
+    # Utan aktiv övervakare sköter motorn stop-loss själv
+    engine.run_once()
+    assert "AAPL" not in broker.get_positions()
+    assert engine.portfolio.get_trade_count() == 1
+
+
+def test_engine_sell_rereads_position_under_lock():
+    broker = PaperBroker(initial_balance=10000)
+    broker.place_order("AAPL", OrderSide.BUY, 10, 100.0)
+    engine = TradingEngine(broker, _Hold(), RiskManager(), _StubFetcher({"AAPL": 100.0}), ["AAPL"])
+    snapshot = engine.risk_manager.snapshot(broker)
+    # StopMonitor hinner sälja mellan motorns avläsning och dess säljorder
+    broker.place_order("AAPL", OrderSide.SELL, 10, 95.0)
+    placed = []
+    place_order = broker.place_order
+    broker.place_order = lambda *args: placed.append(args) or place_order(*args)
+
+    engine._execute_signal(Signal.SELL, "AAPL", 100.0, snapshot, [])
+    assert placed == []
+
+
+def test_stop_monitor_rereads_position_under_lock():
+    broker = PaperBroker(initial_balance=10000)
+    broker.place_order("AAPL", OrderSide.BUY, 10, 100.0)
+    monitor = StopMonitor(broker, _StubFetcher({"AAPL": 100.0}), Portfolio(), stop_loss_pct=0.05)
+    monitor.refresh_positions()
+    # Motorn säljer positionen efter att övervakaren tagit sin ögonblicksbild
+    broker.place_order("AAPL", OrderSide.SELL, 10, 100.0)
+    placed = []
+    place_order = broker.place_order
+    broker.place_order = lambda *args: placed.append(args) or place_order(*args)
+
+    assert not monitor.on_price("AAPL", 80.0)
+    assert placed == []
+    assert "AAPL" not in monitor.positions
+
+
+def test_engine_books_fills_that_arrive_after_place_order():
+    broker = PaperBroker(initial_balance=10000, simulation=SimulationConfig(latency_seconds=1))
+    engine = TradingEngine(broker, _AlwaysBuy(), RiskManager(max_position_pct=0.5), _StubFetcher({"AAPL": 100.0}),
+                           ["AAPL"])
+    engine.run_once()
+    assert engine.portfolio.get_trade_count() == 0
+
+    # Market-ordern vilar tills latensen passerat och fylls på nästa tick
+    broker.process_tick("AAPL", 101.0, timestamp=datetime.now() + timedelta(seconds=5))
+    assert broker.get_positions()["AAPL"].quantity == 50
+    assert engine.portfolio.get_trade_count() == 1
+
+    order = broker.place_limit_order("AAPL", OrderSide.SELL, 50, 110.0, timestamp=datetime.now())
+    broker.process_tick("AAPL", 112.0, timestamp=datetime.now() + timedelta(seconds=5))
+    assert broker.get_order_status(order.order_id) == OrderStatus.FILLED
+    assert engine.portfolio.get_trade_count() == 2
+    # Limit-säljet fylls till tickens bättre pris
+    assert engine.portfolio.total_pnl == pytest.approx((112.0 - 101.0) * 50)
+
+
+
+class _TimeoutBroker(PaperBroker):
+    # Första ordern når brokern men svaret uteblir; get_order_status visar att den fylldes
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.lost: dict[str, OrderStatus] = {}
+
+    def place_order(self, symbol, side, quantity, price):
+        order = super().place_order(symbol, side, quantity, price)
+        if not self.lost:
+            self.lost[order.order_id] = order.status
+            order.status = OrderStatus.UNKNOWN
+        return order
+
+    def get_order_status(self, order_id):
+        return self.lost.get(order_id) or super().get_order_status(order_id)
+
+
+def test_engine_reconciles_orders_with_unknown_outcome():
+    broker = _TimeoutBroker(initial_balance=10000)
+    engine = TradingEngine(broker, _AlwaysSell(), RiskManager(max_position_pct=0.5), _StubFetcher({"AAPL": 100.0}),
+                           ["AAPL"])
+    engine._execute_buys([OrderCandidate("AAPL", 100.0)])
+    assert engine.portfolio.get_trade_count() == 0
+    assert "AAPL" in engine._unresolved
+    engine._execute_signal(Signal.SELL, "AAPL", 100.0, engine.risk_manager.snapshot(broker), [])
+    assert broker.get_positions()["AAPL"].quantity == 50
+
+    # Symbolen handlas inte förrän ordern stämts av; avstämningen bokför köpet före säljsignalen
+    engine.run_once()
+    assert engine._unresolved == {}
+    assert [t.side for t in engine.portfolio.trade_records] == [OrderSide.BUY, OrderSide.SELL]
+    assert "AAPL" not in broker.get_positions()
+
+def test_engine_books_trades_at_slipped_fill_price():
+    broker = PaperBroker(initial_balance=10000, simulation=SimulationConfig(slippage_bps=100))
+    fetcher = _StubFetcher({"AAPL": 100.0})
+    engine = TradingEngine(broker, _AlwaysBuy(), RiskManager(max_position_pct=0.2), fetcher, ["AAPL"])
+    engine.run_once()
+    buy = engine.portfolio.trade_records[0]
+    assert buy.price == pytest.approx(101.0)
+    assert broker.cash == pytest.approx(10000 - buy.quantity * 101.0)
+
+    engine.strategy = _AlwaysSell()
+    engine.run_once()
+    sell = engine.portfolio.trade_records[-1]
+    assert sell.price == pytest.approx(99.0)
+    assert engine.portfolio.total_pnl == pytest.approx((99.0 - 101.0) * buy.quantity)
+
+
+class _ScoredBuy(BaseStrategy):
+
+    def __init__(self, scores: dict[str, float]):
+        self.scores = scores
+
+    def analyze(self, df, symbol: str) -> Signal:
+        self.last_score = self.scores[symbol]
+        return Signal.BUY
+
+
+def test_engine_ranks_buys_by_strategy_score_when_capacity_is_short():
+    broker = PaperBroker(initial_balance=10000)
+    risk = RiskManager(max_position_pct=0.2, max_open_positions=2)
+    fetcher = _StubFetcher({"AAPL": 100.0, "TSLA": 200.0, "MSFT": 50.0})
+    strategy = _ScoredBuy({"AAPL": 1.0, "TSLA": 3.0, "MSFT": 2.0})
+    engine = TradingEngine(broker, strategy, risk, fetcher, ["AAPL", "TSLA", "MSFT"])
+    engine.run_once()
+    assert set(broker.get_positions()) == {"TSLA", "MSFT"}
@@ -0,0 +1,54 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from src.core.equity import EquitySeries, lttb
+
+T0 = datetime(2024, 1, 1)
+
+
+def test_lttb_keeps_endpoints_and_extremes():
+    x = np.arange(10000, dtype=float)
+    y = np.sin(x / 500)
+    y[4321] = 5.0  # Kortvarig topp som måste synas i den nedsamplade kurvan
+    keep = lttb(x, y, 200)
+    assert len(keep) == 200
+    assert keep[0] == 0 and keep[-1] == 9999
+    assert np.all(np.diff(keep) > 0)
+    assert 4321 in keep
+
+
+def test_equity_series_cursor_and_time_window():
+    equity = EquitySeries(capacity=4)
+    for i in range(100):
+        equity.append(100000.0 + i, T0 + timedelta(minutes=i))
+    assert len(equity) == 100
+
+    times, values = equity.window(since=95)
+    assert list(values) == [100095.0, 100096.0, 100097.0, 100098.0, 100099.0]
+
+    times, values = equity.window(start=T0 + timedelta(minutes=10), end=T0 + timedelta(minutes=19))
+    assert len(values) == 10 and values[0] == 100010.0
+
+    times, values = equity.downsample(20)
+    assert len(values) == 20 and values[-1] == 100099.0
+
+
+def test_equity_series_max_points_compacts_and_keeps_cursor():
+    series = EquitySeries(capacity=8, max_points=100)
+    for i in range(1000):
+        series.append(float(i), T0 + timedelta(minutes=i))
+    cursor = len(series)
+    series.append(1000.0, T0 + timedelta(minutes=1000))
+
+    assert cursor == 1000
+    assert series.size <= 100
+    times, values = series.window(since=cursor)
+    assert values.tolist() == [1000.0]
+    # Första och senaste punkten finns kvar efter utglesning
+    times, values = series.window()
+    assert values[0] == 0.0 and values[-1] == 1000.0
@@ -0,0 +1,91 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from src.brokers.base import OrderSide
+from src.core.ledger import TradeLedger, utc_now
+from src.core.portfolio import Portfolio
+
+
+def _fill(ledger: TradeLedger, n: int, start: datetime):
+    symbols = ["AAPL", "TSLA", "MSFT"]
+    for i in range(n):
+        side = OrderSide.SELL if i % 2 else OrderSide.BUY
+        ledger.append(symbols[i % 3], side, i + 1, 100.0 + i, float(i), start + timedelta(minutes=i))
+
+
+def test_ledger_slices_across_chunks():
+    ledger = TradeLedger(chunk_size=4)
+    _fill(ledger, 10, datetime(2024, 1, 1))
+    assert len(ledger) == 10
+    assert list(ledger.column("quantity", 2, 7)) == [3, 4, 5, 6, 7]
+    tail = ledger.tail(3)
+    assert list(tail["pnl"]) == [7.0, 8.0, 9.0]
+    assert ledger.sides(tail["side"]) == [OrderSide.SELL, OrderSide.BUY, OrderSide.SELL]
+
+
+def test_ledger_time_range_and_symbol_index():
+    start = datetime(2024, 1, 1)
+    ledger = TradeLedger(chunk_size=4)
+    _fill(ledger, 10, start)
+    lo, hi = ledger.time_range(start + timedelta(minutes=3), start + timedelta(minutes=8))
+    assert (lo, hi) == (3, 9)
+    assert ledger.time_range(start + timedelta(days=1)) == (10, 10)
+
+    rows = ledger.rows_for_symbol("TSLA")
+    assert list(rows) == [1, 4, 7]
+    taken = ledger.take(rows)
+    assert list(taken["price"]) == [101.0, 104.0, 107.0]
+
+
+def test_ledger_spills_and_reloads(tmp_path):
+    start = datetime(2024, 1, 1)
+    ledger = TradeLedger(chunk_size=4, spill_dir=str(tmp_path), max_chunks_in_memory=1)
+    _fill(ledger, 10, start)
+    assert ledger.chunks[0].spilled and ledger.chunks[1].spilled
+    assert isinstance(ledger.chunks[0].columns["pnl"], np.memmap)
+    assert list(ledger.column("pnl", 2, 6)) == [2.0, 3.0, 4.0, 5.0]
+
+    ledger.flush()
+    reloaded = TradeLedger.load(str(tmp_path))
+    assert len(reloaded) == 10
+    assert list(reloaded.rows_for_symbol("MSFT")) == [2, 5, 8]
+    reloaded.append("AAPL", OrderSide.BUY, 1, 1.0, 0.0, start + timedelta(hours=1))
+    assert len(reloaded) == 11
+    assert reloaded.time_range(start + timedelta(minutes=30)) == (10, 11)
+
+
+def test_ledger_query_pages_newest_first_with_filters():
+    start = datetime(2024, 1, 1)
+    ledger = TradeLedger(chunk_size=4)
+    _fill(ledger, 10, start)
+    assert list(ledger.query(limit=4)) == [9, 8, 7, 6]
+    assert list(ledger.query(before=6, limit=4)) == [5, 4, 3, 2]
+    assert list(ledger.query(symbol="AAPL", side=OrderSide.SELL)) == [9, 3]
+    assert list(ledger.query(side=OrderSide.BUY, end=start + timedelta(minutes=5), limit=2)) == [4, 2]
+    assert list(ledger.query(symbol="TSLA", start=start + timedelta(minutes=2), before=7)) == [4]
+    assert len(ledger.query(symbol="NVDA")) == 0
+
+
+def test_portfolio_reopens_ledger_from_config(tmp_path):
+    config = {"chunk_size": 4, "spill_dir": str(tmp_path), "max_chunks_in_memory": 1}
+    portfolio = Portfolio(ledger=TradeLedger.from_config(config))
+    before = utc_now()
+    for i in range(6):
+        portfolio.record_trade("AAPL" if i % 2 else "TSLA", OrderSide.SELL, 1, 10.0, float(i - 1))
+    portfolio.flush()
+    stored = portfolio.ledger.column("timestamp")
+    assert stored[0] >= np.datetime64(before - timedelta(seconds=1))
+    assert stored[-1] <= np.datetime64(utc_now() + timedelta(seconds=1))
+
+    reopened = Portfolio(ledger=TradeLedger.from_config(config))
+    assert len(reopened.ledger) == 6
+    assert reopened.total_pnl == portfolio.total_pnl
+    assert (reopened.sell_count, reopened.win_count) == (6, 4)
+    assert reopened.symbol_stats["AAPL"].pnl == portfolio.symbol_stats["AAPL"].pnl
+    assert reopened.get_daily_pnl() == portfolio.get_daily_pnl()
+    assert reopened.get_records(0, 1)[0].timestamp.date() == datetime.now().date()
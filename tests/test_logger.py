@@ -0,0 +1,39 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import logging
+
+import pandas as pd
+
+from src.brokers.base import OrderSide
+from src.strategies.rsi_strategy import RSIStrategy
+from src.utils.logger import log_trade, setup_logger, shutdown_logger
+
+
+def test_trades_and_signals_go_to_separate_json_streams(tmp_path):
+    trade_log, signal_log, log_file = tmp_path / "trades.log", tmp_path / "signals.log", tmp_path / "bot.log"
+    logger = setup_logger(trade_log=str(trade_log), signal_log=str(signal_log), log_file=str(log_file))
+    try:
+        logger.info("Vanlig rad")
+        logger.error("Ett fel")
+        log_trade("KÖPT", "42", "AAPL", OrderSide.BUY, 10, 101.5, strategy="RSIStrategy")
+        falling = pd.DataFrame({"Close": [100 - i for i in range(30)]})
+        assert RSIStrategy().analyze(falling, "TSLA").value == "buy"
+    finally:
+        shutdown_logger()
+    assert not logging.getLogger("trading-bot").handlers
+
+    trades = [json.loads(line) for line in trade_log.read_text().splitlines()]
+    assert len(trades) == 1
+    assert trades[0]["order_id"] == "42" and trades[0]["side"] == "buy" and trades[0]["price"] == 101.5
+    assert trades[0]["message"] == "KÖPT 10 st AAPL @ 101.50 (P&L: +0.00)"
+    signals = [json.loads(line) for line in signal_log.read_text().splitlines()]
+    assert [(s["symbol"], s["signal"], s["strategy"]) for s in signals] == [("TSLA", "buy", "RSIStrategy")]
+    assert signals[0]["rsi"] < 30
+
+    # Den allmänna loggen får allt, även rader som inte hör till någon JSON-ström
+    general = log_file.read_text()
+    assert "[INFO] Vanlig rad" in general and "[ERROR] Ett fel" in general
+    assert "KÖPT 10 st AAPL" in general
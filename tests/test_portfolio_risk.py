@@ -0,0 +1,78 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.brokers.base import Position
+from src.brokers.paper_broker import PaperBroker
+from src.core.engine import TradingEngine
+from src.core.portfolio_risk import PortfolioRiskModel, RollingCovariance
+from src.core.risk import AccountSnapshot, OrderCandidate, RiskManager
+from src.strategies.base import BaseStrategy, Signal
+
+
+def _price_paths(n_bars: int, seed: int = 1) -> dict[str, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    market = rng.normal(0, 0.01, n_bars)
+    returns = {
+        "AAPL": market + rng.normal(0, 0.002, n_bars),
+        "MSFT": market + rng.normal(0, 0.002, n_bars),
+        "GLD": rng.normal(0, 0.01, n_bars),
+    }
+    return {s: 100 * np.cumprod(1 + r) for s, r in returns.items()}
+
+
+def test_rolling_covariance_matches_full_recompute():
+    paths = _price_paths(150)
+    cov = RollingCovariance(list(paths), window=40)
+    for i in range(150):
+        cov.update({s: p[i] for s, p in paths.items()})
+        if i in (50, 77, 149):
+            expected = np.cov(cov.returns[:cov.count].T)
+            assert np.allclose(cov.covariance(), expected)
+
+
+def test_correlated_entry_is_scaled_down():
+    paths = _price_paths(80)
+    model = PortfolioRiskModel(list(paths), window=60, correlation_threshold=0.5, min_scale=0.25)
+    for i in range(80):
+        model.update({s: p[i] for s, p in paths.items()})
+
+    positions = {"AAPL": Position("AAPL", 100, 100.0, 100.0)}
+    weights = model.weights(positions, 100000)
+    assert model.size_multiplier("MSFT", weights) < 0.5
+    assert model.size_multiplier("GLD", weights) == 1.0
+    assert model.value_at_risk(weights, 100000) > 0
+
+    risk = RiskManager(max_position_pct=0.10, portfolio_risk=model)
+    snapshot = AccountSnapshot(cash=90000, positions=positions)
+    approved = dict((c.symbol, q) for c, q in risk.evaluate_batch(
+        snapshot, [OrderCandidate("MSFT", 100.0), OrderCandidate("GLD", 100.0)]))
+    assert approved["GLD"] == 100
+    assert approved["MSFT"] == pytest.approx(100 * model.size_multiplier("MSFT", weights), abs=1)
+
+
+class _Hold(BaseStrategy):
+
+    def analyze(self, df, symbol: str) -> Signal:
+        return Signal.HOLD
+
+
+def test_engine_on_bar_updates_covariance_per_cross_section():
+    paths = _price_paths(80)
+    model = PortfolioRiskModel(list(paths), window=60)
+    engine = TradingEngine(PaperBroker(), _Hold(), RiskManager(portfolio_risk=model), None, list(paths))
+    reference = RollingCovariance(list(paths), window=60)
+    times = pd.date_range("2024-01-02 09:30", periods=80, freq="5min")
+    for i, bar_time in enumerate(times):
+        for symbol, path in paths.items():
+            engine.on_bar(symbol, pd.DataFrame({"Close": [path[i]]}, index=[bar_time]))
+
+    # Senaste bartiden skickas först när nästa börjar
+    for i in range(79):
+        reference.update({s: p[i] for s, p in paths.items()})
+    assert model.cov.count == reference.count
+    assert np.allclose(model.cov.covariance(), reference.covariance())
@@ -0,0 +1,41 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import subprocess
+from importlib.metadata import EntryPoint
+
+import pytest
+
+from src.strategies.base import BaseStrategy, Signal
+from src.utils import registry
+from src.utils.registry import STRATEGIES, Registry
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_main_imports_no_strategy_or_broker_sdk_up_front():
+    code = ("import sys, src.main; "
+            "print(sorted(m for m in ('ta', 'yfinance', 'alpaca_trade_api', 'binance', 'avanza', "
+            "'src.strategies.rsi_strategy') if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "[]"
+
+
+def test_registry_loads_builtins_lazily_and_discovers_plugins(monkeypatch):
+    monkeypatch.setattr(registry, "entry_points", lambda group: [
+        EntryPoint("plugin", "src.strategies.momentum_strategy:MomentumStrategy", group)])
+    strategies = Registry("strategi", "trading_bot.strategies",
+                          {"rsi": "src.strategies.rsi_strategy:RSIStrategy"})
+    assert strategies.names() == ["rsi", "plugin"]
+    assert strategies.get("plugin").__name__ == "MomentumStrategy"
+
+    @strategies.register("always")
+    class _Always(BaseStrategy):
+        def analyze(self, df, symbol: str) -> Signal:
+            return Signal.BUY
+
+    assert strategies.get("always") is _Always
+    with pytest.raises(ValueError, match="Okänd strategi"):
+        strategies.get("magic")
+    assert STRATEGIES.get("rsi")().period == 14
@@ -0,0 +1,62 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from src.brokers.paper_broker import PaperBroker
+from src.core.engine import TradingEngine
+from src.core.risk import RiskManager
+from src.core.session import SessionDivergence, SessionPlayer, SessionRecorder, replay_session
+from src.dashboard.events import EventBuffer, StatePublisher
+from src.data.synthetic import SyntheticSource
+from src.strategies.rsi_strategy import RSIStrategy
+
+
+def _record(path: str, cycles: int = 8, publish: bool = False) -> PaperBroker:
+    source = SyntheticSource(symbols=30, bars=80 + cycles, seed=4)
+    source.set_cursor(80)
+    broker = PaperBroker(initial_balance=100000)
+    engine = TradingEngine(broker, RSIStrategy(oversold=45, overbought=55), RiskManager(), source, source.symbols)
+    SessionRecorder(path).attach(engine)
+    if publish:
+        # Dashboardens publicering läser brokern i samma tråd efter varje cykel
+        engine.cycle_listeners.append(StatePublisher(engine, EventBuffer()).publish_cycle)
+    for _ in range(cycles):
+        engine.run_once()
+        source.advance()
+    return broker
+
+
+def test_session_replay_reproduces_orders(tmp_path):
+    path = str(tmp_path / "bot.session")
+    broker = _record(path)
+    assert broker.trade_history
+
+    player = SessionPlayer(path)
+    summary = player.run()
+    assert summary["cycles"] == 8
+    replayed = [(o.order_id, o.symbol, o.side, o.quantity, o.price) for o in player.orders]
+    recorded = [(o.order_id, o.symbol, o.side, o.quantity, o.price) for o in broker.trade_history]
+    assert replayed == recorded
+    assert replay_session(path, max_cycles=3)["cycles"] == 3
+
+
+def test_session_replay_detects_divergence(tmp_path):
+    path = str(tmp_path / "bot.session")
+    _record(path)
+
+    player = SessionPlayer(path)
+    player.engine.strategy.oversold = 99
+    with pytest.raises(SessionDivergence):
+        player.run()
+
+
+def test_session_replay_ignores_cycle_listeners(tmp_path):
+    path = str(tmp_path / "bot.session")
+    broker = _record(path, publish=True)
+
+    player = SessionPlayer(path)
+    player.run()
+    assert len(player.orders) == len(broker.trade_history)
+
@@ -56,3 +56,27 @@ def test_macd_hold_on_short_data():
     strategy = MACDStrategy()
     df = _make_df([100.0] * 20)
     assert strategy.analyze(df, "TEST") == Signal.HOLD
+
+
+def test_lookback_includes_ema_warmup():
+    assert BollingerStrategy(period=20).lookback == 21
+    assert MomentumStrategy(long_window=30).lookback == 31
+    assert RSIStrategy(period=14).lookback > 15
+    assert MACDStrategy().lookback > 35
+
+
+def test_indicators_converge_within_lookback():
+    import ta
+    rng = np.random.default_rng(7)
+    prices = list(100 + rng.normal(0, 1, 1000).cumsum())
+    close = pd.Series(prices)
+
+    rsi = RSIStrategy(period=14)
+    full = ta.momentum.RSIIndicator(close, window=14).rsi().iloc[-1]
+    trimmed = ta.momentum.RSIIndicator(close.iloc[-rsi.lookback:], window=14).rsi().iloc[-1]
+    assert abs(full - trimmed) < 1.0
+
+    macd = MACDStrategy()
+    full = ta.trend.MACD(close).macd_signal().iloc[-1]
+    trimmed = ta.trend.MACD(close.iloc[-macd.lookback:]).macd_signal().iloc[-1]
+    assert abs(full - trimmed) < 0.05 * close.std()
@@ -0,0 +1,103 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+from datetime import datetime, timedelta
+
+from src.brokers.base import OrderSide
+from src.brokers.paper_broker import PaperBroker
+from src.core.engine import TradingEngine
+from src.core.risk import RiskManager
+from src.data.streaming import BarAggregator, ReplayTickSource, SocketTickSource, StreamingPipeline, Tick
+from src.strategies.base import BaseStrategy, Signal
+
+T0 = datetime(2024, 1, 2, 9, 30)
+
+
+def _write_ticks(path, rows):
+    with open(path, "w") as f:
+        f.write("timestamp,symbol,price,volume\n")
+        for seconds, symbol, price, volume in rows:
+            f.write(f"{(T0 + timedelta(seconds=seconds)).isoformat()},{symbol},{price},{volume}\n")
+
+
+def test_bar_aggregator_builds_ohlcv():
+    agg = BarAggregator(timedelta(minutes=1))
+    for seconds, price, volume in [(0, 100, 1), (10, 105, 2), (20, 98, 3), (59, 101, 4)]:
+        assert agg.add(Tick("AAPL", price, volume, T0 + timedelta(seconds=seconds))) == []
+
+    closed = agg.add(Tick("AAPL", 102, 1, T0 + timedelta(seconds=61)))
+    assert len(closed) == 1
+    bar = closed[0]
+    assert (bar.open, bar.high, bar.low, bar.close, bar.volume) == (100, 105, 98, 101, 10)
+    assert bar.start == T0 and bar.end == T0 + timedelta(minutes=1)
+
+
+def test_bar_aggregator_watermark_closes_quiet_symbols():
+    agg = BarAggregator(timedelta(minutes=1))
+    agg.add(Tick("AAPL", 100, 1, T0))
+    agg.add(Tick("TSLA", 200, 1, T0 + timedelta(seconds=5)))
+    # En tick för en annan symbol i nästa minut stänger även AAPL:s bar
+    closed = agg.add(Tick("MSFT", 50, 1, T0 + timedelta(seconds=70)))
+    assert {b.symbol for b in closed} == {"AAPL", "TSLA"}
+    assert set(agg.open_bars) == {"MSFT"}
+
+
+def test_replay_pipeline_evaluates_only_closed_symbol(tmp_path):
+    path = tmp_path / "ticks.csv"
+    _write_ticks(path, [(0, "AAPL", 100, 1), (30, "TSLA", 200, 1), (65, "AAPL", 101, 1), (200, "AAPL", 99, 1)])
+    calls = []
+    pipeline = StreamingPipeline(ReplayTickSource(str(path)), lambda s, df: calls.append((s, len(df))))
+    asyncio.run(pipeline.run())
+    assert calls == [("AAPL", 1), ("TSLA", 1), ("AAPL", 2), ("AAPL", 3)]
+    assert list(pipeline.history.to_frame("AAPL")["Close"]) == [100, 101, 99]
+
+
+def test_socket_tick_source_reads_lines():
+    async def scenario():
+        async def serve(reader, writer):
+            for i in range(3):
+                writer.write(f"{(T0 + timedelta(seconds=i)).isoformat()},AAPL,{100 + i},1\n".encode())
+            writer.write(b"trasig rad\n")
+            await writer.drain()
+            writer.close()
+
+        server = await asyncio.start_server(serve, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            return [t async for t in SocketTickSource("127.0.0.1", port).ticks()]
+
+    ticks = asyncio.run(scenario())
+    assert [t.price for t in ticks] == [100, 101, 102]
+
+
+class _BuyOnSecondBar(BaseStrategy):
+
+    def analyze(self, df, symbol: str) -> Signal:
+        return Signal.BUY if len(df) >= 2 else Signal.HOLD
+
+
+def test_engine_trades_on_bar_close(tmp_path):
+    path = tmp_path / "ticks.csv"
+    _write_ticks(path, [(0, "AAPL", 100, 1), (61, "AAPL", 110, 1), (125, "AAPL", 111, 1)])
+    broker = PaperBroker(initial_balance=10000)
+    engine = TradingEngine(broker, _BuyOnSecondBar(), RiskManager(), None, ["AAPL"])
+    pipeline = StreamingPipeline(ReplayTickSource(str(path)), engine.on_bar, on_tick=engine.on_tick)
+    asyncio.run(engine.run_streaming(pipeline))
+    assert broker.get_positions()["AAPL"].avg_price == 110
+    assert engine.portfolio.get_trade_count() == 1
+
+
+def test_engine_stops_out_on_tick_in_streaming_mode(tmp_path):
+    path = tmp_path / "ticks.csv"
+    _write_ticks(path, [(0, "AAPL", 100, 1), (61, "AAPL", 110, 1), (125, "AAPL", 111, 1), (130, "AAPL", 100, 1)])
+    broker = PaperBroker(initial_balance=10000)
+    engine = TradingEngine(broker, _BuyOnSecondBar(), RiskManager(stop_loss_pct=0.05), None, ["AAPL"])
+    pipeline = StreamingPipeline(ReplayTickSource(str(path)), engine.on_bar, on_tick=engine.on_tick)
+    asyncio.run(engine.run_streaming(pipeline))
+    buy, stop = engine.portfolio.trade_records[:2]
+    # Tick 100 < 110 * 0.95 säljer direkt, utan att vänta på att baren stänger
+    assert (buy.side, buy.price) == (OrderSide.BUY, 110)
+    assert (stop.side, stop.price) == (OrderSide.SELL, 100)
+    assert stop.pnl == (100 - 110) * buy.quantity
@@ -0,0 +1,53 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from src.core.loadtest import run_load_test
+from src.data.synthetic import MarketModel, SyntheticSource, generate_ohlcv
+
+
+def test_generate_ohlcv_is_seeded_and_consistent():
+    first = generate_ohlcv(200, 300, seed=7)
+    second = generate_ohlcv(200, 300, seed=7)
+    assert all(np.array_equal(first[name], second[name]) for name in first)
+    assert not np.array_equal(first["Close"], generate_ohlcv(200, 300, seed=8)["Close"])
+
+    body_low = np.minimum(first["Open"], first["Close"])
+    body_high = np.maximum(first["Open"], first["Close"])
+    assert (first["Low"] <= body_low).all() and (first["High"] >= body_high).all()
+    assert (first["Low"] > 0).all() and (first["Volume"] > 0).all()
+
+
+def test_generate_ohlcv_sectors_are_correlated():
+    data = generate_ohlcv(300, 1000, seed=1, model=MarketModel(market_volatility=0.0, sector_volatility=0.3))
+    returns = np.diff(np.log(data["Close"].astype(np.float64)), axis=0)
+    corr = np.corrcoef(returns.T)
+    same = data["sector"][:, None] == data["sector"][None, :]
+    np.fill_diagonal(same, False)
+    other = data["sector"][:, None] != data["sector"][None, :]
+    assert corr[same].mean() > 0.3
+    assert abs(corr[other].mean()) < 0.05
+
+
+def test_synthetic_source_cursor():
+    source = SyntheticSource(symbols=5, bars=50, seed=3)
+    source.set_cursor(30)
+    df = source.get_recent("SYN00002", 10)
+    assert len(df) == 10 and df.index[-1] == source.index[29]
+    assert source.get_current_price("SYN00002") == df["Close"].iloc[-1]
+    assert source.advance()
+    assert source.get_prices_bulk(["SYN00002"])["SYN00002"] == source.get_recent("SYN00002", 1)["Close"].iloc[-1]
+
+
+def test_run_load_test_reports_metrics():
+    result = run_load_test(50, cycles=2, seed=0)
+    assert result["symbols"] == 50 and result["cycles"] == 2
+    assert result["latency_max_ms"] >= result["latency_p50_ms"] > 0
+    assert result["symbols_per_s"] > 0 and result["rss_peak_mb"] > 0
+
+
+def test_run_load_test_with_array_paper_broker():
+    result = run_load_test(50, cycles=2, seed=0, broker="paper_array")
+    assert result["broker"] == "paper_array" and result["latency_max_ms"] > 0
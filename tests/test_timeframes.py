@@ -0,0 +1,134 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.brokers.paper_broker import PaperBroker
+from src.core.engine import TradingEngine
+from src.core.risk import RiskManager
+from src.data.source import MarketDataSource
+from src.data.timeframes import MultiTimeframeSource, ResampledSeries, resample
+from src.strategies.base import BaseStrategy, Signal
+
+
+def _minute_bars(n: int, start: str = "2024-01-01 09:30") -> pd.DataFrame:
+    index = pd.date_range(start, periods=n, freq="5min")
+    rng = np.random.default_rng(1)
+    close = 100 + rng.normal(0, 1, n).cumsum()
+    return pd.DataFrame({"Open": close, "High": close + 0.5, "Low": close - 0.5, "Close": close,
+                         "Volume": rng.integers(1, 100, n).astype(float)}, index=index)
+
+
+class _GrowingSource(MarketDataSource):
+
+    def __init__(self, bars: pd.DataFrame):
+        self.bars = bars
+        self.visible = 0
+        self.calls: list[tuple[str, str]] = []
+
+    def get_historical(self, symbol: str, period: str = "3mo", interval: str = "1d") -> pd.DataFrame:
+        self.calls.append((period, interval))
+        df = self.bars.iloc[:self.visible]
+        return df if period != "1d" else df.iloc[-288:]
+
+
+def test_incremental_resample_matches_full_resample():
+    bars = _minute_bars(1000)
+    series = ResampledSeries("1h")
+    for end in range(1, len(bars) + 1, 7):
+        series.update(bars.iloc[:end])
+    series.update(bars)
+    pd.testing.assert_frame_equal(series.frame(), resample(bars, "1h"))
+    assert len(series.completed) == len(series.frame()) - 1
+
+
+def test_weekly_buckets_start_on_monday():
+    daily = pd.DataFrame({"Close": np.arange(10.0)}, index=pd.date_range("2024-01-03", periods=10, freq="D"))
+    weekly = resample(daily, "1wk")
+    assert list(weekly.index) == [pd.Timestamp("2024-01-01"), pd.Timestamp("2024-01-08")]
+    assert list(weekly["Close"]) == [4.0, 9.0]
+
+
+def test_multi_timeframe_source_fetches_base_once_per_refresh():
+    bars = _minute_bars(600)
+    base = _GrowingSource(bars)
+    base.visible = 500
+    source = MultiTimeframeSource(base, base_interval="5m", min_refresh_seconds=0)
+    source.clock = lambda: bars.index[-1]
+
+    frames = source.get_timeframes("AAPL", ["5m", "1h", "1d"], period="max")
+    assert base.calls == [("60d", "5m")]
+    assert frames["1h"]["Volume"].sum() == frames["5m"]["Volume"].sum() == bars["Volume"].iloc[:500].sum()
+
+    base.visible = 600
+    frames = source.get_timeframes("AAPL", ["1h", "1d"], period="max")
+    assert base.calls[-1] == ("1d", "5m")
+    pd.testing.assert_frame_equal(frames["1h"], resample(bars, "1h"))
+    pd.testing.assert_frame_equal(frames["1d"], resample(bars, "1d"))
+
+    with pytest.raises(ValueError):
+        source.get_timeframes("AAPL", ["1m"])
+
+
+class _TrendAgreement(BaseStrategy):
+    timeframes = ("5m", "1h")
+
+    def analyze(self, df, symbol: str) -> Signal:
+        return Signal.HOLD
+
+    def analyze_timeframes(self, frames, symbol: str) -> Signal:
+        up = all(df["Close"].iloc[-1] >= df["Open"].iloc[0] for df in frames.values())
+        return Signal.BUY if up else Signal.HOLD
+
+
+def test_engine_passes_requested_timeframes_to_strategy():
+    bars = _minute_bars(100)
+    bars["Close"] = bars["Open"] = np.linspace(100, 120, 100)
+    base = _GrowingSource(bars)
+    base.visible = 100
+    source = MultiTimeframeSource(base, base_interval="5m")
+    broker = PaperBroker(initial_balance=10000)
+    engine = TradingEngine(broker, _TrendAgreement(), RiskManager(), source, ["AAPL"])
+    engine.run_once()
+    assert "AAPL" in broker.get_positions()
+    assert len(base.calls) == 1
+
+
+def test_refresh_refetches_history_only_when_short_window_misses_last_bar():
+    # Två handelsdagar med nattuppehåll; basen är hämtad fram till första dagens stängning
+    first = _minute_bars(78, "2024-01-02 09:30")
+    second = _minute_bars(78, "2024-01-03 09:30")
+    bars = pd.concat([first, second])
+    base = _GrowingSource(bars)
+    base.visible = 78
+    source = MultiTimeframeSource(base, base_interval="5m", min_refresh_seconds=0, max_bars=40)
+    source.clock = lambda: pd.Timestamp("2024-01-02 16:00")
+    source.get_timeframes("AAPL", ["1h"], period="max")
+
+    # Morgonen efter: nattuppehållet ryms i den korta hämtningen
+    base.visible = 80
+    source.clock = lambda: pd.Timestamp("2024-01-03 09:40")
+    source.get_timeframes("AAPL", ["1h"], period="max")
+    assert base.calls[-1] == ("1d", "5m")
+
+    # Efter ett avbrott längre än refresh_period hämtas hela historiken, en gång
+    later = _minute_bars(78, "2024-01-08 09:30")
+    base.bars = pd.concat([bars, later])
+    base.visible = len(base.bars)
+    source.clock = lambda: pd.Timestamp("2024-01-08 16:00")
+    calls = len(base.calls)
+    frames = source.get_timeframes("AAPL", ["5m", "1h"], period="max")
+    assert base.calls[calls:] == [("60d", "5m")]
+    pd.testing.assert_frame_equal(frames["5m"], base.bars.iloc[-40:])
+
+
+def test_resampled_series_keeps_at_most_max_bars():
+    bars = _minute_bars(1000)
+    series = ResampledSeries("1h", max_bars=5)
+    for end in range(1, len(bars) + 1, 50):
+        series.update(bars.iloc[:end])
+    series.update(bars)
+    pd.testing.assert_frame_equal(series.frame(), resample(bars, "1h").iloc[-6:])
\ No newline at end of file
@@ -0,0 +1,65 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from src.brokers.paper_broker import PaperBroker
+from src.core.engine import TradingEngine
+from src.core.risk import RiskManager
+from src.strategies.base import BaseStrategy, Signal
+from src.utils import tracing
+from src.utils.tracing import NOOP_SPAN, configure_tracing, load_trace, span
+
+
+class _StubFetcher:
+
+    def get_prices_bulk(self, symbols: list[str]) -> dict[str, float]:
+        return {s: 100.0 for s in symbols}
+
+    def get_historical(self, symbol: str, period: str = "3mo", interval: str = "1d"):
+        return None
+
+
+class _AlwaysBuy(BaseStrategy):
+
+    def analyze(self, df, symbol: str) -> Signal:
+        return Signal.BUY
+
+
+@pytest.fixture
+def trace_path(tmp_path):
+    path = str(tmp_path / "trace.json")
+    yield path
+    configure_tracing({})
+
+
+def test_cycle_spans_nest_per_symbol_and_stage(trace_path):
+    configure_tracing({"enabled": True, "path": trace_path})
+    engine = TradingEngine(PaperBroker(initial_balance=10000), _AlwaysBuy(), RiskManager(max_position_pct=0.2),
+                           _StubFetcher(), ["AAPL", "TSLA"])
+    engine.run_once()
+    engine.run_once()
+
+    events = load_trace(trace_path)
+    assert all(e["ph"] == "X" for e in events)
+    cycles = [e for e in events if e["name"] == "cycle"]
+    assert [c["args"]["cycle"] for c in cycles] == [0, 1]
+    first = cycles[0]
+    inside = [e for e in events if first["ts"] <= e["ts"] and e["ts"] + e["dur"] <= first["ts"] + first["dur"] + 1]
+    names = [e["name"] for e in inside]
+    assert names.count("symbol") == 2 and names.count("analyze") == 2 and "risk" in names
+    orders = [e for e in inside if e["name"] == "order"]
+    assert {o["args"]["symbol"] for o in orders} == {"AAPL", "TSLA"}
+    assert all(o["args"]["status"] == "filled" and o["args"]["order_id"] for o in orders)
+
+
+def test_tracing_disabled_or_unsampled_writes_nothing(trace_path):
+    assert span("cycle", symbol="AAPL") is NOOP_SPAN
+
+    configure_tracing({"enabled": True, "path": trace_path, "sample_rate": 0.0})
+    with span("cycle"):
+        with span("fetch", symbol="AAPL") as s:
+            s.set(bars=10)
+    assert not os.path.exists(trace_path)
+    assert tracing.tracer._local.depth == 0